@@ -0,0 +1,14 @@
+'''
+The benchmarks package measures the speed and memory use of the finder package.
+
+- generator.py builds synthetic media libraries of release-style filenames.
+- micro.py times each filename extractor and each database write path.
+- endtoend.py times Finder.run on whole libraries, with peak memory and SQLite statement counts.
+- suite.py runs both, saves the results to a JSON baseline and flags regressions against a stored one.
+- walk.py times the directory walker alone.
+
+Run the suite from the repository root:
+
+    python -m benchmarks.suite --sizes 10000 100000 1000000 --save benchmarks/baseline.json
+    python -m benchmarks.suite --sizes 10000 100000 --compare benchmarks/baseline.json
+'''
\ No newline at end of file
@@ -0,0 +1,102 @@
+import os
+import sys
+import tempfile
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from finder.finder import Finder
+from benchmarks.generator import generate, EXTENSIONS
+from benchmarks.measure import measure, peakrss
+
+'''
+endtoend.py is a module that times Finder.run on whole synthetic media libraries.
+
+Each run indexes a library into a fresh database in a child process, so that the peak resident
+set size it reports belongs to that run alone. The library is built once per size and can be
+kept between invocations with the --libraries argument, since building a million files takes a while.
+'''
+
+
+# Function to run the Finder process in a child process
+def child(root, database, jobs, stream, batch_size, results):
+    """
+    Index a library and send the result back to the parent process.
+
+    :param root: Root directory of the library
+    :param database: Database path
+    :param jobs: Number of threads scanning directories and of processes extracting details
+    :param stream: Boolean to run the Finder process in a single pass
+    :param batch_size: Number of rows written per transaction
+    :param results: multiprocessing.Queue receiving the result dictionary
+    """
+    sys.stdout = open(os.devnull, 'w') # Silence the debug prints
+    with measure() as result:
+        Finder(database=database, batch_size=batch_size).run(root, EXTENSIONS, jobs=jobs, stream=stream)
+    result['rss'] = peakrss()
+    results.put(result)
+
+
+# Function to time the Finder process on a library
+def timerun(root, files, jobs=1, stream=False, batch_size=1000):
+    """
+    Time the Finder process on a library, in a child process.
+
+    :param root: Root directory of the library
+    :param files: Number of media files in the library
+    :param jobs: Number of threads scanning directories and of processes extracting details
+    :param stream: Boolean to run the Finder process in a single pass
+    :param batch_size: Number of rows written per transaction
+    :return: Dictionary of seconds, files per second, peak resident set size and statements
+    """
+    results = multiprocessing.Queue()
+    with tempfile.TemporaryDirectory() as directory:
+        process = multiprocessing.Process(target=child, args=(root, os.path.join(directory, 'bench.db'), jobs, stream, batch_size, results))
+        process.start()
+        result = results.get()
+        process.join()
+    result['ops'] = files / result['seconds']
+    return result
+
+
+# Function to run the end-to-end benchmarks
+def run(sizes=(10000, 100000, 1000000), jobs=1, stream=False, batch_size=1000, libraries=None):
+    """
+    Time the Finder process on libraries of growing size.
+
+    :param sizes: Library sizes in media files
+    :param jobs: Number of threads scanning directories and of processes extracting details
+    :param stream: Boolean to run the Finder process in a single pass
+    :param batch_size: Number of rows written per transaction
+    :param libraries: Directory keeping the libraries between invocations, or None for temporary ones
+    :return: Dictionary of benchmark name to result dictionary
+    """
+    results = {}
+    mode = 'stream' if stream else 'run'
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            root = os.path.join(libraries or directory, f'library.{size}')
+            if not os.path.isdir(root):
+                generate(root, size)
+            results[f'finder.{mode}.{size}'] = timerun(root, size, jobs=jobs, stream=stream, batch_size=batch_size)
+    return results
+
+
+def main():
+    '''Main function to run the end-to-end benchmarks'''
+    parser = argparse.ArgumentParser(description='Time Finder.run on synthetic media libraries')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='Library sizes in media files')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of threads scanning directories and of processes extracting details')
+    parser.add_argument('--stream', action='store_true', help='Run the Finder process in a single pass')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows written per transaction')
+    parser.add_argument('--libraries', type=str, default=None, help='Directory keeping the generated libraries between runs')
+    args = parser.parse_args()
+
+    print(f"{'benchmark':<24} {'seconds':>10} {'files/s':>10} {'rss MiB':>10} {'statements':>12}")
+    for title, result in run(args.sizes, args.jobs, args.stream, args.batch_size, args.libraries).items():
+        print(f"{title:<24} {result['seconds']:>10.2f} {result['ops']:>10.0f} {result['rss'] / 2**20:>10.1f} {result['statements']:>12}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
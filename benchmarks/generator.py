@@ -0,0 +1,132 @@
+import os
+import random
+import argparse
+
+'''
+generator.py is a module that builds synthetic media libraries for the benchmarks.
+
+The generate function creates a directory tree of a given depth and fan-out and spreads empty files
+with realistic release-style names, like "Duck.Duck.Goose.2018.720p.BluRay.x264-[YTS.AM].mp4", over
+its directories. A share of the files are subtitles and other extras that the finder does not match.
+The names only depend on the seed, so two trees built with the same arguments are identical.
+'''
+
+# Words that release titles are made of
+WORDS = [
+    'The', 'Duck', 'Goose', 'Night', 'Day', 'Last', 'First', 'Man', 'Woman', 'City', 'King', 'Queen',
+    'Dark', 'Light', 'Red', 'Blue', 'River', 'Mountain', 'War', 'Peace', 'Lost', 'Found', 'Star',
+    'Moon', 'Sun', 'Road', 'Home', 'Dream', 'Ghost', 'Hunter', 'Manhunt', 'Escape', 'Return', 'of',
+    'and', 'in', 'Secret', 'Empire', 'Island', 'Storm', 'Fire', 'Ice', 'Iron', 'Silver', 'Golden',
+]
+
+# Release tags
+RESOLUTIONS = ['480p', '720p', '1080p', '2160p']
+SOURCES = ['BluRay', 'WEBRip', 'WEB-DL', 'BRRip', 'HDRip', 'DVDRip', 'HDTV']
+CODECS = ['x264', 'x265', 'XviD', 'DivX']
+GROUPS = ['[YTS.AM]', '[YTS.MX]', 'YIFY', 'RARBG', 'SPARKS', 'GECKOS', 'FGT', 'EVO']
+
+# File extensions matched by the finder, and extras that are not
+EXTENSIONS = ('.mp4', '.mkv', '.avi')
+EXTRAS = ('.srt', '.nfo', '.jpg', '.txt')
+
+
+# Function to make a release-style filename
+def releasename(rng, extension):
+    """
+    Make a random release-style filename.
+
+    :param rng: random.Random object
+    :param extension: File extension
+    :return: Filename like "Duck.Duck.Goose.2018.720p.BluRay.x264-[YTS.AM].mp4"
+    """
+    words = rng.sample(WORDS, rng.randint(1, 4))
+    words[0] = words[0].capitalize()
+    tags = [str(rng.randint(1950, 2024)), rng.choice(RESOLUTIONS), rng.choice(SOURCES), rng.choice(CODECS)]
+    if rng.random() < 0.2:
+        tags.pop(2) # Some releases have no source tag
+    name = '.'.join(words + tags)
+    if rng.random() < 0.8:
+        name += '-' + rng.choice(GROUPS)
+    return name + extension
+
+
+# Function to list the directories of a tree
+def directories(root, depth, fanout):
+    """
+    List the directories of a tree with a given depth and fan-out, breadth first.
+
+    :param root: Root directory
+    :param depth: Number of directory levels below the root
+    :param fanout: Number of subdirectories per directory
+    :return: List of directory paths, starting with the root
+    """
+    paths = [root]
+    level = [root]
+    for d in range(depth):
+        level = [os.path.join(parent, f'Collection.{d}.{i}') for parent in level for i in range(fanout)]
+        paths.extend(level)
+    return paths
+
+
+# Function to build a synthetic media library
+def generate(root, files, depth=3, fanout=8, extras=0.1, seed=0):
+    """
+    Build a synthetic media library.
+
+    :param root: Root directory to build the library in
+    :param files: Number of media files to create
+    :param depth: Number of directory levels below the root
+    :param fanout: Number of subdirectories per directory
+    :param extras: Share of extra files that are not matched, per media file
+    :param seed: Random seed, the same seed gives the same library
+    :return: Number of media files created
+    """
+    rng = random.Random(seed)
+    paths = directories(root, depth, fanout)
+    for path in paths:
+        os.makedirs(path, exist_ok=True)
+
+    # Spread the files evenly over the directories, with unique names per directory
+    created = 0
+    while created < files:
+        path = paths[created % len(paths)]
+        name = releasename(rng, rng.choice(EXTENSIONS))
+        try:
+            os.close(os.open(os.path.join(path, name), os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            continue
+        created += 1
+        if rng.random() < extras:
+            open(os.path.join(path, os.path.splitext(name)[0] + rng.choice(EXTRAS)), 'w').close()
+    return created
+
+
+# Function to make a list of filenames without creating files
+def filenames(count, seed=0):
+    """
+    Make release-style filenames for the micro-benchmarks.
+
+    :param count: Number of filenames
+    :param seed: Random seed
+    :return: List of filenames
+    """
+    rng = random.Random(seed)
+    return [releasename(rng, rng.choice(EXTENSIONS)) for i in range(count)]
+
+
+def main():
+    '''Main function to build a synthetic media library'''
+    parser = argparse.ArgumentParser(description='Build a synthetic media library')
+    parser.add_argument('root', type=str, help='Root directory to build the library in')
+    parser.add_argument('--files', type=int, default=10000, help='Number of media files')
+    parser.add_argument('--depth', type=int, default=3, help='Number of directory levels')
+    parser.add_argument('--fanout', type=int, default=8, help='Number of subdirectories per directory')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    created = generate(args.root, args.files, depth=args.depth, fanout=args.fanout, seed=args.seed)
+    print(f"{created} files created in {args.root}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,59 @@
+import sys
+import time
+import sqlite3
+import resource
+from contextlib import contextmanager
+
+'''
+measure.py is a module that provides the measurements shared by the benchmarks.
+
+The measure context manager times a block and counts the SQLite statements run by every
+connection opened inside it, through the trace callback of the sqlite3 module. The peakrss
+function reads the peak resident set size of the current process.
+'''
+
+
+# Function to read the peak resident set size
+def peakrss():
+    """
+    Read the peak resident set size of the current process.
+
+    :return: Peak resident set size in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024 # Kilobytes on Linux, bytes on macOS
+
+
+@contextmanager
+def measure(*connections):
+    """
+    Time a block and count the SQLite statements it runs.
+
+    The given connections and the connections opened inside the block are traced, each execution of a statement counts once,
+    so an executemany of a thousand rows counts a thousand statements.
+
+    :param connections: Open sqlite3 connections to trace as well
+    :return: Dictionary filled with seconds and statements on exit
+    """
+    result = {'seconds': 0.0, 'statements': 0}
+    connect = sqlite3.connect
+
+    def trace(statement):
+        result['statements'] += 1
+
+    def traced(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(trace)
+        return conn
+
+    for conn in connections:
+        conn.set_trace_callback(trace)
+    sqlite3.connect = traced
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.perf_counter() - start
+        sqlite3.connect = connect
+        for conn in connections:
+            conn.set_trace_callback(None)
\ No newline at end of file
@@ -0,0 +1,146 @@
+import os
+import sys
+import tempfile
+import argparse
+import tracemalloc
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from finder.finder import Finder
+from finder.pathfinder import PathFinder
+from finder.parser import CACHE_SIZE
+from benchmarks.generator import generate, EXTENSIONS
+from benchmarks.measure import measure, peakrss
+
+'''
+memory.py is a module that checks that the peak memory of the Finder process does not grow with the size of the tree.
+
+Each mode indexes libraries of growing size in a child process, with tracemalloc tracing every
+Python allocation, and reports the peak traced memory and the peak resident set size. Peak memory
+includes bounded buffers (the parse cache of CACHE_SIZE filenames, the batches of the Writer and the
+chunks read back from the database), so it grows until the library is larger than these, and should
+stay flat after that. The growth in bytes per file between the two largest libraries is checked
+against a maximum, so the benchmark fails when a stage starts holding the whole tree again: a list
+of (filepath, filename, filetitle) tuples costs about 400 bytes per file, while resizes of the
+parse cache move the peak by a few MiB, well under 100 bytes per file between large libraries.
+'''
+
+# Modes of the Finder process
+MODES = ('find', 'run', 'stream')
+
+
+# Function to index a library in a child process
+def child(root, database, mode, results):
+    """
+    Index a library with allocations traced and send the result back to the parent process.
+
+    :param root: Root directory of the library
+    :param database: Database path
+    :param mode: 'find' for PathFinder only, 'run' for the three stages, 'stream' for the single pass
+    :param results: multiprocessing.Queue receiving the result dictionary
+    """
+    sys.stdout = open(os.devnull, 'w') # Silence the debug prints
+    finder = Finder(database=database)
+    tracemalloc.start()
+    with measure() as result:
+        if mode == 'find':
+            PathFinder(filepath=root, database=database).find(root, EXTENSIONS)
+        else:
+            finder.run(root, EXTENSIONS, stream=mode == 'stream')
+    result['peak'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    result['rss'] = peakrss()
+    results.put(result)
+
+
+# Function to measure the peak memory of the Finder process on a library
+def peak(root, files, mode):
+    """
+    Measure the peak memory of the Finder process on a library, in a child process.
+
+    :param root: Root directory of the library
+    :param files: Number of media files in the library
+    :param mode: Mode of the Finder process
+    :return: Dictionary of seconds, files per second, peak traced memory, peak resident set size and statements
+    """
+    results = multiprocessing.Queue()
+    with tempfile.TemporaryDirectory() as directory:
+        process = multiprocessing.Process(target=child, args=(root, os.path.join(directory, 'bench.db'), mode, results))
+        process.start()
+        result = results.get()
+        process.join()
+    result['ops'] = files / result['seconds']
+    return result
+
+
+# Function to run the memory benchmarks
+def run(sizes=(100000, 200000), modes=MODES, libraries=None):
+    """
+    Measure the peak memory of the Finder process on libraries of growing size.
+
+    :param sizes: Library sizes in media files
+    :param modes: Modes of the Finder process
+    :param libraries: Directory keeping the libraries between invocations, or None for temporary ones
+    :return: Dictionary of benchmark name to result dictionary
+    """
+    results = {}
+    for size in sorted(sizes):
+        with tempfile.TemporaryDirectory() as directory:
+            root = os.path.join(libraries or directory, f'library.{size}')
+            if not os.path.isdir(root):
+                generate(root, size)
+            for mode in modes:
+                results[f'memory.{mode}.{size}'] = peak(root, size, mode)
+    return results
+
+
+# Function to compute the growth of the peak memory per file
+def growth(results, sizes, mode):
+    """
+    Compute the growth of the peak traced memory per file between the two largest libraries.
+
+    :param results: Dictionary of benchmark name to result dictionary
+    :param sizes: Library sizes in media files
+    :param mode: Mode of the Finder process
+    :return: Bytes per file, or None with fewer than two sizes
+    """
+    sizes = sorted(sizes)
+    if len(sizes) < 2:
+        return None
+    small, large = results[f'memory.{mode}.{sizes[-2]}'], results[f'memory.{mode}.{sizes[-1]}']
+    return (large['peak'] - small['peak']) / (sizes[-1] - sizes[-2])
+
+
+def main():
+    '''Main function to run the memory benchmarks'''
+    parser = argparse.ArgumentParser(description='Check that the peak memory of Finder.run stays flat on growing libraries')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 200000], help='Library sizes in media files')
+    parser.add_argument('--modes', type=str, nargs='+', choices=MODES, default=list(MODES), help='Modes of the Finder process')
+    parser.add_argument('--libraries', type=str, default=None, help='Directory keeping the generated libraries between runs')
+    parser.add_argument('--max-growth', type=float, default=100.0, help='Maximum growth of the peak memory in bytes per file')
+    args = parser.parse_args()
+
+    if min(args.sizes) <= CACHE_SIZE:
+        print(f"Libraries of up to {CACHE_SIZE} files fill the parse cache, so their peak memory still grows")
+
+    results = run(args.sizes, args.modes, args.libraries)
+    print(f"{'benchmark':<24} {'seconds':>10} {'peak MiB':>10} {'rss MiB':>10}")
+    for title, result in results.items():
+        print(f"{title:<24} {result['seconds']:>10.2f} {result['peak'] / 2**20:>10.1f} {result['rss'] / 2**20:>10.1f}")
+
+    failed = False
+    for mode in args.modes:
+        perfile = growth(results, args.sizes, mode)
+        if perfile is None:
+            continue
+        print(f"{mode}: {perfile:.1f} bytes per file")
+        if perfile > args.max_growth:
+            print(f"REGRESSION {mode}: peak memory grows by {perfile:.1f} bytes per file, more than {args.max_growth}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
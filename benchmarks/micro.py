@@ -0,0 +1,146 @@
+import os
+import sys
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from finder import utils
+from finder.parser import parse
+from finder.writer import Writer
+from finder.tree import DirectoryTree
+from finder.stepextractor import StepExtractor
+from finder.detailsextractor import DetailsExtractor, extractchunk
+from benchmarks.generator import filenames
+from benchmarks.measure import measure
+
+'''
+micro.py is a module that times each filename extractor and each database write path of the finder package.
+
+Extractors are timed on distinct release-style filenames, both cold, with an empty parse cache,
+and warm, with every filename already parsed. Write paths are timed on a fresh database each,
+with the number of SQLite statements they run.
+'''
+
+# Filename extractors of the utils module
+EXTRACTORS = ['titlextract', 'yearextract', 'resextract', 'codecextract']
+
+
+# Function to time the filename extractors
+def extractors(names):
+    """
+    Time each filename extractor over a list of filenames.
+
+    :param names: List of filenames
+    :return: Dictionary of benchmark name to result dictionary with ops per second
+    """
+    results = {}
+    for extractor in EXTRACTORS + ['parse']:
+        function = parse if extractor == 'parse' else getattr(utils, extractor)
+        for cache in ('cold', 'warm'):
+            if cache == 'cold':
+                parse.cache_clear()
+            with measure() as result:
+                for name in names:
+                    function(name)
+            result['ops'] = len(names) / result['seconds']
+            results[f'{extractor}.{cache}'] = result
+    return results
+
+
+# Function to time the database write paths
+def writes(names, batch_size=1000):
+    """
+    Time each database write path, on a fresh database each.
+
+    :param names: List of filenames
+    :param batch_size: Number of rows written per transaction
+    :return: Dictionary of benchmark name to result dictionary with ops per second and statements
+    """
+    rows = [(f'/library/{name}', name, parse(name).title, i) for i, name in enumerate(names)]
+    details = extractchunk(list(enumerate(names, 1)))
+    columns = ['filepath', 'filename', 'filetitle', 'size']
+
+    def insert(writer):
+        writer.execute("CREATE TABLE filepaths (id INTEGER PRIMARY KEY, filepath TEXT, filename TEXT, filetitle TEXT, size INTEGER, UNIQUE(filepath))")
+        return lambda: writer.insert('filepaths', columns, rows)
+
+    def upsert(writer):
+        insert(writer)()
+        writer.flush()
+        return lambda: writer.upsert('filepaths', columns, rows, keys=columns[:1])
+
+    def delete(writer):
+        insert(writer)()
+        writer.flush()
+        return lambda: writer.delete('filepaths', 'filepath', (row[0] for row in rows))
+
+    def save(writer):
+        return lambda: writer.save(columns, rows, 'filepaths')
+
+    def savesteps(writer):
+        steps = StepExtractor(writer=writer, database=writer.database)
+        steps.create(writer)
+        return lambda: steps.savesteps([(i, 1, 0, None) for i in range(1, len(rows) + 1)], writer)
+
+    def save_details(writer):
+        extractor = DetailsExtractor(writer=writer, database=writer.database)
+        extractor.create(writer)
+        return lambda: extractor.save_details(details, writer)
+
+    def record(writer):
+        tree = DirectoryTree()
+        tree.create(writer)
+        return lambda: [tree.record(f'/library/{i // 100}/{i}', 0.0, writer) for i in range(len(rows))]
+
+    results = {}
+    paths = {'insert': insert, 'upsert': upsert, 'delete': delete, 'save': save, 'savesteps': savesteps, 'save_details': save_details, 'tree.record': record}
+    for title, setup in paths.items():
+        with tempfile.TemporaryDirectory() as directory:
+            with Writer(os.path.join(directory, 'bench.db'), batch_size=batch_size) as writer:
+                run = setup(writer)
+                writer.flush()
+                with measure(writer.conn) as result:
+                    run()
+                    writer.flush()
+        result['ops'] = len(rows) / result['seconds']
+        results[f'writer.{title}'] = result
+
+    # The save function of the utils module opens its own writer
+    with tempfile.TemporaryDirectory() as directory:
+        with measure() as result:
+            utils.save(columns, rows, 'filepaths', database=os.path.join(directory, 'bench.db'))
+    result['ops'] = len(rows) / result['seconds']
+    results['utils.save'] = result
+    return results
+
+
+# Function to run all micro-benchmarks
+def run(count=100000, batch_size=1000):
+    """
+    Run the extractor and write path micro-benchmarks.
+
+    :param count: Number of filenames
+    :param batch_size: Number of rows written per transaction
+    :return: Dictionary of benchmark name to result dictionary
+    """
+    names = filenames(count)
+    results = extractors(names)
+    results.update(writes(names, batch_size=batch_size))
+    return results
+
+
+def main():
+    '''Main function to run the micro-benchmarks'''
+    parser = argparse.ArgumentParser(description='Time the filename extractors and database write paths')
+    parser.add_argument('--count', type=int, default=100000, help='Number of filenames')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows written per transaction')
+    args = parser.parse_args()
+
+    print(f"{'benchmark':<24} {'ops/s':>12} {'statements':>12}")
+    for title, result in run(args.count, args.batch_size).items():
+        print(f"{title:<24} {result['ops']:>12.0f} {result['statements']:>12}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import micro, endtoend
+
+'''
+suite.py is a module that runs the micro and end-to-end benchmarks and keeps a JSON baseline of their results.
+
+Every result records its throughput in operations (filenames, rows or files) per second and the
+number of SQLite statements it ran; end-to-end results also record the peak resident set size.
+Compared to a stored baseline, a result is a regression when its throughput drops or its peak
+memory grows by more than the tolerance, or when it runs more SQLite statements than before.
+'''
+
+
+# Function to compare results to a baseline
+def compare(results, baseline, tolerance=0.1):
+    """
+    Compare benchmark results to a baseline.
+
+    :param results: Dictionary of benchmark name to result dictionary
+    :param baseline: Dictionary of benchmark name to result dictionary, from a previous run
+    :param tolerance: Allowed relative change in throughput and peak memory
+    :return: List of regression messages
+    """
+    regressions = []
+    for title, result in results.items():
+        base = baseline.get(title)
+        if not base:
+            continue
+        if result['ops'] < base['ops'] * (1 - tolerance):
+            regressions.append(f"{title}: {result['ops']:.0f} ops/s, was {base['ops']:.0f}")
+        if 'rss' in result and 'rss' in base and result['rss'] > base['rss'] * (1 + tolerance):
+            regressions.append(f"{title}: {result['rss'] / 2**20:.1f} MiB peak, was {base['rss'] / 2**20:.1f}")
+        if result['statements'] > base['statements']:
+            regressions.append(f"{title}: {result['statements']} statements, was {base['statements']}")
+    return regressions
+
+
+def main():
+    '''Main function to run the benchmark suite'''
+    parser = argparse.ArgumentParser(description='Run the benchmark suite and compare it to a baseline')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='End-to-end library sizes in media files')
+    parser.add_argument('--count', type=int, default=100000, help='Number of filenames of the micro-benchmarks')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of threads scanning directories and of processes extracting details')
+    parser.add_argument('--stream', action='store_true', help='Run the Finder process in a single pass')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows written per transaction')
+    parser.add_argument('--libraries', type=str, default=None, help='Directory keeping the generated libraries between runs')
+    parser.add_argument('--save', type=str, default=None, help='Path of the JSON baseline to write')
+    parser.add_argument('--compare', type=str, default=None, help='Path of the JSON baseline to compare to')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative change in throughput and peak memory')
+    args = parser.parse_args()
+
+    results = micro.run(args.count, args.batch_size)
+    results.update(endtoend.run(args.sizes, args.jobs, args.stream, args.batch_size, args.libraries))
+
+    print(f"{'benchmark':<28} {'ops/s':>12} {'rss MiB':>10} {'statements':>12}")
+    for title, result in results.items():
+        rss = f"{result['rss'] / 2**20:>10.1f}" if 'rss' in result else f"{'':>10}"
+        print(f"{title:<28} {result['ops']:>12.0f} {rss} {result['statements']:>12}")
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'arguments': vars(args),
+                'results': results,
+            }, file, indent=2)
+        print(f"Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from finder.walker import records
+
+'''
+walk.py is a benchmark for the walker module.
+
+It builds synthetic directory trees of growing size and times a full walk of each,
+printing the time per file so that linear growth with tree size can be checked.
+
+Run it from the repository root:
+
+    python benchmarks/walk.py --sizes 1000 10000 100000 --jobs 1 4
+'''
+
+
+# Function to build a synthetic directory tree
+def build(root, files, fanout=10, per_dir=20):
+    """
+    Build a synthetic directory tree with a given number of files.
+
+    :param root: Root directory to build the tree in
+    :param files: Number of files to create
+    :param fanout: Number of subdirectories per directory
+    :param per_dir: Number of files per directory
+    """
+    queue = [root] # Directories to fill, breadth first
+    created = 0
+    while created < files:
+        directory = queue.pop(0)
+        for i in range(min(per_dir, files - created)):
+            open(os.path.join(directory, f'Film.{created}.2018.720p.BluRay.x264-[YTS.AM].mp4'), 'w').close()
+            created += 1
+        for i in range(fanout):
+            subdirectory = os.path.join(directory, f'dir{i}')
+            os.mkdir(subdirectory)
+            queue.append(subdirectory)
+
+
+# Function to time a walk
+def timewalk(root, jobs):
+    """
+    Time a full walk of a directory tree.
+
+    :param root: Root directory
+    :param jobs: Number of threads scanning directories
+    :return: Tuple of (number of files, seconds)
+    """
+    start = time.perf_counter()
+    count = sum(1 for record in records(root, ('.mp4',), jobs=jobs))
+    return count, time.perf_counter() - start
+
+
+def main():
+    '''Main function to run the walk benchmark'''
+    parser = argparse.ArgumentParser(description='Benchmark the directory walker')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Tree sizes in files')
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 4], help='Thread counts to benchmark')
+    args = parser.parse_args()
+
+    print(f"{'files':>10} {'jobs':>5} {'seconds':>10} {'us/file':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as root:
+            build(root, size)
+            for jobs in args.jobs:
+                count, seconds = timewalk(root, jobs)
+                print(f"{count:>10} {jobs:>5} {seconds:>10.3f} {seconds / count * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import os
+import asyncio
+import threading
+from .walker import walk
+from .utils import titlextract
+from .parser import refresh
+from .tree import DirectoryTree
+from .pipeline import Pipeline
+from .writer import Writer
+
+'''
+aio.py is a module that provides the asyncio interface of the Finder class.
+
+The blocking work of the Finder class, scanning directories with os.scandir and writing to the
+sqlite3 database, runs in an executor thread, so that the event loop keeps serving other tasks.
+Results cross over to the event loop through a bounded queue: the thread waits while the queue
+is full, so a slow consumer never makes results pile up in memory.
+
+Cancelling the consuming task, closing the async generator or running out of time sets a stop
+event: the thread stops after its current directory or batch, and the coroutine returns only
+once the thread is done, so the database is never left with an open transaction.
+'''
+
+# Marker of the end of a thread's results
+DONE = object()
+
+
+# Function to stream the results of a blocking function to the event loop
+async def bridge(function, executor=None, depth=8, timeout=None):
+    '''
+    Run a blocking function in an executor thread and yield the items it emits.
+
+    :param function: Function called as function(emit, stop) in the thread. emit(item) sends an item and returns False once stopped
+    :param executor: concurrent.futures executor, or None for the default executor of the event loop
+    :param depth: Maximum number of items waiting to be consumed
+    :param timeout: Seconds before the run is stopped with TimeoutError, or None to wait for the end
+    :return: Async generator of the emitted items
+    '''
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+    slots = threading.Semaphore(depth) # Free places in the queue
+    stop = threading.Event()
+
+    def emit(item):
+        while not stop.is_set():
+            if slots.acquire(timeout=0.1):
+                loop.call_soon_threadsafe(items.put_nowait, item)
+                return True
+        return False
+
+    def work():
+        try:
+            function(emit, stop)
+        finally:
+            loop.call_soon_threadsafe(items.put_nowait, DONE)
+
+    future = loop.run_in_executor(executor, work)
+    deadline = None if timeout is None else loop.time() + timeout
+    try:
+        while True:
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            item = await asyncio.wait_for(items.get(), remaining)
+            if item is DONE:
+                break
+            slots.release()
+            yield item
+        await future # Raise the errors of the thread
+    finally:
+        # Stop the thread and wait for it, even when cancelled
+        stop.set()
+        await asyncio.wait([future])
+
+
+# Function to scan a directory tree without blocking the event loop
+async def scan(directory, extensions, jobs=1, executor=None, depth=8, timeout=None):
+    '''
+    Yield (filepath, filename, filetitle) records of the files in a directory tree, without saving them.
+
+    :param directory: Directory to search for files
+    :param extensions: File extensions to search for
+    :param jobs: Number of threads scanning directories
+    :param executor: concurrent.futures executor, or None for the default executor of the event loop
+    :param depth: Maximum number of scanned directories waiting to be consumed
+    :param timeout: Seconds before the scan is stopped with TimeoutError, or None
+    :return: Async generator of (filepath, filename, filetitle) tuples
+    '''
+    def function(emit, stop):
+        walker = walk(os.path.normpath(directory), tuple(extensions), jobs=jobs)
+        try:
+            for scanned in walker:
+                # One item per directory, so the event loop is not woken up for every file
+                if not emit([(entry.path, entry.name, titlextract(entry.name)) for entry in scanned.files]):
+                    return
+        finally:
+            walker.close()
+
+    async for records in bridge(function, executor=executor, depth=depth, timeout=timeout):
+        for record in records:
+            yield record
+
+
+# Function to run the Finder process without blocking the event loop
+async def events(finder, directory, extensions, jobs=1, executor=None, depth=8, timeout=None):
+    '''
+    Find files and extract their steps and details in a single pass, yielding Progress events.
+
+    :param finder: Finder object providing the database settings, the shared directory tree and the write lock
+    :param directory: Directory to search for files
+    :param extensions: File extensions to search for
+    :param jobs: Number of threads scanning directories
+    :param executor: concurrent.futures executor, or None for the default executor of the event loop
+    :param depth: Maximum number of scanned directories waiting to be written
+    :param timeout: Seconds before the run is stopped with TimeoutError, or None
+    :return: Async generator of Progress events, the last one with done set
+    '''
+    def function(emit, stop):
+        # Runs of the same Finder share the directory tree, reloaded when no other run is active
+        with finder.lock:
+            if not finder.active:
+                finder.tree = DirectoryTree()
+                refresh() # Pick up edited title rules between runs, never during one
+            finder.active += 1
+        try:
+            with Writer(finder.database, batch_size=finder.batch_size, metrics=finder.metrics) as writer, finder.metrics.stage('stream'):
+                pipeline = Pipeline(writer, directory, depth=depth, tree=finder.tree, lock=finder.lock)
+                pipeline.run(os.path.normpath(directory), tuple(extensions), jobs=jobs, stop=stop, progress=emit)
+        finally:
+            with finder.lock:
+                finder.active -= 1
+
+    async for event in bridge(function, executor=executor, depth=depth, timeout=timeout):
+        yield event
\ No newline at end of file
@@ -1,33 +1,73 @@
-import sqlite3
-from .utils import fetch, titlextract, yearextract, resextract, codecextract, collect
+from .utils import stream, boundedmap, fingerprint
+from .parser import parse, version
+from .query import detailindexes
+from .writer import shared, DATABASE
 
 '''
 DetailsExtractor class is used to extract details from the filenames of files in the filepaths table in the classified.db database.
 It extracts the title, year, resolution, and codec of the files from their filenames and saves them to the details table in the classified.db database.
+
+Rows are streamed from the database in chunks and may be parsed in a pool of worker processes.
+Chunks are written in their original order, so the table is the same whatever the number of workers.
+
+Every row of details is stamped with the version of the parser and rules that produced it and with the fingerprint of
+the filename it was parsed from. An incremental extraction only parses the files whose details are missing, stamped with
+another version or parsed from another filename: an anti-join on the primary key of the filedetails table, so a run with
+nothing to do costs one pass over the filepaths table, and new rules only parse the files again, never the paths.
 '''
 
+# Columns of the filedetails table
+DETAIL_COLUMNS = ['file_id', 'title', 'year', 'resolution', 'codec', 'parser_version', 'fingerprint']
+
+# Condition on the filepaths rows t1 selecting the files whose details are missing or outdated, with the version as parameter
+OUTDATED = "NOT EXISTS (SELECT 1 FROM filedetails t2 WHERE t2.file_id = t1.id AND t2.parser_version = ? AND t2.fingerprint = t1.fingerprint)"
+
+
+# Function to extract details from a chunk of filenames, run in worker processes
+def extractchunk(filepaths):
+    '''
+    Extract details from a chunk of filenames.
+
+    :param filepaths: List of (file_id, filename) tuples
+    :return: List of (file_id, title, year, resolution, codec, parser_version, fingerprint) tuples
+    '''
+    stamp = version() # Version of the rules of this process
+    return [(file_id,) + parse(filename)[:4] + (stamp, fingerprint(filename)) for file_id, filename in filepaths]
+
+
 class DetailsExtractor:
     '''Initialize DetailsExtractor class.'''
-    def __init__(self):
-        self.details = {} # Dictionary to store details extracted from filenames
+    def __init__(self, writer=None, database=DATABASE):
+        self.writer = writer # Shared Writer object, or None for a private one
+        self.database = database # Database path
 
-    def extract(self, check_empty=False):
+    def extract(self, check_empty=False, filepaths=None, jobs=1, chunksize=10000, journal=None):
         '''
         Extract details from filenames stored in the filepaths table.
-        Constructs a dictionary of details extracted from filenames and saves it to the databases.
+        Streams the filenames in chunks, extracts their details and saves them to the database chunk by chunk.
+
+        :param check_empty: Boolean to extract only the files whose details are missing or outdated
+        :param filepaths: List of (id, filename) tuples to extract instead of collecting them from the database
+        :param jobs: Number of worker processes, 1 to extract in the current process
+        :param chunksize: Number of filenames per chunk
+        :param journal: Journal object of the run, to start after its checkpoint and record one with every chunk, or None
         '''
-        # Fetch filenames and file_ids from the database
-        filepaths = collect(table_title='filepaths', columns=['id', 'filename'], check_empty=check_empty)
+        # Fetch filenames and file_ids from the database, chunk by chunk
+        if filepaths is None:
+            after = journal.last.get('details', 0) if journal else None # Files saved before the run was interrupted are skipped
+            chunks = stream(table_title='filepaths', columns=['id', 'filename'], check_empty=check_empty, database=self.database, chunksize=chunksize, missing=OUTDATED, values=(version(),), after=after)
+        else:
+            chunks = (filepaths[i:i + chunksize] for i in range(0, len(filepaths), chunksize))
 
-        # Extract details from filenames
-        for filepath_tuple in filepaths: # Iterate over filepaths
-            file_id = filepath_tuple[0] # Get file_id
-            filename = filepath_tuple[1] # Get filename
-            details = self.extract_details(filename) # Extract details from filename
-            self.details[file_id] = details # Add details to dictionary
+        with shared(self.writer, self.database) as writer:
+            self.create(writer)
 
-        # Save details to the database
-        self.save_details()
+            # Extract details from filenames and save them in order
+            for details in boundedmap(extractchunk, chunks, jobs=jobs):
+                with writer.transaction():
+                    self.save_details(details, writer)
+                    if journal and details:
+                        journal.checkpoint('details', details[-1][0], writer) # Committed with the details
 
     def extract_details(self, filename):
         '''
@@ -36,36 +76,36 @@ class DetailsExtractor:
         :param filename: The filename to extract details from
         :return: A dictionary of details extracted from the filename
         '''
-        details = {} # Initialize details dictionary
-
-        # Extract title
-        details['title'] = titlextract(filename)
+        release = parse(filename) # Parse filename once, shared with the utils extractors
 
-        # Extract year
-        details['year'] = yearextract(filename)
-
-        # Extract resolution
-        details['resolution'] = resextract(filename)
-
-        # Extract codec
-        details['codec'] = codecextract(filename)
+        # Extract title, year, resolution and codec
+        details = {'title': release.title, 'year': release.year, 'resolution': release.resolution, 'codec': release.codec}
 
         return details
     
-    def save_details(self):
-        '''Save details to the database.'''
-        # Connect to database
-        conn = sqlite3.connect('../classified.db')
-        c = conn.cursor()
+    def create(self, writer):
+        '''
+        Create the details table and its indexes if they do not exist.
+        Details of a filedetails table created by an older version get no version stamp, so they are extracted again.
 
-        # Create details table if it does not exist
-        c.execute('''CREATE TABLE IF NOT EXISTS filedetails
-                     (file_id INTEGER PRIMARY KEY, title TEXT, year INTEGER, resolution TEXT, codec TEXT)''')
+        :param writer: Writer object
+        '''
+        writer.execute('''CREATE TABLE IF NOT EXISTS filedetails
+                     (file_id INTEGER PRIMARY KEY, title TEXT, year INTEGER, resolution TEXT, codec TEXT, parser_version TEXT, fingerprint INTEGER)''')
 
-        # Insert or replace details into the details table
-        for file_id, details in self.details.items():
-            c.execute("INSERT OR REPLACE INTO filedetails VALUES (?, ?, ?, ?, ?)", (file_id, details['title'], details['year'], details['resolution'], details['codec']))
+        # Add the stamp columns to older filedetails tables
+        columns = {row[1] for row in writer.execute("PRAGMA table_info(filedetails)")}
+        for column, kind in (('parser_version', 'TEXT'), ('fingerprint', 'INTEGER')):
+            if column not in columns:
+                writer.execute(f"ALTER TABLE filedetails ADD COLUMN {column} {kind}")
+        detailindexes(writer) # Indexes of the search filters
 
-        # Commit changes and close connection
-        conn.commit()
-        conn.close()
\ No newline at end of file
+    def save_details(self, details, writer):
+        '''
+        Save details to the database.
+
+        :param details: List of (file_id, title, year, resolution, codec, parser_version, fingerprint) tuples
+        :param writer: Writer object
+        '''
+        # Insert or replace details into the details table
+        writer.insert('filedetails', DETAIL_COLUMNS, details, conflict='REPLACE')
\ No newline at end of file
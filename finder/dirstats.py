@@ -0,0 +1,148 @@
+from collections import Counter, namedtuple
+
+'''
+dirstats.py is a module that provides the DirStats class, the per-directory totals of the finder package.
+
+The dir_stats table holds the number and total size of the files under every directory, at any
+depth, and the dir_resolutions table their breakdown by resolution, so the totals of a folder are a
+single primary key lookup however many files it holds. They are kept up to date incrementally: each
+filesteps row records the size and resolution it added to the totals of its directory and all its
+ancestors, so a file whose step is replaced or deleted takes away exactly what it added.
+
+Changes are first summed per directory and resolution into a temporary table of deltas, then rolled
+up through the parent ids of the directories table by one recursive query, so the cost of a batch
+grows with the number of directories it touches, not with the number of files times their depth.
+'''
+
+# Totals of the files under a directory: number, size in bytes, and (files, size) tuples by resolution, None for unknown
+Folder = namedtuple('Folder', ['dirpath', 'files', 'size', 'resolutions'])
+
+# Columns of the filesteps table, with the size and resolution counted in the totals
+STEP_COLUMNS = ['filepath_id', 'dir_id', 'size', 'resolution']
+
+# Maximum number of ids bound to a single query
+BATCH_IDS = 900
+
+
+class DirStats:
+    '''Initialize DirStats class.'''
+    def create(self, writer):
+        '''
+        Create the dir_stats and dir_resolutions tables if they do not exist.
+
+        :param writer: Writer object
+        '''
+        writer.execute("""
+        CREATE TABLE IF NOT EXISTS dir_stats (
+            dir_id INTEGER PRIMARY KEY,
+            files INTEGER NOT NULL,
+            size INTEGER NOT NULL
+        )""")
+        writer.execute("""
+        CREATE TABLE IF NOT EXISTS dir_resolutions (
+            dir_id INTEGER,
+            resolution TEXT,
+            files INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY(dir_id, resolution)
+        ) WITHOUT ROWID""")
+
+    def steps(self, ids, writer):
+        '''
+        Get the counted steps of files.
+
+        :param ids: List of filepaths ids
+        :param writer: Writer object
+        :return: Dictionary of filepaths id to (dir_id, size, resolution) tuple, for the files counted in the totals
+        '''
+        counted = {}
+        for i in range(0, len(ids), BATCH_IDS):
+            chunk = ids[i:i + BATCH_IDS]
+            rows = writer.execute(f"SELECT filepath_id, dir_id, size, resolution FROM filesteps WHERE filepath_id IN ({', '.join('?' * len(chunk))}) AND size IS NOT NULL", chunk)
+            counted.update((filepath_id, (dir_id, size, resolution)) for filepath_id, dir_id, size, resolution in rows)
+        return counted
+
+    def update(self, ids, steps, writer):
+        '''
+        Replace the counted steps of files by new ones, before the filesteps table is written.
+
+        :param ids: List of the filepaths ids whose current steps are replaced or deleted
+        :param steps: List of the new (filepath_id, dir_id, size, resolution) steps
+        :param writer: Writer object
+        '''
+        files, sizes = Counter(), Counter()
+        for dir_id, size, resolution in self.steps(list(ids), writer).values():
+            files[dir_id, resolution] -= 1
+            sizes[dir_id, resolution] -= size
+        for filepath_id, dir_id, size, resolution in steps:
+            files[dir_id, resolution] += 1
+            sizes[dir_id, resolution] += size
+        deltas = [(dir_id, resolution, files[dir_id, resolution], sizes[dir_id, resolution]) for dir_id, resolution in files]
+        self.apply(deltas, writer)
+
+    def resize(self, sizes, writer):
+        '''
+        Count the new sizes of modified files in the totals of their directories.
+
+        :param sizes: List of (filepath_id, size) tuples
+        :param writer: Writer object
+        '''
+        with writer.transaction():
+            counted = self.steps([filepath_id for filepath_id, size in sizes], writer)
+            steps = [(filepath_id, counted[filepath_id][0], size or 0, counted[filepath_id][2]) for filepath_id, size in sizes if filepath_id in counted]
+            if steps:
+                self.update([step[0] for step in steps], steps, writer)
+                writer.insert('filesteps', STEP_COLUMNS, steps, conflict='REPLACE')
+
+    def apply(self, deltas, writer):
+        '''
+        Add per-directory deltas to the totals of the directories and all their ancestors.
+
+        :param deltas: List of (dir_id, resolution, files, size) tuples
+        :param writer: Writer object
+        '''
+        deltas = [delta for delta in deltas if delta[2] or delta[3]]
+        if not deltas:
+            return
+        self.temporary(writer)
+        writer.conn.executemany("INSERT INTO temp.dirdeltas VALUES (?, ?, ?, ?)", deltas)
+        self.rollup(writer)
+
+    def temporary(self, writer):
+        '''
+        Create the temporary table of the deltas of the directories, once per connection.
+
+        :param writer: Writer object
+        '''
+        writer.execute("CREATE TEMP TABLE IF NOT EXISTS dirdeltas (dir_id INTEGER, resolution TEXT, files INTEGER, size INTEGER)")
+
+    def rollup(self, writer):
+        '''
+        Roll the rows of the temporary table of deltas up through the ancestors of their directories and add them to the totals.
+
+        :param writer: Writer object
+        '''
+        writer.execute("DROP TABLE IF EXISTS temp.dirrollup")
+        writer.execute("""
+        CREATE TEMP TABLE dirrollup AS
+        WITH RECURSIVE up(dir_id, resolution, files, size) AS (
+            SELECT dir_id, COALESCE(resolution, ''), SUM(files), SUM(size) FROM temp.dirdeltas GROUP BY 1, 2
+            UNION ALL
+            SELECT d.parent_id, up.resolution, up.files, up.size
+            FROM up JOIN directories d ON d.id = up.dir_id WHERE d.parent_id IS NOT NULL
+        )
+        SELECT dir_id, resolution, SUM(files) AS files, SUM(size) AS size FROM up GROUP BY 1, 2""")
+        writer.execute("""
+        INSERT INTO dir_stats (dir_id, files, size)
+        SELECT dir_id, SUM(files), SUM(size) FROM temp.dirrollup WHERE true GROUP BY dir_id
+        ON CONFLICT(dir_id) DO UPDATE SET files = files + excluded.files, size = size + excluded.size""")
+        writer.execute("""
+        INSERT INTO dir_resolutions (dir_id, resolution, files, size)
+        SELECT dir_id, resolution, files, size FROM temp.dirrollup WHERE true
+        ON CONFLICT(dir_id, resolution) DO UPDATE SET files = files + excluded.files, size = size + excluded.size""")
+
+        # Drop the totals of the directories left without files
+        writer.execute("DELETE FROM dir_stats WHERE files = 0 AND dir_id IN (SELECT dir_id FROM temp.dirrollup)")
+        writer.execute("DELETE FROM dir_resolutions WHERE files = 0 AND dir_id IN (SELECT dir_id FROM temp.dirrollup)")
+        writer.execute("DELETE FROM temp.dirdeltas")
+        writer.execute("DROP TABLE temp.dirrollup")
\ No newline at end of file
@@ -0,0 +1,209 @@
+import re
+import sqlite3
+import random
+import hashlib
+from functools import lru_cache
+from collections import namedtuple, Counter
+from . import parser
+from .writer import DATABASE
+
+'''
+duplicates.py is a module that provides the DuplicateFinder class, which groups the copies of the same film.
+
+Titles of the filedetails table are normalized, dropping the ignored words and release tags of the
+title rules of the parser module, and the files sharing a normalized title and year are grouped at
+once. Files left without a title, like "1080p.2019.mp4", are never grouped. The distinct titles are then compared without comparing every pair: each title
+gets a MinHash signature of its character trigrams, signatures are cut into bands, and only titles
+of the same or nearby years sharing a band are compared, by the Jaccard similarity of their
+trigrams. Titles similar enough are merged into one group with a union-find.
+
+Each group is reported with its most common title and its best copy, the one with the highest
+resolution, then the most efficient codec, then the largest file.
+'''
+
+# Shape of the MinHash signatures: BANDS bands of ROWS values
+BANDS = 10
+ROWS = 3
+
+# Random permutations of the trigram hashes, as XOR masks, fixed so that groups are the same from run to run
+MASKS = [random.Random(seed).getrandbits(64) for seed in range(BANDS * ROWS)]
+
+# Rank of the codecs, from the least to the most efficient
+CODECS = {'DivX': 1, 'XviD': 1, 'x264': 2, 'x265': 3}
+
+# Characters that are not part of a word
+NONWORD = re.compile(r'[\W_]+')
+
+# A copy of a film
+Copy = namedtuple('Copy', ['file_id', 'filepath', 'title', 'year', 'resolution', 'codec', 'size'])
+
+# A group of copies of the same film, with its best copy
+Duplicate = namedtuple('Duplicate', ['title', 'year', 'best', 'copies'])
+
+
+# Function to normalize a title
+def normalize(title):
+    '''
+    Normalize a title for comparison: lower case, words only without ignored words and release tags, single spaces.
+    Titles made only of tags, like "x265", are normalized to an empty title.
+
+    :param title: Title
+    :return: Normalized title
+    '''
+    return ' '.join(parser.RULES.words(NONWORD.sub(' ', (title or '').casefold()).split(), keep=False))
+
+
+# Function to split a title into character trigrams
+def trigrams(title):
+    '''
+    Split a normalized title into character trigrams, padded so that short titles have some.
+
+    :param title: Normalized title
+    :return: Set of trigrams
+    '''
+    padded = f' {title} '
+    return {padded[i:i + 3] for i in range(max(len(padded) - 2, 1))}
+
+
+# Function to hash a trigram
+@lru_cache(maxsize=65536)
+def trigramhash(shingle):
+    '''
+    Hash a trigram to 64 bits. Titles share few distinct trigrams, so hashes are cached.
+
+    :param shingle: Trigram
+    :return: 64-bit integer
+    '''
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'big')
+
+
+# Function to compute the MinHash signature of a set of trigrams
+def signature(shingles):
+    '''
+    Compute the MinHash signature of a set of trigrams.
+    Two sets agree on a value of their signatures with a probability equal to their Jaccard similarity.
+
+    :param shingles: Set of trigrams
+    :return: Tuple of BANDS * ROWS values
+    '''
+    hashes = [trigramhash(shingle) for shingle in shingles]
+    return tuple(min(map(mask.__xor__, hashes)) for mask in MASKS)
+
+
+# Function to rank the quality of a copy
+def quality(copy):
+    '''
+    Rank the quality of a copy: resolution, then codec, then size.
+
+    :param copy: Copy record
+    :return: Sortable tuple, higher is better
+    '''
+    resolution = int(copy.resolution[:-1]) if copy.resolution and copy.resolution[:-1].isdigit() else 0
+    return (resolution, CODECS.get(copy.codec, 0), copy.size or 0, -copy.file_id)
+
+
+class DuplicateFinder:
+    '''Initialize DuplicateFinder class.'''
+    def __init__(self, database=DATABASE):
+        self.database = database # Database path
+        self.parents = {} # Union-find parent of each (title, year) key
+        self.years = {} # Representative key to (first, last) year of its group
+
+    def root(self, key):
+        '''
+        Find the representative key of the group of a key.
+
+        :param key: (normalized title, year) key
+        :return: Representative key
+        '''
+        parent = self.parents.setdefault(key, key)
+        while parent != key:
+            grandparent = self.parents[parent]
+            self.parents[key] = grandparent # Path halving
+            key, parent = parent, grandparent
+        return key
+
+    def union(self, first, second, tolerance):
+        '''
+        Merge the groups of two keys, unless the years of the merged group would span more than the tolerance.
+        This keeps remakes a few years apart from being chained into one group.
+
+        :param first: (normalized title, year) key
+        :param second: (normalized title, year) key
+        :param tolerance: Maximum difference of years in a group
+        '''
+        first, second = self.root(first), self.root(second)
+        if first == second:
+            return
+        years = self.years.get(first, (first[1], first[1])) + self.years.get(second, (second[1], second[1]))
+        if all(isinstance(year, int) for year in years):
+            years = (min(years), max(years))
+            if years[1] - years[0] > tolerance:
+                return
+            self.years[first] = years
+        self.parents[second] = first
+
+    def find(self, threshold=0.7, tolerance=1):
+        '''
+        Find the groups of copies of the same film.
+
+        :param threshold: Minimum Jaccard similarity of the title trigrams of two copies
+        :param tolerance: Maximum difference of years of two copies, 0 for the same year only
+        :return: List of Duplicate records, largest groups first
+        '''
+        conn = sqlite3.connect(self.database)
+        try:
+            # Group the files by normalized title and year
+            files = {} # Key to list of file ids
+            for file_id, title, year in conn.execute("SELECT file_id, title, year FROM filedetails"):
+                title = normalize(title)
+                if title: # Files without a usable title are not copies of anything
+                    files.setdefault((title, year), []).append(file_id)
+            self.parents = {key: key for key in files}
+            self.years = {}
+
+            # Compare the distinct titles sharing a band of their signatures, year by year
+            buckets = {} # (year, band, values) to list of keys
+            shingles = {} # Key to set of trigrams
+            signatures = {} # Normalized title to signature, shared by the years of a title
+            for key in sorted(files, key=lambda key: (key[1] is None, key[1] or 0, key[0])):
+                title, year = key
+                shingles[key] = trigrams(title)
+                values = signatures.get(title) or signatures.setdefault(title, signature(shingles[key]))
+                years = [year - near for near in range(tolerance + 1)] if isinstance(year, int) else [year] # Earlier years are bucketed already
+                candidates = set()
+                for band in range(BANDS):
+                    part = values[band * ROWS:(band + 1) * ROWS]
+                    for near in years:
+                        candidates.update(buckets.get((near, band, part), ()))
+                    buckets.setdefault((year, band, part), []).append(key)
+                for candidate in candidates:
+                    if self.root(candidate) == self.root(key):
+                        continue
+                    other = shingles[candidate]
+                    if len(shingles[key] & other) >= threshold * len(shingles[key] | other):
+                        self.union(key, candidate, tolerance)
+
+            # Collect the groups with more than one file
+            groups = {}
+            for key, ids in files.items():
+                groups.setdefault(self.root(key), []).extend(ids)
+            groups = [ids for ids in groups.values() if len(ids) > 1]
+
+            # Report each group with its best copy
+            duplicates = []
+            for ids in groups:
+                copies = [Copy(*row) for row in conn.execute(f"""
+                SELECT d.file_id, f.filepath, d.title, d.year, d.resolution, d.codec, f.size
+                FROM filedetails d JOIN filepaths f ON f.id = d.file_id
+                WHERE d.file_id IN ({', '.join(['?'] * len(ids))})""", ids)]
+                if len(copies) < 2:
+                    continue
+                copies.sort(key=quality, reverse=True)
+                title = Counter(copy.title for copy in copies).most_common(1)[0][0] # Most common spelling
+                duplicates.append(Duplicate(title, copies[0].year, copies[0], copies))
+        finally:
+            conn.close()
+
+        duplicates.sort(key=lambda duplicate: (-len(duplicate.copies), duplicate.title or '', duplicate.best.file_id))
+        return duplicates
\ No newline at end of file
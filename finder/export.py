@@ -0,0 +1,173 @@
+import os
+import glob
+import shutil
+import sqlite3
+import tempfile
+import pandas as pd
+from .writer import DATABASE
+
+'''
+export.py is a module that exports the catalog to columnar files for analytics, with pandas and pyarrow.
+
+The Exporter class streams the filepaths table joined with the details and the directory of every
+file out of SQLite in large chunks, converts each chunk to a typed pandas DataFrame, with categorical
+resolutions and codecs, and writes them as a Parquet or Arrow IPC dataset partitioned by year
+(year=2018/part-0.parquet, ...), so only one chunk is held in memory whatever the size of the catalog.
+
+The load_catalog function reads an exported dataset back into a DataFrame without touching SQLite.
+Files are memory-mapped, so Arrow IPC files, written uncompressed, are read without copying them, and
+filters on years only open the files of their partitions.
+
+pyarrow is an optional dependency, installed with the export extra, and imported when it is used.
+'''
+
+# Columns of the exported catalog and their pandas dtypes
+CATALOG_DTYPES = {
+    'id': 'int64',
+    'filepath': 'string',
+    'filename': 'string',
+    'filetitle': 'string',
+    'directory': 'string',
+    'size': 'Int64',
+    'mtime': 'float64',
+    'title': 'string',
+    'year': 'Int16',
+    'resolution': 'category',
+    'codec': 'category',
+}
+
+# Catalog query, in id order
+CATALOG_QUERY = """
+SELECT f.id, f.filepath, f.filename, f.filetitle, dr.dirpath AS directory, f.size, f.mtime, d.title, d.year, d.resolution, d.codec
+FROM filepaths f
+LEFT JOIN filedetails d ON d.file_id = f.id
+LEFT JOIN filesteps s ON s.filepath_id = f.id
+LEFT JOIN directories dr ON dr.id = s.dir_id
+ORDER BY f.id"""
+
+# File extensions of the export formats
+FORMATS = {'parquet': 'parquet', 'arrow': 'arrow'}
+
+
+# Function to import pyarrow
+def arrow():
+    '''
+    Import pyarrow and its dataset module, which are only needed to export and load the catalog.
+
+    :return: Tuple of the pyarrow, pyarrow.dataset and pyarrow.fs modules
+    '''
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.fs
+    except ImportError as error:
+        raise ImportError("Exporting the catalog needs pyarrow: pip install 'Finder[export]'") from error
+    return pyarrow, pyarrow.dataset, pyarrow.fs
+
+
+# Function to build the Arrow schema of the catalog
+def schema(pa):
+    '''
+    Build the Arrow schema of the exported catalog, the same for every chunk.
+    Resolutions and codecs are dictionary encoded, like the pandas categories they come from.
+
+    :param pa: pyarrow module
+    :return: pyarrow.Schema
+    '''
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('id', pa.int64()),
+        ('filepath', pa.string()),
+        ('filename', pa.string()),
+        ('filetitle', pa.string()),
+        ('directory', pa.string()),
+        ('size', pa.int64()),
+        ('mtime', pa.float64()),
+        ('title', pa.string()),
+        ('year', pa.int16()),
+        ('resolution', dictionary),
+        ('codec', dictionary),
+    ])
+
+
+class Exporter:
+    '''Initialize Exporter class.'''
+    def __init__(self, database=DATABASE, chunksize=100000):
+        self.database = database # Database path
+        self.chunksize = chunksize # Number of rows read at a time
+
+    def frames(self):
+        '''
+        Read the catalog chunk by chunk as typed DataFrames.
+
+        :return: Generator of pandas DataFrames with the columns and dtypes of CATALOG_DTYPES
+        '''
+        conn = sqlite3.connect(self.database)
+        try:
+            for frame in pd.read_sql_query(CATALOG_QUERY, conn, chunksize=self.chunksize):
+                yield frame.astype(CATALOG_DTYPES)
+        finally:
+            conn.close()
+
+    def export(self, path, format='parquet'):
+        '''
+        Export the catalog to a dataset partitioned by year, replacing an earlier export at the same path.
+        The dataset is written next to the path and moved in place once it is complete.
+
+        :param path: Directory of the dataset
+        :param format: 'parquet' or 'arrow' for Arrow IPC files
+        :return: Number of files exported
+        '''
+        if format not in FORMATS:
+            raise ValueError(f"Unknown export format {format!r}, expected one of {', '.join(FORMATS)}")
+        pa, ds = arrow()[:2]
+        path = os.path.abspath(path)
+        if os.path.exists(path) and not all(name.startswith('year=') for name in os.listdir(path)):
+            raise FileExistsError(f"{path} exists and is not an exported catalog")
+        target = schema(pa)
+
+        # Convert every DataFrame to record batches of the catalog schema as they are read
+        exported = 0
+        def batches():
+            nonlocal exported
+            for frame in self.frames():
+                exported += len(frame)
+                yield from pa.Table.from_pandas(frame, schema=target, preserve_index=False).to_batches()
+
+        staging = tempfile.mkdtemp(prefix='.export-', dir=os.path.dirname(path))
+        try:
+            ds.write_dataset(
+                batches(), staging, schema=target, format='parquet' if format == 'parquet' else 'ipc',
+                partitioning=ds.partitioning(pa.schema([('year', pa.int16())]), flavor='hive'),
+                basename_template=f'part-{{i}}.{FORMATS[format]}', existing_data_behavior='overwrite_or_ignore',
+            )
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.replace(staging, path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return exported
+
+
+# Function to load an exported catalog
+def load_catalog(path, columns=None, years=None):
+    '''
+    Load an exported catalog into a DataFrame, memory-mapping its files.
+
+    :param path: Directory of the dataset written by the Exporter class
+    :param columns: List of columns to load, or None for all columns
+    :param years: List of years to load, or None for all years. Files without a year are loaded with None
+    :return: pandas DataFrame with categorical resolutions and codecs
+    '''
+    pa, ds, fs = arrow()
+    path = os.path.abspath(path)
+    format = 'parquet' if glob.glob(os.path.join(glob.escape(path), '*', '*.parquet')) else 'ipc'
+    dataset = ds.dataset(path, format=format, partitioning=ds.partitioning(pa.schema([('year', pa.int16())]), flavor='hive'), filesystem=fs.LocalFileSystem(use_mmap=True))
+    condition = None
+    if years is not None:
+        condition = ds.field('year').isin([year for year in years if year is not None])
+        if None in years:
+            condition = condition | ds.field('year').is_null()
+    table = dataset.to_table(columns=columns or list(CATALOG_DTYPES), filter=condition) # Columns in catalog order, the year as well
+    return table.to_pandas(types_mapper={pa.int16(): pd.Int16Dtype(), pa.int64(): pd.Int64Dtype()}.get).astype({column: dtype for column, dtype in CATALOG_DTYPES.items() if column in table.column_names})
\ No newline at end of file
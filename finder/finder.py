@@ -1,7 +1,22 @@
+import os
+import sys
 import argparse
+import threading
 from .pathfinder import PathFinder
 from .stepextractor import StepExtractor
 from .detailsextractor import DetailsExtractor
+from .pipeline import Pipeline
+from .tree import DirectoryTree
+from .parser import parse, refresh
+from .metrics import Metrics
+from .duplicates import DuplicateFinder
+from .hasher import FileHasher
+from .metadataextractor import MetadataExtractor
+from .shards import Shards
+from .journal import Journal
+from . import aio
+from .watcher import Watcher
+from .writer import Writer, DATABASE
 
 '''
 Finder class is the main class for the finder module.
@@ -24,48 +39,361 @@ The Finder class provides a method for finding files in a directory tree that ma
 
 class Finder:
     '''Initialize Finder class'''
-    def __init__(self):
-        pass
+    def __init__(self, database=DATABASE, batch_size=1000, metrics=None):
+        self.database = database # Database path
+        self.batch_size = batch_size # Number of rows written per transaction
+        self.metrics = metrics or Metrics() # Stage timers and counters, added up over all runs
+        self.lock = threading.Lock() # Serializes the batches of concurrent async runs
+        self.tree = DirectoryTree() # Directory nodes shared by concurrent async runs
+        self.active = 0 # Number of async runs in progress
+
+    def run(self, directory, extensions, check_empty=False, jobs=1, stream=False, depth=8, resume=False):
+        '''
+        Run the Finder process
+
+        :param directory: Directory to search for files
+        :param extensions: File extensions to search for
+        :param check_empty: Boolean to check if the tables are empty
+        :param jobs: Number of threads scanning directories and of processes extracting details
+        :param stream: Boolean to find files and extract their steps and details in a single pass
+        :param depth: Maximum number of scanned directories waiting to be written in stream mode
+        :param resume: Boolean to resume the last interrupted run of the directory from its checkpoints
+        '''
+
+        refresh() # Pick up edited title rules
+
+        # All stages share one batched writer
+        with Writer(self.database, batch_size=self.batch_size, metrics=self.metrics) as writer, self.metrics.cache(parse):
+
+            # Record the progress of the run, or resume it
+            journal = Journal(writer).start(directory, extensions, resume=resume)
+
+            # Find files and extract their steps and details batch by batch: Pipeline
+            if stream:
+                with self.metrics.stage('stream'):
+                    found = Pipeline(writer, directory, depth=depth, journal=journal).run(os.path.normpath(directory), extensions, jobs=jobs)
+                journal.advance('done', writer)
+                print(f"{found} files found, steps and details extracted and saved to database") # Debug print
+                return
+
+            # Find files in directory: PathFinder
+            pathfinder = PathFinder(filepath=directory, writer=writer, database=self.database)
+
+            # Find files in directory tree
+            if not journal.reached('find'):
+                with self.metrics.stage('find'):
+                    files = pathfinder.find(path=directory, extensions=extensions, check_empty=check_empty, jobs=jobs, journal=journal)
+                journal.advance('steps', writer)
+                print("Files found and saved to database")  # Debug print
+
+            # Extract directory steps from file paths: StepExtractor
+            stepextractor = StepExtractor(writer=writer, database=self.database, tree=pathfinder.tree)
+
+            # Extract directory steps
+            if not journal.reached('steps'):
+                with self.metrics.stage('steps'):
+                    stepextractor.extract(check_empty=check_empty, journal=journal)
+                journal.advance('details', writer)
+                print("Directory steps extracted and saved to database")  # Debug print
+
+            # Extract details from file paths: DetailsExtractor
+            detailsextractor = DetailsExtractor(writer=writer, database=self.database)
+
+            # Extract details from filenames
+            with self.metrics.stage('details'):
+                detailsextractor.extract(check_empty=check_empty, jobs=jobs, journal=journal)
+            journal.advance('done', writer)
+            print("Details extracted and saved to database") # Debug print
+
+    def run_many(self, roots, extensions, jobs=os.cpu_count(), threads=1):
+        '''
+        Run the Finder process on many directory trees at once, each part scanned in its own worker process.
+        Workers write to private shard databases, merged into the database as they finish, so they never wait for its lock.
+
+        :param roots: List of directories to search for files
+        :param extensions: File extensions to search for
+        :param jobs: Number of worker processes
+        :param threads: Number of threads scanning directories in each worker
+        :return: Number of shards merged
+        '''
+        refresh() # Pick up edited title rules, inherited by the worker processes
+        with self.metrics.stage('shards'):
+            merged = Shards(self.database, batch_size=self.batch_size, metrics=self.metrics).run(roots, extensions, jobs=jobs, threads=threads)
+        if not self.active:
+            self.tree = DirectoryTree() # Directory ids assigned by the merge
+        print(f"{merged} shards scanned and merged into the database") # Debug print
+        return merged
+
+    async def arun(self, directory, extensions, jobs=1, depth=8, timeout=None, progress=None, executor=None):
+        '''
+        Run the Finder process in stream mode without blocking the event loop.
+        Several directory trees can be indexed at once by the same Finder object, their batches are written one at a time.
+
+        :param directory: Directory to search for files
+        :param extensions: File extensions to search for
+        :param jobs: Number of threads scanning directories
+        :param depth: Maximum number of scanned directories waiting to be written
+        :param timeout: Seconds before the run is stopped with TimeoutError, or None. Committed batches are kept
+        :param progress: Function called with every Progress event, or None
+        :param executor: concurrent.futures executor bounding the number of blocking runs, or None for the default executor
+        :return: Last Progress event, with the numbers of directories and files saved
+        '''
+        event = None
+        async for event in self.aevents(directory, extensions, jobs=jobs, depth=depth, timeout=timeout, executor=executor):
+            if progress:
+                progress(event)
+        return event
+
+    def aevents(self, directory, extensions, jobs=1, depth=8, timeout=None, executor=None):
+        '''
+        Run the Finder process in stream mode, as an async stream of Progress events.
+        A Progress event of the root directory, the directories scanned and the files saved follows every committed batch.
+
+        :param directory: Directory to search for files
+        :param extensions: File extensions to search for
+        :param jobs: Number of threads scanning directories
+        :param depth: Maximum number of scanned directories waiting to be written
+        :param timeout: Seconds before the run is stopped with TimeoutError, or None
+        :param executor: concurrent.futures executor, or None for the default executor
+        :return: Async generator of Progress events, the last one with done set
+        '''
+        return aio.events(self, directory, extensions, jobs=jobs, executor=executor, depth=depth, timeout=timeout)
+
+    def ascan(self, directory, extensions, jobs=1, depth=8, timeout=None, executor=None):
+        '''
+        Find files in a directory tree without blocking the event loop or saving them.
+
+        :param directory: Directory to search for files
+        :param extensions: File extensions to search for
+        :param jobs: Number of threads scanning directories
+        :param depth: Maximum number of scanned directories waiting to be consumed
+        :param timeout: Seconds before the scan is stopped with TimeoutError, or None
+        :param executor: concurrent.futures executor, or None for the default executor
+        :return: Async generator of (filepath, filename, filetitle) tuples
+        '''
+        return aio.scan(directory, extensions, jobs=jobs, executor=executor, depth=depth, timeout=timeout)
+
+    def duplicates(self, threshold=0.7, tolerance=1):
+        '''
+        Find the files that are copies of the same film, by their titles and years in the filedetails table.
+        Titles are compared by MinHash within blocks of years, so the catalog is not compared pair by pair.
+
+        :param threshold: Minimum similarity of two titles, from 0 to 1
+        :param tolerance: Maximum difference of years of two copies
+        :return: List of Duplicate records of title, year, best copy and all copies, best copy first
+        '''
+        with self.metrics.stage('duplicates'):
+            return DuplicateFinder(self.database).find(threshold=threshold, tolerance=tolerance)
+
+    def hash(self, jobs=4):
+        '''
+        Hash the content of the files that may be copies of another file, to find renamed copies.
+        Only files sharing a size are read, in part first, and hashes of unchanged files are reused.
+
+        :param jobs: Number of files read at once
+        :return: List of Identical records of digest, size and (file_id, filepath) tuples, most wasted space first
+        '''
+        with Writer(self.database, batch_size=self.batch_size, metrics=self.metrics) as writer:
+            hasher = FileHasher(writer=writer, database=self.database, jobs=jobs)
+            with self.metrics.stage('hash'):
+                counts = hasher.hash()
+            print(f"Hash: {counts['partial']} partial, {counts['full']} full, {counts['cached']} cached") # Debug print
+            return hasher.identical()
 
-    def run(self, directory, extensions, check_empty=False):
-        '''Run the Finder process'''
+    def probe(self, jobs=8):
+        '''
+        Read the real width, height, codec, duration and bitrate of the files from their container headers.
+        Only new and changed files are read, a few KB each, and the results are saved to the filemetadata table.
 
-        # Find files in directory: PathFinder
-        pathfinder = PathFinder(filepath=directory)
+        :param jobs: Number of files read at once
+        :return: Dictionary of the numbers of files probed and found in the cache
+        '''
+        with Writer(self.database, batch_size=self.batch_size, metrics=self.metrics) as writer, self.metrics.stage('probe'):
+            counts = MetadataExtractor(writer=writer, database=self.database, jobs=jobs).extract()
+        print(f"Probe: {counts['probed']} probed, {counts['cached']} cached") # Debug print
+        return counts
 
-        # Find files in directory tree
-        files = pathfinder.find(path=directory, extensions=extensions, check_empty=check_empty)
-        print("Files found and saved to database")  # Debug print
+    def export(self, path, format='parquet', chunksize=100000):
+        '''
+        Export the catalog to a Parquet or Arrow IPC dataset partitioned by year, for analytics without SQLite.
 
-        # Extract directory steps from file paths: StepExtractor
-        stepextractor = StepExtractor()
+        :param path: Directory of the dataset
+        :param format: 'parquet' or 'arrow'
+        :param chunksize: Number of rows read and converted at a time
+        :return: Number of files exported
+        '''
+        from .export import Exporter # pandas and pyarrow are only imported to export
+        with self.metrics.stage('export'):
+            exported = Exporter(database=self.database, chunksize=chunksize).export(path, format=format)
+        self.metrics.count('exported', exported)
+        print(f"{exported} files exported to {path}") # Debug print
+        return exported
 
-        # Extract directory steps
-        stepextractor.extract(check_empty=check_empty)
-        print("Directory steps extracted and saved to database")  # Debug print
+    def rescan(self, directory, extensions):
+        '''
+        Rescan a directory tree indexed by the run method, skipping the directories that did not change.
+        Steps and details are extracted for the added files only.
 
-        # Extract details from file paths: DetailsExtractor
-        detailsextractor = DetailsExtractor()
+        :param directory: Directory to search for files
+        :param extensions: File extensions to search for, the same as for the run method
+        :return: Dictionary of added, modified and removed file counts
+        '''
+        refresh() # Pick up edited title rules
+        with Writer(self.database, batch_size=self.batch_size, metrics=self.metrics) as writer, self.metrics.cache(parse):
 
-        # Extract details from filenames
-        detailsextractor.extract(check_empty=check_empty)
-        print("Details extracted and saved to database") # Debug print
+            # Find changed files in directory: PathFinder
+            pathfinder = PathFinder(filepath=directory, writer=writer, database=self.database)
+            pathfinder.create(writer)
+            last = writer.execute("SELECT COALESCE(MAX(id), 0) FROM filepaths").fetchone()[0]
+
+            # Rescan directory tree
+            with self.metrics.stage('rescan'):
+                counts = pathfinder.rescan(path=directory, extensions=extensions)
+
+            # Extract directory steps and details of the added files
+            self.extractnew(writer, last, pathfinder)
+            print(f"Rescan: {counts['added']} added, {counts['modified']} modified, {counts['removed']} removed") # Debug print
+
+        return counts
+
+    def watch(self, directory, extensions, debounce=1.0, interval=30.0, polling=False, stop=None):
+        '''
+        Keep the database in sync with a directory tree as files are added, changed or removed.
+        Uses inotify where available and polls the directory modification times otherwise.
+
+        :param directory: Directory to watch
+        :param extensions: File extensions to search for
+        :param debounce: Seconds without events before the pending changes are written
+        :param interval: Seconds between two polls without inotify
+        :param polling: Boolean to poll even if inotify is available
+        :param stop: threading.Event stopping the watcher, or None to run until interrupted
+        '''
+        Watcher(self, directory, extensions, debounce=debounce, interval=interval).run(stop=stop, polling=polling)
+
+    def extractnew(self, writer, last, pathfinder):
+        '''
+        Extract directory steps and details of the files added after a given filepaths id.
+        When the PathFinder found files titled by other title rules, the outdated details of all the files are extracted again,
+        so that the filedetails table agrees with the titles of the filepaths table.
+
+        :param writer: Writer object
+        :param last: Last filepaths id before the files were added
+        :param pathfinder: PathFinder object that added the files, sharing its directory tree
+        '''
+        added = writer.execute("SELECT id, filepath, filename, size FROM filepaths WHERE id > ?", (last,)).fetchall()
+        with self.metrics.stage('steps'):
+            StepExtractor(writer=writer, database=self.database, tree=pathfinder.tree).extract(filepaths=[(file_id, filepath, size) for file_id, filepath, filename, size in added])
+        with self.metrics.stage('details'):
+            detailsextractor = DetailsExtractor(writer=writer, database=self.database)
+            if pathfinder.outdated:
+                detailsextractor.extract(check_empty=True) # The added files as well
+                pathfinder.outdated = False
+            else:
+                detailsextractor.extract(filepaths=[(file_id, filename) for file_id, filepath, filename, size in added])
+
+# Define argument parser function
+def arguments(description):
+    '''Create an argument parser with the arguments shared by all commands'''
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('directory', type=str, help='Directory to search for files')
+    parser.add_argument('extensions', type=str, nargs='+', help='File extensions to search for')
+    parser.add_argument('--database', type=str, default=DATABASE, help='Path of the sqlite3 database')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows written per transaction')
+    return parser
+
+# Define watch function
+def watch(argv):
+    '''Watch function to keep the database in sync with a directory tree'''
+
+    # Parse command-line arguments
+    parser = arguments('Keep the Finder database in sync with a directory tree')
+    parser.prog = 'finder watch'
+    parser.add_argument('--debounce', type=float, default=1.0, help='Seconds without events before changes are written')
+    parser.add_argument('--interval', type=float, default=30.0, help='Seconds between two polls without inotify')
+    parser.add_argument('--polling', action='store_true', help='Poll even if inotify is available')
+    args = parser.parse_args(argv)
+
+    # Watch until interrupted
+    finder = Finder(database=args.database, batch_size=args.batch_size)
+    try:
+        finder.watch(directory=args.directory, extensions=tuple(args.extensions), debounce=args.debounce, interval=args.interval, polling=args.polling)
+    except KeyboardInterrupt:
+        pass
+
+# Define export function
+def export(argv):
+    '''Export function to write the catalog to columnar files'''
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description='Export the Finder catalog to a Parquet or Arrow dataset partitioned by year')
+    parser.prog = 'finder export'
+    parser.add_argument('path', type=str, help='Directory of the exported dataset')
+    parser.add_argument('--format', choices=['parquet', 'arrow'], default='parquet', help='Format of the exported files')
+    parser.add_argument('--chunksize', type=int, default=100000, help='Number of rows read and converted at a time')
+    parser.add_argument('--database', type=str, default=DATABASE, help='Path of the sqlite3 database')
+    args = parser.parse_args(argv)
+
+    Finder(database=args.database).export(args.path, format=args.format, chunksize=args.chunksize)
 
 # Define main function
-def main():
+def main(argv=None):
     '''Main function to run the Finder process'''
+    argv = sys.argv[1:] if argv is None else argv
+
+    # Dispatch subcommands
+    if argv[:1] == ['watch']:
+        return watch(argv[1:])
+    if argv[:1] == ['export']:
+        return export(argv[1:])
 
     # Parse command-line arguments
-    parser = argparse.ArgumentParser(description='Run the Finder process')
-    parser.add_argument('directory', type=str, help='Directory to search for files')
-    parser.add_argument('extensions', type=str, nargs='+', help='File extensions to search for')
-    args = parser.parse_args()
+    parser = arguments('Run the Finder process')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of threads scanning directories and of processes extracting details')
+    parser.add_argument('--rescan', action='store_true', help='Only rescan the directories that changed since the last run')
+    parser.add_argument('--stream', action='store_true', help='Find files and extract their steps and details in a single pass')
+    parser.add_argument('--resume', action='store_true', help='Resume the last interrupted run of the directory from its checkpoints')
+    parser.add_argument('--roots', type=str, nargs='+', default=[], help='More directories to search, scanned with the directory in worker processes')
+    parser.add_argument('--processes', type=int, default=1, help='Number of worker processes scanning the directories into shards')
+    parser.add_argument('--hash', action='store_true', help='Hash the content of the files to find identical copies')
+    parser.add_argument('--probe', action='store_true', help='Read the resolution, codec and duration of the files from their headers')
+    parser.add_argument('--io-jobs', type=int, default=4, help='Number of files read at once when hashing or probing')
+    parser.add_argument('--metrics', choices=['json', 'prometheus'], default=None, help='Print the stage timers and counters in this format')
+    parser.add_argument('--metrics-file', type=str, default=None, help='Write the metrics to this file instead of printing them')
+    parser.add_argument('--profile', type=str, nargs='+', default=[], help="Stages to profile with cProfile, '*' for all")
+    parser.add_argument('--trace-memory', type=str, nargs='+', default=[], help="Stages to trace with tracemalloc, '*' for all")
+    args = parser.parse_args(argv)
 
     # Initialize Finder object
-    finder = Finder()
+    metrics = Metrics(profile=args.profile, memory=args.trace_memory)
+    finder = Finder(database=args.database, batch_size=args.batch_size, metrics=metrics)
+
+    # Rescan only the changed directories
+    if args.rescan:
+        finder.rescan(directory=args.directory, extensions=tuple(args.extensions))
+    elif args.roots or args.processes > 1:
+        # Scan the directories in worker processes
+        finder.run_many(roots=[args.directory] + args.roots, extensions=tuple(args.extensions), jobs=args.processes, threads=args.jobs)
+    else:
+        # Run the Finder process with specified directory and extensions
+        finder.run(directory=args.directory, extensions=tuple(args.extensions), check_empty=True, jobs=args.jobs, stream=args.stream, resume=args.resume)
+
+    # Read the container headers of the new and changed files
+    if args.probe:
+        finder.probe(jobs=args.io_jobs)
+
+    # Report the files with identical content
+    if args.hash:
+        for identical in finder.hash(jobs=args.io_jobs):
+            print(f"{len(identical.files)} identical files of {identical.size} bytes: {', '.join(filepath for file_id, filepath in identical.files)}")
 
-    # Run the Finder process with specified directory and extensions
-    finder.run(directory=args.directory, extensions=tuple(args.extensions), check_empty=True)
+    # Export the metrics
+    if args.metrics or args.metrics_file:
+        output = metrics.prometheus() if args.metrics == 'prometheus' else metrics.json()
+        if args.metrics_file:
+            with open(args.metrics_file, 'w') as file:
+                file.write(output)
+        else:
+            print(output)
 
 # Run main function
 if __name__ == "__main__":
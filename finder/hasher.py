@@ -0,0 +1,212 @@
+import os
+import hashlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from .utils import boundedmap
+from .writer import shared, DATABASE
+
+'''
+hasher.py is a module that provides the FileHasher class, which finds files with the same content.
+
+Only files of the same size can have the same content, so files are first bucketed by size in the
+database and a file of a unique size is never read nor loaded. Files sharing a size get a partial hash of their head, a sample
+of their middle and their tail, and only files sharing a partial hash are read in full. Files are
+read in large blocks by a pool of threads, whose size limits the number of concurrent reads.
+
+Hashes are stored in the filehashes table with the inode, size and modification time of the file
+they were computed from, taken from the open file at hash time. A cached hash is used only while a
+new stat of the file gives the same values, so that a file that did not change is never read again,
+and a file that changed since the last scan of the Finder class is never matched by its old content.
+'''
+
+# Columns of the filehashes table
+HASH_COLUMNS = ['file_id', 'inode', 'size', 'mtime', 'partial', 'full']
+
+# Size of the head, middle and tail blocks of a partial hash, and of the blocks of a full hash
+BLOCK = 1 << 20 # 1 MiB
+READ = 8 << 20 # 8 MiB
+
+# A group of files with the same content
+Identical = namedtuple('Identical', ['digest', 'size', 'files'])
+
+
+# Function to get the inode, size and modification time of a file, run in worker threads
+def identity(filepath):
+    '''
+    Stat a file for the values its hashes are stored with.
+
+    :param filepath: File path
+    :return: (inode, size, mtime) tuple, or None if the file cannot be stat'ed
+    '''
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime)
+
+
+# Function to hash part of a file, run in worker threads
+def partialhash(filepath):
+    '''
+    Hash the head, the middle and the tail of a file.
+    Files of up to three blocks are hashed in full, and their partial hash is their full hash.
+
+    :param filepath: File path
+    :return: Tuple of the hex digest and the (inode, size, mtime) tuple of the open file, or (None, None) if the file cannot be read
+    '''
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(filepath, 'rb', buffering=0) as file:
+            stat = os.fstat(file.fileno())
+            size = stat.st_size
+            if size <= 3 * BLOCK:
+                return fullhash(filepath, file)
+            for offset in (0, (size - BLOCK) // 2, size - BLOCK):
+                file.seek(offset)
+                digest.update(file.read(BLOCK))
+    except OSError:
+        return None, None
+    return 'p' + digest.hexdigest(), (stat.st_ino, size, stat.st_mtime) # Never equal to a full hash
+
+
+# Function to hash a whole file, run in worker threads
+def fullhash(filepath, file=None):
+    '''
+    Hash the whole content of a file.
+
+    :param filepath: File path
+    :param file: File opened in binary mode without buffering, or None to open it
+    :return: Tuple of the hex digest and the (inode, size, mtime) tuple of the open file, or (None, None) if the file cannot be read
+    '''
+    if file is None:
+        try:
+            with open(filepath, 'rb', buffering=0) as file:
+                return fullhash(filepath, file)
+        except OSError:
+            return None, None
+    digest = hashlib.blake2b(digest_size=16)
+    buffer = bytearray(READ)
+    view = memoryview(buffer)
+    try:
+        stat = os.fstat(file.fileno())
+        while True:
+            read = file.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    except OSError:
+        return None, None
+    return digest.hexdigest(), (stat.st_ino, stat.st_size, stat.st_mtime)
+
+
+class FileHasher:
+    '''Initialize FileHasher class.'''
+    def __init__(self, writer=None, database=DATABASE, jobs=4):
+        self.writer = writer # Shared Writer object, or None for a private one
+        self.database = database # Database path
+        self.jobs = jobs # Number of files read at once
+
+    def create(self, writer):
+        '''
+        Create the filehashes table if it does not exist.
+
+        :param writer: Writer object
+        '''
+        writer.execute("""
+        CREATE TABLE IF NOT EXISTS filehashes (
+            file_id INTEGER PRIMARY KEY,
+            inode INTEGER,
+            size INTEGER,
+            mtime REAL,
+            partial TEXT,
+            full TEXT,
+            FOREIGN KEY(file_id) REFERENCES filepaths(id)
+        )""")
+        writer.execute("CREATE INDEX IF NOT EXISTS filehashes_full ON filehashes(full)")
+
+    def hash(self):
+        '''
+        Hash the files of the filepaths table that may have the same content as another file.
+
+        :return: Dictionary of the numbers of files hashed in part, in full, and found in the cache
+        '''
+        counts = {'partial': 0, 'full': 0, 'cached': 0}
+
+        with shared(self.writer, self.database) as writer:
+            self.create(writer)
+
+            # Files sharing a size, bucketed by the database, with their cached hashes
+            candidates = []
+            for file_id, filepath, inode, size, mtime, partial, full in writer.execute("""
+            SELECT f.id, f.filepath, h.inode, h.size, h.mtime, h.partial, h.full
+            FROM filepaths f LEFT JOIN filehashes h ON h.file_id = f.id
+            WHERE f.size IN (SELECT size FROM filepaths WHERE size > 0 GROUP BY size HAVING COUNT(*) > 1)"""):
+                candidates.append([file_id, filepath, inode, size, mtime, partial, full])
+
+            # Keep the cached hashes of the files that did not change since they were hashed, stat'ed now
+            cached = [row for row in candidates if row[5]]
+            for row, stat in zip(cached, boundedmap(identity, [row[1] for row in cached], jobs=self.jobs, executor=ThreadPoolExecutor)):
+                if stat is None or stat != tuple(row[2:5]):
+                    row[5] = row[6] = None
+            counts['cached'] += sum(1 for row in candidates if row[5])
+
+            # Hash the head, middle and tail of the files sharing a size
+            self.compute(candidates, 5, lambda row: partialhash(row[1]), counts, 'partial', writer)
+
+            # Hash in full the files sharing a partial hash
+            partials = {}
+            for row in candidates:
+                if row[5]:
+                    partials.setdefault((row[3], row[5]), []).append(row)
+            candidates = [row for rows in partials.values() if len(rows) > 1 for row in rows if not row[6]]
+            self.compute(candidates, 6, lambda row: fullhash(row[1]), counts, 'full', writer)
+
+        return counts
+
+    def compute(self, rows, column, function, counts, key, writer):
+        '''
+        Compute a hash of the rows missing it in the thread pool, and save them with the stat of the file they were computed from.
+        A full hash of a file that changed since its partial hash is dropped.
+
+        :param rows: List of [file_id, filepath, inode, size, mtime, partial, full] rows, updated in place
+        :param column: Index of the hash in the rows
+        :param function: Function hashing a row, returning a (digest, (inode, size, mtime)) tuple
+        :param counts: Dictionary of counts to update
+        :param key: Key of the counts to update
+        :param writer: Writer object
+        '''
+        missing = [row for row in rows if not row[column]]
+        for row, (digest, stat) in zip(missing, boundedmap(function, missing, jobs=self.jobs, executor=ThreadPoolExecutor)):
+            if digest is None:
+                continue # Unreadable file
+            if key == 'partial':
+                row[2:5] = stat
+            elif stat != tuple(row[2:5]):
+                continue # Changed since its partial hash
+            row[column] = digest
+            if key == 'partial' and not digest.startswith('p'):
+                row[6] = digest # Small files are hashed in full already
+            counts[key] += 1
+            writer.metrics.count('bytes_hashed', min(row[3], 3 * BLOCK) if key == 'partial' else row[3])
+            writer.upsert('filehashes', HASH_COLUMNS, [(row[0], row[2], row[3], row[4], row[5], row[6])], keys=['file_id'])
+
+    def identical(self):
+        '''
+        Report the groups of files with the same content, from the filehashes table.
+
+        :return: List of Identical records of digest, size and (file_id, filepath) tuples, most wasted space first
+        '''
+        with shared(self.writer, self.database) as writer:
+            self.create(writer)
+            groups = {}
+            for digest, size, file_id, filepath in writer.execute("""
+            SELECT h.full, f.size, f.id, f.filepath
+            FROM filehashes h JOIN filepaths f ON f.id = h.file_id
+            WHERE h.full IN (SELECT full FROM filehashes WHERE full IS NOT NULL GROUP BY full HAVING COUNT(*) > 1)
+            AND (h.inode, h.size, h.mtime) IS (f.inode, f.size, f.mtime)
+            ORDER BY h.full, f.id"""):
+                groups.setdefault((digest, size), []).append((file_id, filepath))
+
+        identical = [Identical(digest, size, files) for (digest, size), files in groups.items() if len(files) > 1]
+        identical.sort(key=lambda group: (-group.size * (len(group.files) - 1), group.digest))
+        return identical
\ No newline at end of file
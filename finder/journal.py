@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+
+'''
+journal.py is a module that provides the Journal class, the checkpoints of the runs of the Finder class.
+
+Every run is a row of the runs table, with its directory, its extensions, the stage it reached and the
+last filepaths id saved by the StepExtractor and DetailsExtractor classes. While the walker runs, the
+run_directories table records every directory whose files are saved, and every directory whose whole
+subtree is saved: a directory is complete when it is saved and all its subdirectories are complete.
+
+Checkpoints are buffered by the Writer after the rows they cover, so they are committed in the same
+transaction as their data or in a later one, never before it. A run that is killed is resumed from its
+checkpoints: complete subtrees are not walked again, saved directories are listed again only to find
+their subdirectories, and the extractors start after the last id they saved. The journal of a run is
+deleted when it finishes.
+'''
+
+# Stages of a run, in order
+STAGES = ('find', 'steps', 'details', 'done')
+
+
+class Journal:
+    '''Initialize Journal class.'''
+    def __init__(self, writer):
+        self.writer = writer # Shared Writer object
+        self.run_id = None # Id of the run in the runs table
+        self.stage = STAGES[0] # Stage reached by the run
+        self.last = {} # Stage to last filepaths id saved
+        self.scanned = set() # Directories saved by an earlier attempt of the run
+        self.complete = set() # Directories whose subtree was saved by an earlier attempt of the run
+        self.pending = {} # Directory to number of subdirectories not complete yet, for the directories of this attempt
+
+    def create(self, writer):
+        '''
+        Create the runs and run_directories tables if they do not exist.
+
+        :param writer: Writer object
+        '''
+        writer.execute("""
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            directory TEXT,
+            extensions TEXT,
+            stage TEXT,
+            steps_last INTEGER NOT NULL DEFAULT 0,
+            details_last INTEGER NOT NULL DEFAULT 0,
+            started REAL,
+            finished REAL
+        )""")
+        writer.execute("""
+        CREATE TABLE IF NOT EXISTS run_directories (
+            run_id INTEGER,
+            dirpath TEXT,
+            complete INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(run_id, dirpath)
+        ) WITHOUT ROWID""")
+
+    def start(self, directory, extensions, resume=False):
+        '''
+        Start a run, or resume the last unfinished run of the same directory and extensions.
+        Unfinished runs of the directory that are not resumed are dropped.
+
+        :param directory: Directory of the run
+        :param extensions: File extensions of the run
+        :param resume: Boolean to resume the last unfinished run
+        :return: Journal object
+        '''
+        writer = self.writer
+        self.create(writer)
+        directory = os.path.normpath(directory)
+        extensions = ' '.join(sorted(extensions))
+
+        row = None
+        if resume:
+            row = writer.execute("SELECT id, stage, steps_last, details_last FROM runs WHERE directory = ? AND extensions = ? AND finished IS NULL ORDER BY id DESC LIMIT 1", (directory, extensions)).fetchone()
+        with writer.transaction():
+            for (run_id,) in writer.execute("SELECT id FROM runs WHERE directory = ? AND finished IS NULL AND id IS NOT ?", (directory, row[0] if row else None)).fetchall():
+                writer.execute("DELETE FROM run_directories WHERE run_id = ?", (run_id,))
+                writer.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+            if row:
+                self.run_id, self.stage, self.last['steps'], self.last['details'] = row
+            else:
+                self.run_id = writer.execute("INSERT INTO runs (directory, extensions, stage, started) VALUES (?, ?, ?, ?)", (directory, extensions, STAGES[0], time.time())).lastrowid
+
+        # Load the directories saved by the earlier attempts
+        if row:
+            for dirpath, complete in writer.execute("SELECT dirpath, complete FROM run_directories WHERE run_id = ?", (self.run_id,)):
+                (self.complete if complete else self.scanned).add(sys.intern(dirpath))
+            print(f"Resuming run {self.run_id} at the {self.stage} stage: {len(self.complete)} complete and {len(self.scanned)} saved directories") # Debug print
+        return self
+
+    def reached(self, stage):
+        '''
+        Tell whether the run already went past a stage.
+
+        :param stage: Stage name
+        :return: Boolean
+        '''
+        return STAGES.index(self.stage) > STAGES.index(stage)
+
+    def prune(self, dirpath):
+        '''
+        Tell whether a directory subtree was saved by an earlier attempt, so that the walker skips it.
+
+        :param dirpath: Directory path
+        :return: Boolean
+        '''
+        return dirpath in self.complete
+
+    def saved(self, dirpath):
+        '''
+        Tell whether the files of a directory were saved by an earlier attempt.
+
+        :param dirpath: Directory path
+        :return: Boolean
+        '''
+        return dirpath in self.scanned
+
+    def mark(self, scan, writer):
+        '''
+        Record that the files of a scanned directory are saved, after they are buffered.
+
+        :param scan: Scan tuple from the walker module, with the complete subtrees pruned from its subdirectories
+        :param writer: Writer object
+        '''
+        writer.insert('run_directories', ['run_id', 'dirpath'], [(self.run_id, scan.path)])
+        self.pending[scan.path] = len(scan.dirs)
+        path = scan.path
+        while path in self.pending and not self.pending[path]:
+            # Complete, and so is the parent once its last subdirectory is complete
+            del self.pending[path]
+            writer.upsert('run_directories', ['run_id', 'dirpath', 'complete'], [(self.run_id, path, 1)], keys=['run_id', 'dirpath'])
+            path = os.path.dirname(path)
+            if path in self.pending:
+                self.pending[path] -= 1
+
+    def checkpoint(self, stage, last, writer):
+        '''
+        Record the last filepaths id saved by a stage, after the rows are buffered.
+
+        :param stage: 'steps' or 'details'
+        :param last: Last filepaths id saved
+        :param writer: Writer object
+        '''
+        self.last[stage] = last
+        writer.queue(f"UPDATE runs SET {stage}_last = ? WHERE id = ?", [(last, self.run_id)])
+
+    def advance(self, stage, writer):
+        '''
+        Record that the run reached a stage, once the previous stage is saved.
+        The journal of the run is deleted when it is done.
+
+        :param stage: Stage name
+        :param writer: Writer object
+        '''
+        self.stage = stage
+        with writer.transaction():
+            writer.execute("UPDATE runs SET stage = ?, finished = ? WHERE id = ?", (stage, time.time() if stage == 'done' else None, self.run_id))
+            if stage == 'done' or stage == 'steps':
+                writer.execute("DELETE FROM run_directories WHERE run_id = ?", (self.run_id,)) # The walk is over
\ No newline at end of file
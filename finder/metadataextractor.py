@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+from .utils import boundedmap
+from .probe import probe, LIMIT
+from .writer import shared, DATABASE
+
+'''
+MetadataExtractor class is used to read the real width, height, codec, duration and bitrate of the files in the filepaths table
+from the headers of their containers, with the probe function of the probe module, and saves them to the filemetadata table.
+
+Unlike the DetailsExtractor class, which guesses from the filenames, it reads the files, so it runs in a pool of threads that
+limits the number of files read at once, and it reads at most a few KB of each file. Metadata are stored with the inode
+and modification time of the file they were read from, so that a file that did not change is never probed again.
+'''
+
+# Columns of the filemetadata table
+METADATA_COLUMNS = ['file_id', 'inode', 'mtime', 'width', 'height', 'codec', 'duration', 'bitrate']
+
+
+class MetadataExtractor:
+    '''Initialize MetadataExtractor class.'''
+    def __init__(self, writer=None, database=DATABASE, jobs=8, limit=LIMIT):
+        self.writer = writer # Shared Writer object, or None for a private one
+        self.database = database # Database path
+        self.jobs = jobs # Number of files read at once
+        self.limit = limit # Maximum number of bytes read from a file
+
+    def create(self, writer):
+        '''
+        Create the filemetadata table if it does not exist.
+
+        :param writer: Writer object
+        '''
+        writer.execute("""
+        CREATE TABLE IF NOT EXISTS filemetadata (
+            file_id INTEGER PRIMARY KEY,
+            inode INTEGER,
+            mtime REAL,
+            width INTEGER,
+            height INTEGER,
+            codec TEXT,
+            duration REAL,
+            bitrate INTEGER,
+            FOREIGN KEY(file_id) REFERENCES filepaths(id)
+        )""")
+
+    def probe(self, row):
+        '''
+        Probe a file, run in worker threads.
+
+        :param row: (file_id, filepath, size, mtime, inode) tuple
+        :return: Row of the filemetadata table
+        '''
+        file_id, filepath, size, mtime, inode = row
+        media = probe(filepath, size=size, limit=self.limit)
+        return (file_id, inode, mtime) + (tuple(media) if media else (None,) * 5)
+
+    def extract(self):
+        '''
+        Probe the files of the filepaths table that are new or changed since they were last probed.
+
+        :return: Dictionary of the numbers of files probed and found in the cache
+        '''
+        with shared(self.writer, self.database) as writer:
+            self.create(writer)
+
+            # Files without metadata, or with metadata of an older version of the file
+            rows = writer.execute("""
+            SELECT f.id, f.filepath, f.size, f.mtime, f.inode
+            FROM filepaths f LEFT JOIN filemetadata m ON m.file_id = f.id
+            WHERE m.file_id IS NULL OR (m.inode, m.mtime) IS NOT (f.inode, f.mtime)""").fetchall()
+            cached = writer.execute("SELECT COUNT(*) FROM filepaths").fetchone()[0] - len(rows)
+
+            # Probe them in the thread pool and save them in order
+            for metadata in boundedmap(self.probe, rows, jobs=self.jobs, executor=ThreadPoolExecutor):
+                writer.upsert('filemetadata', METADATA_COLUMNS, [metadata], keys=['file_id'])
+
+        return {'probed': len(rows), 'cached': cached}
\ No newline at end of file
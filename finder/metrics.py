@@ -0,0 +1,203 @@
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+'''
+metrics.py is a module that provides the Metrics class, the instrumentation of the Finder class.
+
+A Metrics object keeps wall and CPU timers per stage (find, steps, details, stream, rescan, and write
+for the time spent in SQLite, which is nested in the other stages) and counters of the directories
+visited, files matched, rows written, parse cache hits and misses and SQL statements executed.
+A progress hook is called with the Metrics object after every batch written and every stage.
+
+Profiling is opt-in per stage: cProfile for the stages listed in profile, and tracemalloc for the
+stages listed in memory. Both slow the stage down, so they are off by default.
+
+The asdict, json and prometheus methods export the metrics, the latter in the Prometheus text format.
+'''
+
+# Counters kept by every Metrics object
+COUNTERS = ['directories', 'files', 'rows', 'statements', 'cache_hits', 'cache_misses']
+
+# Number of entries kept in profiles and memory reports
+TOP = 20
+
+
+class Metrics:
+    '''Initialize Metrics class.'''
+    def __init__(self, progress=None, profile=(), memory=()):
+        self.progress = progress # Function called with the Metrics object after every batch and stage, or None
+        self.profile = set(profile) # Stages profiled with cProfile, '*' for all
+        self.memory = set(memory) # Stages traced with tracemalloc, '*' for all
+        self.stages = {} # Stage name to {'wall', 'cpu', 'calls'} map
+        self.counters = dict.fromkeys(COUNTERS, 0) # Counter name to value map
+        self.profiles = {} # Stage name to cProfile.Profile map
+        self.allocations = {} # Stage name to {'peak', 'top'} map
+        self.lock = threading.Lock() # Stages and counters are updated from worker threads
+        self.profiling = False # Whether a profiler is running, cProfile runs one at a time
+        self.tracing = False # Whether a stage is traced, nested stages are not traced on their own
+
+    def count(self, name, value=1):
+        '''
+        Add to a counter.
+
+        :param name: Counter name
+        :param value: Value to add
+        '''
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def tick(self):
+        '''Call the progress hook.'''
+        if self.progress:
+            self.progress(self)
+
+    @contextmanager
+    def cache(self, function):
+        '''
+        Count the cache hits and misses of a function decorated with functools.lru_cache during a block.
+
+        :param function: Cached function
+        '''
+        before = function.cache_info()
+        try:
+            yield self
+        finally:
+            after = function.cache_info()
+            self.count('cache_hits', after.hits - before.hits)
+            self.count('cache_misses', after.misses - before.misses)
+
+    @contextmanager
+    def stage(self, name):
+        '''
+        Time a stage, profiling it if requested.
+
+        :param name: Stage name
+        '''
+        profiler = self.startprofile(name)
+        tracing = self.starttrace(name)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield self
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            if profiler:
+                profiler.disable()
+                self.profiling = False
+            if tracing is not None:
+                self.stoptrace(name, tracing)
+            with self.lock:
+                timer = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+                timer['wall'] += wall
+                timer['cpu'] += cpu
+                timer['calls'] += 1
+            if name != 'write':
+                self.tick() # Flushes already tick
+
+    def startprofile(self, name):
+        '''
+        Start profiling a stage with cProfile, unless it is not requested or a profiler is running.
+
+        :param name: Stage name
+        :return: cProfile.Profile object, or None
+        '''
+        if not (name in self.profile or '*' in self.profile) or self.profiling:
+            return None
+        profiler = self.profiles.setdefault(name, cProfile.Profile()) # Calls of a stage add up
+        self.profiling = True
+        profiler.enable()
+        return profiler
+
+    def starttrace(self, name):
+        '''
+        Start tracing the memory allocations of a stage with tracemalloc, if requested.
+
+        :param name: Stage name
+        :return: Boolean to stop tracing at the end of the stage, or None if the stage is not traced
+        '''
+        if not (name in self.memory or '*' in self.memory) or self.tracing:
+            return None
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self.tracing = True
+        return started
+
+    def stoptrace(self, name, started):
+        '''
+        Record the peak memory and top allocation sites of a traced stage.
+
+        :param name: Stage name
+        :param started: Boolean to stop tracing, when the stage started it
+        '''
+        peak = tracemalloc.get_traced_memory()[1]
+        top = [str(statistic) for statistic in tracemalloc.take_snapshot().statistics('lineno')[:TOP]]
+        if started:
+            tracemalloc.stop()
+        self.tracing = False
+        allocation = self.allocations.setdefault(name, {'peak': 0, 'top': []})
+        allocation['peak'] = max(allocation['peak'], peak)
+        allocation['top'] = top
+
+    def asdict(self):
+        '''
+        Export the metrics as a dictionary.
+
+        :return: Dictionary of stages, counters, profiles and memory reports
+        '''
+        with self.lock:
+            metrics = {
+                'stages': {name: dict(timer) for name, timer in self.stages.items()},
+                'counters': dict(self.counters),
+            }
+        if self.profiles:
+            metrics['profiles'] = {}
+            for name, profiler in self.profiles.items():
+                text = io.StringIO()
+                pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(TOP)
+                metrics['profiles'][name] = text.getvalue()
+        if self.allocations:
+            metrics['memory'] = {name: dict(allocation) for name, allocation in self.allocations.items()}
+        return metrics
+
+    def json(self):
+        '''
+        Export the metrics as JSON.
+
+        :return: JSON string
+        '''
+        return json.dumps(self.asdict(), indent=2)
+
+    def prometheus(self):
+        '''
+        Export the timers and counters in the Prometheus text format.
+
+        :return: Prometheus text
+        '''
+        metrics = self.asdict()
+        lines = []
+        for key, description in (('wall', 'Wall time spent in a stage'), ('cpu', 'CPU time spent in a stage')):
+            lines.append(f'# HELP finder_stage_{key}_seconds_total {description}.')
+            lines.append(f'# TYPE finder_stage_{key}_seconds_total counter')
+            lines.extend(f'finder_stage_{key}_seconds_total{{stage="{name}"}} {timer[key]:.6f}' for name, timer in metrics['stages'].items())
+        lines.append('# HELP finder_stage_calls_total Number of times a stage ran.')
+        lines.append('# TYPE finder_stage_calls_total counter')
+        lines.extend(f'finder_stage_calls_total{{stage="{name}"}} {timer["calls"]}' for name, timer in metrics['stages'].items())
+        for name, value in metrics['counters'].items():
+            lines.append(f'# HELP finder_{name}_total Number of {name.replace("_", " ")}.')
+            lines.append(f'# TYPE finder_{name}_total counter')
+            lines.append(f'finder_{name}_total {value}')
+        if 'memory' in metrics:
+            lines.append('# HELP finder_stage_peak_memory_bytes Peak memory traced during a stage.')
+            lines.append('# TYPE finder_stage_peak_memory_bytes gauge')
+        for name, allocation in metrics.get('memory', {}).items():
+            lines.append(f'finder_stage_peak_memory_bytes{{stage="{name}"}} {allocation["peak"]}')
+        return '\n'.join(lines) + '\n'
\ No newline at end of file
@@ -0,0 +1,146 @@
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+from .rules import Rules, DEFAULT_RULES
+
+'''
+parser.py is a module that provides a single-pass parser for release-style filenames.
+
+The parse function takes a filename like "Duck.Duck.Goose.2018.720p.BluRay.x264-[YTS.AM].mp4"
+and returns a Release record of its title, year, resolution, codec, source and release group.
+The filename is split once, all patterns are compiled once at import, and results are kept in a
+bounded LRU cache keyed by filename, so a title parsed by the PathFinder class is not parsed again
+by the DetailsExtractor class.
+
+The titlextract, yearextract, resextract and codecextract functions of the utils module are thin
+wrappers around the parse function.
+
+Words ignored in titles, release tags and title fixes are the rules of the rules module, loaded from
+the rules.json file of the package, or from the file named by the FINDER_RULES environment variable.
+The refresh function reloads them when their file changes and clears the cache, so a long-running
+process picks up new rules without a restart, and the version function stamps the parser and the
+rules in use, so that details parsed by another version are extracted again.
+'''
+
+# Parsed details of a filename
+Release = namedtuple('Release', ['title', 'year', 'resolution', 'codec', 'source', 'group'])
+
+# Version of the parse function, to increase whenever a change of this module changes its results
+PARSER_VERSION = 1
+
+# Maximum number of filenames kept in the parse cache
+CACHE_SIZE = 65536
+
+# Title rules in use, replaced as a whole by the reload function
+RULES = Rules.load(os.environ.get('FINDER_RULES') or DEFAULT_RULES)
+
+# Precompiled patterns
+DOTTED_PARENTHESES = re.compile(r'\.\(.*?\)\.') # Parentheses and their contents between dots
+PARENTHESES = re.compile(r'\(.*?\)') # Leftover parentheses and their contents
+SEPARATORS = re.compile(r'[.\s]') # Title word separators
+YEAR = re.compile(r'(19\d{2}|20\d{2})')
+RESOLUTION = re.compile(r'(\d{3,4}p)')
+CODEC = re.compile(r'x264|x265|XviD|DivX')
+SOURCE = re.compile(r'\b(BluRay|Blu-Ray|BRRip|BDRip|WEB-DL|WEBDL|WEBRip|WEB|HDRip|HDTV|DVDRip|DVDScr|Remux)\b', re.IGNORECASE)
+GROUP = re.compile(r'-(?:\[([^\]]+)\]|([A-Za-z0-9]+))$') # Trailing "-GROUP" or "-[GROUP]"
+
+
+# Function to parse a filename
+@lru_cache(maxsize=CACHE_SIZE)
+def parse(filename):
+    '''
+    Parse a filename into a Release record.
+
+    The filename "Duck.Duck.Goose.2018.720p.BluRay.x264-[YTS.AM].mp4" is parsed to
+    Release(title='Duck Duck Goose', year='2018', resolution='720p', codec='x264', source='BluRay', group='YTS.AM').
+
+    :param filename: Filename or path of a file
+    :return: Release record, with None for the details that are not found
+    '''
+    # Remove directories and file extension
+    name = os.path.basename(filename)
+    stem = name.rsplit('.', 1)[0]
+    tagged = stem if '.' in name else '' # Names without an extension carry no tags
+
+    # Remove parentheses and their contents but preserve the surrounding dots
+    words = SEPARATORS.split(PARENTHESES.sub('', DOTTED_PARENTHESES.sub('.', stem)))
+
+    # Extract title up to year
+    title = []
+    for word in words:
+        if word.isnumeric() and len(word) == 4: # If it's a year, stop adding to title
+            break
+        title.append(word)
+    rules = RULES # The same rules for the whole filename, even during a reload
+    title = rules.title(' '.join(rules.words(title))) # Drop ignored words and tags, then fix the title
+
+    # Extract tags
+    year = YEAR.search(tagged)
+    resolution = RESOLUTION.search(tagged)
+    codec = CODEC.search(tagged)
+    source = SOURCE.search(tagged)
+    group = GROUP.search(tagged)
+
+    return Release(
+        title,
+        year.group(0) if year else None,
+        resolution.group(0) if resolution else None,
+        codec.group(0) if codec else None,
+        source.group(0) if source else None,
+        (group.group(1) or group.group(2)) if group else None,
+    )
+
+
+# Function to parse many filenames
+def parse_many(filenames):
+    '''
+    Parse an iterable of filenames.
+
+    :param filenames: Iterable of filenames
+    :return: List of Release records, in the order of the filenames
+    '''
+    return list(map(parse, filenames))
+
+
+# Function to load other title rules
+def reload(path=None):
+    '''
+    Load the title rules from a file and clear the parse cache.
+
+    :param path: Rules file path, or None for the file of the rules in use
+    :return: Rules object
+    '''
+    global RULES
+    RULES = Rules.load(path or RULES.path or DEFAULT_RULES)
+    parse.cache_clear()
+    return RULES
+
+
+# Function to reload the title rules when their file changed
+def refresh():
+    '''
+    Reload the title rules if their file was modified since it was loaded.
+    Rules that fail to load are reported and the rules in use are kept.
+
+    :return: Boolean, whether the rules were reloaded
+    '''
+    if not RULES.changed():
+        return False
+    try:
+        reload()
+    except (OSError, ValueError, TypeError, re.error) as error:
+        print(f"Rules not reloaded: {error}") # Debug print
+        return False
+    print(f"Rules reloaded, version {RULES.version}") # Debug print
+    return True
+
+
+# Function to get the version stamp of the parser and its title rules
+def version():
+    '''
+    Get the version stamp of the parser and of the title rules in use, stored with the details of every file.
+
+    :return: Version string, like "1:1.5e2c0f7a"
+    '''
+    return f'{PARSER_VERSION}:{RULES.version}'
\ No newline at end of file
@@ -1,5 +1,12 @@
 import os
-from .utils import filenaming, save, pathconstruct, titlextract, collect
+from .utils import filenaming, titlextract, fingerprint
+from .parser import version
+from .walker import walk, scandirectory
+from .tree import DirectoryTree
+from .query import searchindex
+from .records import Records
+from .dirstats import DirStats
+from .writer import shared, DATABASE
 
 '''
 pathfinder.py is a module that provides a class for finding files in a directory tree.
@@ -9,20 +16,172 @@ It provides a method for finding files in a directory tree that match a specifie
 The find method takes a directory path and a pattern as arguments, and returns a list 
 of file paths that match the pattern and the file name and file title.
 
+Along with each file, the size, modification time, inode and a fingerprint of the filename are stored in the filepaths table,
+and every visited directory is stored with its modification time in the directories table of the tree module.
+The rescan method uses them to list only the directories that changed since the last scan.
+
+A file is identified by its path. Its title depends on the title rules of the parser module, so each row is stamped
+with the version of the parser it was titled with, and the titles of the rows stamped with another version are derived
+again, in place, before files are saved.
+
 The PathFinder class is used by the Findex class in the finder module to find files in a directory tree for indexing.
 '''
 
+# Columns of the filepaths table written by the PathFinder class
+FILEPATH_COLUMNS = ['filepath', 'filename', 'filetitle', 'size', 'mtime', 'inode', 'dir_id', 'fingerprint', 'title_version', 'scan_id']
+
+# Columns identifying a row of the filepaths table
+FILEPATH_KEYS = ['filepath']
+
+# Tables holding rows derived from a filepaths row, and the column referencing it
+DEPENDENTS = [('filesteps', 'filepath_id'), ('filedetails', 'file_id'), ('filehashes', 'file_id'), ('filemetadata', 'file_id')]
+
+
 class PathFinder:
     '''Initialize PathFinder class'''
-    def __init__(self, filepath):
+    def __init__(self, filepath, writer=None, database=DATABASE, tree=None):
         # Initialize file attributes
         self.filepath = filepath # File path
         self.filename = filenaming(filepath) # File name from the filenaming function in the utils module
         self.filetitle = titlextract(filename=self.filename) # File title from the titlextract function in the titlextract module
-        self.save = save # Save data to a sqlite3 database
+        self.writer = writer # Shared Writer object, or None for a private one
+        self.database = database # Database path
+        self.tree = tree or DirectoryTree() # Directory nodes, shared with the StepExtractor class
+        self.tables = set() # Tables in the database
+        self.stats = DirStats() # Totals of the directories, updated when files change or are deleted
+        self.titled = None # Parser version the stored titles were derived with
+        self.outdated = False # Whether stored files were found stamped with another parser version, so their details are outdated too
+
+    def create(self, writer):
+        '''
+        Create the filepaths and directories tables and load the known directories.
+        Columns missing from a filepaths table created by an older version are added, and its rows are made unique by path.
+
+        :param writer: Writer object
+        '''
+        writer.execute("""
+        CREATE TABLE IF NOT EXISTS filepaths (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filepath,
+            filename,
+            filetitle,
+            size INTEGER,
+            mtime REAL,
+            inode INTEGER,
+            dir_id INTEGER,
+            fingerprint INTEGER,
+            title_version TEXT,
+            scan_id INTEGER,
+            UNIQUE(filepath)
+        )""")
+
+        # Add the stat columns to older filepaths tables
+        columns = {row[1] for row in writer.execute("PRAGMA table_info(filepaths)")}
+        for column, kind in (('size', 'INTEGER'), ('mtime', 'REAL'), ('inode', 'INTEGER'), ('dir_id', 'INTEGER'), ('fingerprint', 'INTEGER'), ('title_version', 'TEXT'), ('scan_id', 'INTEGER')):
+            if column not in columns:
+                writer.execute(f"ALTER TABLE filepaths ADD COLUMN {column} {kind}")
+        if 'fingerprint' not in columns:
+            # Fingerprint the filenames of the older rows once, in SQL
+            writer.conn.create_function('fingerprint', 1, fingerprint, deterministic=True)
+            writer.execute("UPDATE filepaths SET fingerprint = fingerprint(filename)")
+        writer.execute("CREATE INDEX IF NOT EXISTS filepaths_dir_id ON filepaths(dir_id)")
+        writer.execute("CREATE INDEX IF NOT EXISTS filepaths_scan_id ON filepaths(scan_id)")
+        searchindex(writer) # Full-text index of titles and paths, kept up to date by triggers
+
+        # Load the known directories
+        if not self.tree.loaded:
+            self.tree.create(writer)
+        self.tables = {row[0] for row in writer.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.unique(writer)
+        self.retitle(writer)
+
+    def unique(self, writer):
+        '''
+        Make the rows of an older filepaths table, unique by path, title and filename, unique by path.
+        Of the rows of the same path, the last one saved is kept and the others are deleted with their derived rows.
+
+        :param writer: Writer object
+        '''
+        for index in writer.execute("PRAGMA index_list(filepaths)").fetchall():
+            if index[2] and [row[2] for row in writer.execute(f"PRAGMA index_info({index[1]})")] == FILEPATH_KEYS:
+                return # Unique by path already
+        with writer.transaction():
+            ids = [row[0] for row in writer.execute("SELECT id FROM filepaths f WHERE id < (SELECT MAX(id) FROM filepaths g WHERE g.filepath = f.filepath)")]
+            self.remove(ids, writer)
+            writer.execute("CREATE UNIQUE INDEX filepaths_filepath ON filepaths(filepath)")
+        if ids:
+            print(f"Removed {len(ids)} duplicate file paths") # Debug print
+
+    def retitle(self, writer):
+        '''
+        Derive the titles of the stored files again if they were derived by another version of the parser or of its title rules.
+        The outdated attribute is set when stored files are restamped, until the caller extracts their details again.
+
+        :param writer: Writer object
+        '''
+        stamp = version()
+        if self.titled == stamp:
+            return
+        writer.conn.create_function('titlextract', 1, titlextract, deterministic=True)
+        with writer.transaction():
+            retitled = writer.execute("UPDATE filepaths SET filetitle = titlextract(filename) WHERE title_version IS NOT ? AND filetitle IS NOT titlextract(filename)", (stamp,)).rowcount
+            restamped = writer.execute("UPDATE filepaths SET title_version = ? WHERE title_version IS NOT ?", (stamp, stamp)).rowcount
+        self.titled = stamp
+        self.outdated = self.outdated or restamped > 0
+        if retitled:
+            print(f"Retitled {retitled} files for parser version {stamp}") # Debug print
+            writer.metrics.count('retitled', retitled)
+
+    def directory(self, scan, writer):
+        '''
+        Record a scanned directory and its modification time.
+
+        :param scan: Scan tuple from the walker module
+        :param writer: Writer object
+        :return: Directory id
+        '''
+        return self.tree.record(scan.path, scan.mtime, writer)
+
+    def filerows(self, scan, dir_id, scan_id=None):
+        '''
+        Build filepaths rows for the files of a scanned directory.
+
+        :param scan: Scan tuple from the walker module
+        :param dir_id: Directory id
+        :param scan_id: Id of the find call saving the rows, or None
+        :return: List of (filepath, filename, filetitle, size, mtime, inode, dir_id, fingerprint, title_version, scan_id) tuples
+        '''
+        rows = []
+        stamp = version() # Version of the rules the titles are derived with
+        for entry in scan.files:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue # File vanished during the scan
+            rows.append((entry.path, entry.name, titlextract(entry.name), stat.st_size, stat.st_mtime, stat.st_ino, dir_id, fingerprint(entry.name), stamp, scan_id))
+        return rows
+
+    def remove(self, ids, writer):
+        '''
+        Delete files and the rows derived from them, taking them away from the totals of their directories.
+
+        :param ids: List of filepaths ids
+        :param writer: Writer object
+        '''
+        if not ids:
+            return
+        if not self.tables.issuperset(table_title for table_title, column in DEPENDENTS):
+            self.tables = {row[0] for row in writer.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")} # Dependents created since
+        with writer.transaction():
+            if 'dir_stats' in self.tables:
+                self.stats.update(ids, [], writer)
+            for table_title, column in DEPENDENTS:
+                if table_title in self.tables:
+                    writer.delete(table_title, column, ids)
+            writer.delete('filepaths', 'id', ids)
 
     # Find files in a directory tree
-    def find(self, path, extensions, check_empty=False):
+    def find(self, path, extensions, check_empty=False, jobs=1, recursive=True, journal=None):
         '''
         Find files in a directory tree that match a specified pattern.
 
@@ -30,35 +189,169 @@ class PathFinder:
         table called filepaths of file paths that match the pattern and the file name and file title in the sqlite3 database
         classfier/classified.db.
 
+        Each directory is visited exactly once by the walker module, optionally across a thread pool.
+        The rows saved are stamped with a new scan id, so that the records returned are the files matched by this call only,
+        not the files of other extensions or deleted since an earlier scan.
+
         :param path: Directory path
         :param extensions: File extensions to match
         :param check_empty: Boolean to check if the table is empty
-        :return: List of file paths, file names, and file titles
-        '''
-
-        # Initialize file set to ensure uniqueness
-        files = set()
-
-        for root, dirs, filenames in os.walk(path):
-            for filename in filenames:
-                # Check if file extension matches pattern
-                if filename.endswith(extensions):
-                    # Get file path
-                    filepath = pathconstruct(root, filename)
-                    # Get file name
-                    filename = filenaming(filepath)
-                    # Get file title
-                    filetitle = titlextract(filename)
-                    # Add file path, file name, and file title to set
-                    files.add((filepath, filename, filetitle))
-
-            for dir in dirs:
-                # Check if directory is not empty
-                if os.listdir(os.path.join(root, dir)):
-                    # Recursively search directory
-                    files.update(self.find(os.path.join(root, dir), extensions))
-
-        # Save to database
-        for file in files:
-            self.save(columns=['filepath', 'filename', 'filetitle'], values=[file], table_title='filepaths')
-        return list(files)
\ No newline at end of file
+        :param jobs: Number of threads scanning directories
+        :param recursive: Boolean to search the subdirectories as well, otherwise only the files of the directory itself
+        :param journal: Journal object recording the saved directories, whose complete subtrees are not walked again, or None
+        :return: Records of the file paths, file names, and file titles matched by this call, read back from the database when iterated
+        '''
+
+        # Save to database in batches, so that no more than a batch of rows is held in memory
+        with shared(self.writer, self.database) as writer:
+            self.create(writer)
+            scan_id = writer.execute("SELECT COALESCE(MAX(scan_id), 0) + 1 FROM filepaths").fetchone()[0]
+            scans = walk(os.path.normpath(path), extensions, jobs=jobs, prune=journal.prune if journal else None) if recursive else [scandirectory(os.path.normpath(path), tuple(extensions))]
+            for scan in scans:
+                if journal and journal.saved(scan.path):
+                    writer.queue("UPDATE filepaths SET scan_id = ? WHERE dir_id = ?", [(scan_id, self.tree.get(scan.path)[0])]) # Saved by an earlier attempt
+                    journal.mark(scan, writer) # Listed again for its subdirectories only
+                    continue
+                rows = self.filerows(scan, self.directory(scan, writer), scan_id)
+                writer.upsert('filepaths', FILEPATH_COLUMNS, rows, keys=FILEPATH_KEYS)
+                writer.metrics.count('directories')
+                writer.metrics.count('files', len(rows))
+                if journal:
+                    journal.mark(scan, writer) # Buffered after the files of the directory
+            writer.flush() # Readable by the records
+        return Records(path, database=self.database, recursive=recursive, scan_id=scan_id)
+
+    # Rescan a directory tree
+    def rescan(self, path, extensions):
+        '''
+        Rescan a directory tree, listing only the directories that changed since the last scan.
+
+        Directories are stat'ed and compared with the modification times in the directories table.
+        Unchanged directories are not listed and only their known subdirectories are visited.
+        Changed directories are listed: new files are added, files whose size, modification time
+        or inode changed are updated, and files or subdirectories that are gone are deleted.
+        Changes to the content of a file inside an unchanged directory are not detected.
+
+        :param path: Directory path
+        :param extensions: File extensions to match, the same as for the find method
+        :return: Dictionary of added, modified and removed file counts
+        '''
+        return self.update([path], extensions)
+
+    def update(self, dirpaths, extensions, recursive=True):
+        '''
+        Bring the stored files of a set of directories up to date.
+
+        With recursive set, this is the rescan of every given directory tree.
+        Otherwise the given directories are listed even if their modification time did not change,
+        which catches files rewritten in place, and only new subdirectories are visited.
+        Each directory is visited once, even if it is given and is also a new subdirectory of another one.
+
+        :param dirpaths: Iterable of directory paths
+        :param extensions: File extensions to match
+        :param recursive: Boolean to rescan the subdirectories as well
+        :return: Dictionary of added, modified and removed file counts
+        '''
+        extensions = tuple(extensions) # str.endswith needs a tuple
+        counts = {'added': 0, 'modified': 0, 'removed': 0}
+
+        with shared(self.writer, self.database) as writer:
+            if not self.tables:
+                self.create(writer)
+            self.retitle(writer) # Title rules reloaded since the tables were created
+
+            # One transaction, so that the flushes of the stored files read by the sync method do not commit
+            with writer.transaction():
+                stack = [os.path.normpath(dirpath) for dirpath in dirpaths]
+                visited = set() # Directories synced already
+                while stack:
+                    dirpath = stack.pop()
+                    if dirpath in visited:
+                        continue
+                    visited.add(dirpath)
+                    subdirs = self.sync(dirpath, extensions, counts, writer, force=not recursive)
+                    stack.extend(subdirs if recursive else [subdir for subdir in subdirs if self.tree.get(subdir) is None])
+
+        return counts
+
+    def sync(self, dirpath, extensions, counts, writer, force=False):
+        '''
+        Bring the stored files of a single directory up to date.
+
+        :param dirpath: Directory path
+        :param extensions: Tuple of file extensions to match
+        :param counts: Dictionary of added, modified and removed file counts to update
+        :param writer: Writer object
+        :param force: Boolean to list the directory even if its modification time did not change
+        :return: List of subdirectory paths to visit next
+        '''
+        known = self.tree.get(dirpath)
+
+        # Skip the listing of unchanged directories
+        try:
+            mtime = os.stat(dirpath).st_mtime
+        except OSError:
+            mtime = None
+        if not force and known and mtime is not None and known[1] == mtime:
+            return list(self.tree.subdirs(known[0]))
+
+        scan = scandirectory(dirpath, extensions)
+        if scan.mtime is None:
+            # Directory is gone or unreadable
+            counts['removed'] += self.prune(dirpath, writer)
+            return []
+        dir_id = self.directory(scan, writer)
+        writer.metrics.count('directories')
+        writer.metrics.count('files', len(scan.files))
+
+        # Compare the listed files with the stored ones, including the ones still buffered
+        stored = {filepath: (file_id, size, mtime, inode) for file_id, filepath, size, mtime, inode in writer.execute("SELECT id, filepath, size, mtime, inode FROM filepaths WHERE dir_id = ?", (dir_id,))}
+        resized = [] # Modified files with their new size
+        for row in self.filerows(scan, dir_id):
+            old = stored.pop(row[0], None)
+            if old is None:
+                counts['added'] += 1
+            elif old[1:] != row[3:6]:
+                counts['modified'] += 1
+                if old[1] != row[3]:
+                    resized.append((old[0], row[3]))
+            else:
+                continue
+            writer.upsert('filepaths', FILEPATH_COLUMNS, [row], keys=FILEPATH_KEYS)
+        if resized and 'dir_stats' in self.tables:
+            self.stats.resize(resized, writer)
+
+        # Delete the files that are gone
+        counts['removed'] += len(stored)
+        self.remove([old[0] for old in stored.values()], writer)
+
+        # Delete the subdirectories that are gone
+        for subdir in self.tree.subdirs(dir_id).difference(scan.dirs):
+            counts['removed'] += self.prune(subdir, writer)
+
+        return scan.dirs
+
+    def prune(self, path, writer):
+        '''
+        Delete a directory subtree that is gone, with its files.
+
+        :param path: Directory path
+        :param writer: Writer object
+        :return: Number of files deleted
+        '''
+        # Collect the subtree, so that its files are deleted while their ancestors are still known
+        nodes = []
+        stack = [path]
+        while stack:
+            node = stack.pop()
+            known = self.tree.get(node)
+            if known:
+                nodes.append(node)
+                stack.extend(self.tree.subdirs(known[0]))
+
+        writer.flush() # Files of the subtree still buffered
+        ids = [row[0] for node in nodes for row in writer.conn.execute("SELECT id FROM filepaths WHERE dir_id = ?", (self.tree.get(node)[0],))]
+        self.remove(ids, writer)
+        for node in nodes:
+            self.tree.remove(node, writer)
+        return len(ids)
\ No newline at end of file
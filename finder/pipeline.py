@@ -0,0 +1,167 @@
+import queue
+import threading
+from collections import namedtuple
+from .walker import walk
+from .parser import parse, version
+from .pathfinder import PathFinder, FILEPATH_COLUMNS, FILEPATH_KEYS
+from .stepextractor import StepExtractor
+from .detailsextractor import DetailsExtractor
+
+'''
+pipeline.py is a module that provides the Pipeline class, the streaming mode of the Finder class.
+
+Instead of walking the whole tree before extracting steps and details from the database,
+the Pipeline class runs the walker in a background thread that feeds scanned directories into a
+bounded queue. Batches of files are taken from the queue, their steps and details are extracted
+in flight, and all three tables are written together in one transaction per batch. Peak memory is
+bounded by the queue depth and the batch size, which limits both the files and the directories of a batch, and the first files are visible in the database
+while the scan is still running.
+
+With a Journal object of the journal module, every batch records its directories in the same transaction,
+so that an interrupted run is resumed without walking its complete subtrees again.
+
+A run reports a Progress event after every committed batch and stops early, after the current batch,
+when its stop event is set. Pipelines writing to the same database at once share a DirectoryTree and a
+lock, so that their batches are written one at a time and directory ids are never assigned twice.
+'''
+
+# Progress of a run: root directory, directories scanned, files saved, and whether the run is over
+Progress = namedtuple('Progress', ['root', 'directories', 'files', 'done'])
+
+
+class Pipeline:
+    '''Initialize Pipeline class.'''
+    def __init__(self, writer, directory, depth=8, tree=None, lock=None, journal=None):
+        self.writer = writer # Shared Writer object
+        self.journal = journal # Journal object recording the saved directories, or None
+        self.depth = depth # Maximum number of scanned directories waiting in the queue
+        self.lock = lock or threading.Lock() # Lock shared by the pipelines writing to the same database
+        self.pathfinder = PathFinder(filepath=directory, writer=writer, database=writer.database, tree=tree)
+        self.stepextractor = StepExtractor(writer=writer, database=writer.database, tree=self.pathfinder.tree)
+        self.detailsextractor = DetailsExtractor(writer=writer, database=writer.database)
+
+    def produce(self, directory, extensions, jobs, scans, stop):
+        '''
+        Walk the directory tree and feed the scanned directories into the queue, run in a background thread.
+
+        :param directory: Directory to search for files
+        :param extensions: File extensions to search for
+        :param jobs: Number of threads scanning directories
+        :param scans: Bounded queue receiving Scan tuples, an exception, and None when the walk is over
+        :param stop: threading.Event set when the consumer gives up
+        '''
+        def put(item):
+            while not stop.is_set():
+                try:
+                    scans.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            for scan in walk(directory, extensions, jobs=jobs, prune=self.journal.prune if self.journal else None):
+                if not put(scan):
+                    return
+        except BaseException as error:
+            put(error)
+        put(None)
+
+    def run(self, directory, extensions, jobs=1, stop=None, progress=None):
+        '''
+        Find files in a directory tree and extract their steps and details in a single pass.
+
+        :param directory: Directory to search for files
+        :param extensions: File extensions to search for
+        :param jobs: Number of threads scanning directories
+        :param stop: threading.Event stopping the run after the current batch, or None to run to the end
+        :param progress: Function called with a Progress event after every batch, or None
+        :return: Number of files found
+        '''
+        # Create the tables of the three stages
+        with self.lock:
+            self.pathfinder.create(self.writer)
+            self.stepextractor.create(self.writer)
+            self.detailsextractor.create(self.writer)
+
+        scans = queue.Queue(maxsize=self.depth)
+        stop = stop or threading.Event()
+        halt = threading.Event() # Stops the producer when the run is over
+        producer = threading.Thread(target=self.produce, args=(directory, extensions, jobs, scans, halt), daemon=True)
+        producer.start()
+
+        found = 0
+        scanned = 0
+        batch = [] # Scanned directories of the current batch
+        pending = 0 # Number of files in the current batch
+        try:
+            while not stop.is_set():
+                try:
+                    scan = scans.get(timeout=0.1)
+                except queue.Empty:
+                    continue # Check the stop event again
+                if scan is None:
+                    break
+                if isinstance(scan, BaseException):
+                    raise scan
+                batch.append(scan)
+                pending += len(scan.files)
+                # Also flush batches of empty directories, so that their journal marks are not held back
+                if pending >= self.writer.batch_size or len(batch) >= self.writer.batch_size:
+                    found += self.save(batch)
+                    scanned += len(batch)
+                    batch, pending = [], 0
+                    if progress:
+                        progress(Progress(directory, scanned, found, False))
+            if not stop.is_set():
+                found += self.save(batch)
+                scanned += len(batch)
+        finally:
+            halt.set()
+            producer.join()
+        if progress:
+            progress(Progress(directory, scanned, found, True))
+        return found
+
+    def save(self, scans):
+        '''
+        Save a batch of scanned directories with the steps and details of their files, in one transaction.
+
+        :param scans: List of Scan tuples
+        :return: Number of files saved
+        '''
+        saved = 0
+        with self.lock, self.writer.transaction() as writer:
+            # Save the file paths
+            directories = []
+            for scan in scans:
+                if self.journal and self.journal.saved(scan.path):
+                    continue # Saved before the run was interrupted
+                dir_id = self.pathfinder.directory(scan, writer)
+                rows = self.pathfinder.filerows(scan, dir_id)
+                writer.upsert('filepaths', FILEPATH_COLUMNS, rows, keys=FILEPATH_KEYS)
+                directories.append((dir_id, rows))
+                writer.metrics.count('directories')
+                writer.metrics.count('files', len(rows))
+            writer.flush() # Assign the ids of the new file paths, still uncommitted
+
+            # Extract the steps and details of the saved files
+            steps = []
+            details = []
+            stamp = version() # Version of the rules the details are parsed with
+            for dir_id, rows in directories:
+                if not rows:
+                    continue
+                ids = dict(writer.conn.execute("SELECT filepath, id FROM filepaths WHERE dir_id = ?", (dir_id,)))
+                for row in rows:
+                    file_id = ids[row[0]]
+                    release = parse(row[1])
+                    steps.append((file_id, dir_id, row[3], release.resolution))
+                    details.append((file_id,) + release[:4] + (stamp, row[7]))
+                saved += len(rows)
+            self.stepextractor.savesteps(steps, writer)
+            self.detailsextractor.save_details(details, writer)
+            if self.journal:
+                for scan in scans:
+                    self.journal.mark(scan, writer) # Committed with the batch
+        return saved
\ No newline at end of file
@@ -0,0 +1,385 @@
+import struct
+from collections import namedtuple
+
+'''
+probe.py is a module that provides the probe function, which reads the real width, height, codec,
+duration and bitrate of a video from the headers of its container, without any external tool.
+
+Matroska and WebM files are EBML documents: the Info and Tracks elements of their Segment come
+before the first Cluster in almost every file, and the SeekHead gives their position otherwise.
+MP4 and MOV files are trees of boxes: the moov box holds the movie header and the tracks, and may
+come after the mdat box of the media data, whose size is read from its header to skip it.
+
+Elements and boxes that are not needed are skipped with a seek, never read, and the bytes read
+from a file are capped, so a damaged or unusual file costs no more than a few reads.
+'''
+
+# Maximum number of bytes read from a file
+LIMIT = 64 << 10 # 64 KiB
+
+# Metadata of a video
+Media = namedtuple('Media', ['width', 'height', 'codec', 'duration', 'bitrate'])
+
+# EBML element ids
+EBML = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEEKHEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEKID = 0x53AB
+SEEKPOSITION = 0x53AC
+INFO = 0x1549A966
+TIMESCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACKENTRY = 0xAE
+TRACKTYPE = 0x83
+CODECID = 0x86
+CODECPRIVATE = 0x63A2
+VIDEO = 0xE0
+PIXELWIDTH = 0xB0
+PIXELHEIGHT = 0xBA
+CLUSTER = 0x1F43B675
+
+# Codec names of the Matroska codec ids and of the MP4 sample entries
+MATROSKA_CODECS = {
+    'V_MPEG4/ISO/AVC': 'h264',
+    'V_MPEGH/ISO/HEVC': 'hevc',
+    'V_AV1': 'av1',
+    'V_VP9': 'vp9',
+    'V_VP8': 'vp8',
+    'V_MPEG4/ISO/ASP': 'mpeg4',
+    'V_MPEG4/ISO/SP': 'mpeg4',
+    'V_MPEG2': 'mpeg2',
+}
+MP4_CODECS = {
+    b'avc1': 'h264', b'avc3': 'h264',
+    b'hvc1': 'hevc', b'hev1': 'hevc',
+    b'av01': 'av1',
+    b'vp09': 'vp9',
+    b'mp4v': 'mpeg4',
+}
+
+# Codec names of the four character codes of Video for Windows tracks in Matroska files
+FOURCCS = {'xvid': 'mpeg4', 'divx': 'mpeg4', 'dx50': 'mpeg4', 'fmp4': 'mpeg4', 'h264': 'h264', 'avc1': 'h264', 'hevc': 'hevc'}
+
+# MP4 boxes between a trak box and its sample description
+MP4_PATH = {b'mdia', b'minf', b'stbl'}
+
+
+class Exhausted(Exception):
+    '''Raised when the bytes read from a file reach the limit or its end.'''
+
+
+class Reader:
+    '''Initialize Reader class.'''
+    def __init__(self, file, limit=LIMIT):
+        self.file = file # File open in binary mode
+        self.left = limit # Bytes left to read
+
+    def read(self, offset, size, partial=False):
+        '''
+        Read bytes at an offset, counting them against the limit.
+
+        :param offset: Offset in the file
+        :param size: Number of bytes
+        :param partial: Boolean to accept fewer bytes at the end of the file
+        :return: Bytes
+        '''
+        if size > self.left:
+            raise Exhausted()
+        self.file.seek(offset)
+        data = self.file.read(size)
+        self.left -= len(data)
+        if len(data) < size and not (partial and data):
+            raise Exhausted()
+        return data
+
+
+# Function to decode an EBML variable size integer
+def vint(data, pos, marker=False):
+    '''
+    Decode an EBML variable size integer: ids keep their length marker, sizes do not.
+
+    :param data: Bytes
+    :param pos: Position of the integer
+    :param marker: Boolean to keep the length marker, for element ids
+    :return: (value, length) tuple, value None for an unknown size
+    '''
+    first = data[pos]
+    if not first:
+        raise ValueError('Invalid EBML integer')
+    length = 9 - first.bit_length()
+    value = first if marker else first & (0xFF >> length)
+    for byte in data[pos + 1:pos + length]:
+        value = value << 8 | byte
+    if pos + length > len(data):
+        raise Exhausted()
+    if not marker and value == (1 << 7 * length) - 1:
+        value = None # Unknown size, up to the end of the parent
+    return value, length
+
+
+# Function to iterate over the EBML elements of a buffer
+def elements(data, start=0, end=None):
+    '''
+    Iterate over the EBML elements between two positions of a buffer.
+
+    :param data: Bytes
+    :param start: Position of the first element
+    :param end: End position, or None for the end of the buffer
+    :return: Generator of (id, data start, data end) tuples
+    '''
+    end = len(data) if end is None else end
+    pos = start
+    while pos < end:
+        element, length = vint(data, pos, marker=True)
+        size, sizelength = vint(data, pos + length)
+        pos += length + sizelength
+        stop = end if size is None else min(pos + size, end)
+        yield element, pos, stop
+        pos = stop
+
+
+# Function to decode an EBML unsigned integer or float
+def number(data, start, end, kind='uint'):
+    '''
+    Decode the value of an EBML unsigned integer or float element.
+
+    :param data: Bytes
+    :param start: Data start
+    :param end: Data end
+    :param kind: 'uint' or 'float'
+    :return: Number, or None for an invalid float
+    '''
+    if kind == 'float':
+        formats = {4: '>f', 8: '>d'}
+        return struct.unpack(formats[end - start], data[start:end])[0] if end - start in formats else None
+    return int.from_bytes(data[start:end], 'big')
+
+
+# Function to read the metadata of a Matroska file
+def matroska(reader, size, media):
+    '''
+    Read the width, height, codec and duration of the first video track of a Matroska file.
+
+    :param reader: Reader object
+    :param size: File size
+    :param media: Dictionary of metadata to update
+    '''
+    # Skip the EBML header, then enter the Segment
+    header = reader.read(0, 12)
+    element, length = vint(header, 0, marker=True)
+    length_size, sizelength = vint(header, length)
+    pos = length + sizelength + (length_size or 0)
+    header = reader.read(pos, 12, partial=True)
+    element, length = vint(header, 0, marker=True)
+    if element != SEGMENT:
+        return
+    segment_size, sizelength = vint(header, length)
+    segment = pos + length + sizelength # Start of the Segment data, base of the SeekHead positions
+    end = size if segment_size is None else min(segment + segment_size, size)
+
+    # Read the Info and Tracks elements, skipping the others
+    positions = {} # Element id to position, from the SeekHead
+    wanted = {INFO, TRACKS}
+    pos = segment
+    while wanted and pos < end:
+        header = reader.read(pos, 12, partial=True)
+        element, length = vint(header, 0, marker=True)
+        element_size, sizelength = vint(header, length)
+        start = pos + length + sizelength
+        if element == CLUSTER or element_size is None:
+            # Media data from here on: jump to the missing elements the SeekHead points to
+            missing = [positions[element] for element in wanted if element in positions and positions[element] > pos]
+            if not missing:
+                break
+            pos = min(missing)
+            continue
+        if element in (SEEKHEAD, INFO, TRACKS):
+            data = reader.read(start, element_size)
+            if element == SEEKHEAD:
+                for seek, seek_start, seek_end in elements(data):
+                    if seek != SEEK:
+                        continue
+                    fields = {child: data[child_start:child_end] for child, child_start, child_end in elements(data, seek_start, seek_end)}
+                    if SEEKID in fields and SEEKPOSITION in fields:
+                        positions[int.from_bytes(fields[SEEKID], 'big')] = segment + int.from_bytes(fields[SEEKPOSITION], 'big')
+            elif element == INFO:
+                info(data, media)
+            else:
+                tracks(data, media)
+            wanted.discard(element)
+        pos = start + element_size
+
+
+# Function to read the Info element of a Matroska file
+def info(data, media):
+    '''
+    Read the duration of a Matroska file from its Info element.
+
+    :param data: Bytes of the Info element
+    :param media: Dictionary of metadata to update
+    '''
+    scale = 1000000 # Nanoseconds per timestamp tick, by default
+    duration = None
+    for element, start, end in elements(data):
+        if element == TIMESCALE:
+            scale = number(data, start, end)
+        elif element == DURATION:
+            duration = number(data, start, end, kind='float')
+    if duration:
+        media['duration'] = duration * scale / 1e9
+
+
+# Function to read the Tracks element of a Matroska file
+def tracks(data, media):
+    '''
+    Read the codec, width and height of the first video track of a Matroska file.
+
+    :param data: Bytes of the Tracks element
+    :param media: Dictionary of metadata to update
+    '''
+    for entry, entry_start, entry_end in elements(data):
+        if entry != TRACKENTRY:
+            continue
+        fields = {element: (start, end) for element, start, end in elements(data, entry_start, entry_end)}
+        if TRACKTYPE not in fields or number(data, *fields[TRACKTYPE]) != 1:
+            continue # Not a video track
+
+        # Codec, from the four character code of the bitmap header of Video for Windows tracks
+        if CODECID in fields:
+            codec = data[slice(*fields[CODECID])].rstrip(b'\0').decode('ascii', 'replace')
+            if codec == 'V_MS/VFW/FOURCC' and CODECPRIVATE in fields:
+                start = fields[CODECPRIVATE][0]
+                fourcc = data[start + 16:start + 20].decode('ascii', 'replace').lower()
+                media['codec'] = FOURCCS.get(fourcc, fourcc)
+            else:
+                media['codec'] = MATROSKA_CODECS.get(codec, codec)
+
+        # Width and height
+        if VIDEO in fields:
+            for element, start, end in elements(data, *fields[VIDEO]):
+                if element == PIXELWIDTH:
+                    media['width'] = number(data, start, end)
+                elif element == PIXELHEIGHT:
+                    media['height'] = number(data, start, end)
+        return
+
+
+# Function to iterate over the MP4 boxes between two offsets of a file
+def boxes(reader, start, end):
+    '''
+    Iterate over the MP4 boxes between two offsets of a file, reading their headers only.
+
+    :param reader: Reader object
+    :param start: Offset of the first box
+    :param end: End offset
+    :return: Generator of (type, data start, data end) tuples
+    '''
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack('>I4s', reader.read(pos, 8))
+        length = 8
+        if size == 1:
+            size = struct.unpack('>Q', reader.read(pos + 8, 8))[0] # 64-bit size
+            length = 16
+        elif size == 0:
+            size = end - pos # Up to the end of the file
+        if size < length:
+            return
+        yield kind, pos + length, min(pos + size, end)
+        pos += size
+
+
+# Function to read the metadata of an MP4 file
+def mp4(reader, size, media):
+    '''
+    Read the width, height, codec and duration of the first video track of an MP4 file.
+
+    :param reader: Reader object
+    :param size: File size
+    :param media: Dictionary of metadata to update
+    '''
+    for kind, start, end in boxes(reader, 0, size):
+        if kind == b'moov':
+            movie(reader, start, end, media)
+            return
+
+
+# Function to read the boxes of an MP4 moov or trak box
+def movie(reader, start, end, media):
+    '''
+    Read the boxes of a moov box, or of the boxes of a track, down to its sample description.
+
+    :param reader: Reader object
+    :param start: Data start of the box
+    :param end: Data end of the box
+    :param media: Dictionary of metadata to update, of the movie or of a track
+    '''
+    for kind, data_start, data_end in boxes(reader, start, end):
+        if kind == b'mvhd':
+            data = reader.read(data_start, 32)
+            if data[0] == 1:
+                timescale, duration = struct.unpack('>IQ', data[20:32])
+            else:
+                timescale, duration = struct.unpack('>II', data[12:20])
+            if timescale and duration not in (0, 0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+                media['duration'] = duration / timescale
+        elif kind == b'trak':
+            if 'codec' in media:
+                continue # First video track only
+            track = {}
+            try:
+                movie(reader, data_start, data_end, track)
+            finally:
+                if track.pop('video', False):
+                    media.update(track)
+        elif kind == b'tkhd':
+            width, height = struct.unpack('>II', reader.read(data_end - 8, 8))
+            media.setdefault('width', width >> 16) # 16.16 fixed point display size
+            media.setdefault('height', height >> 16)
+        elif kind == b'hdlr':
+            media['video'] = reader.read(data_start + 8, 4) == b'vide'
+        elif kind == b'stsd':
+            entry = reader.read(data_start + 8, 36)
+            media['codec'] = MP4_CODECS.get(entry[4:8], entry[4:8].decode('ascii', 'replace').strip())
+            width, height = struct.unpack('>HH', entry[32:36])
+            if width and height:
+                media['width'], media['height'] = width, height # Coded size
+        elif kind in MP4_PATH:
+            movie(reader, data_start, data_end, media)
+
+
+# Function to probe a video file
+def probe(filepath, size=None, limit=LIMIT):
+    '''
+    Read the width, height, codec, duration and bitrate of a Matroska or MP4 video, reading at most limit bytes.
+
+    :param filepath: File path
+    :param size: File size, or None to get it from the file
+    :param limit: Maximum number of bytes read
+    :return: Media record, fields unknown set to None, or None for a file that is not a known container
+    '''
+    try:
+        with open(filepath, 'rb') as file:
+            if size is None:
+                size = file.seek(0, 2)
+            reader = Reader(file, limit)
+            magic = reader.read(0, 12, partial=True)
+            if magic[:4] == EBML.to_bytes(4, 'big'):
+                container = matroska
+            elif magic[4:8] in (b'ftyp', b'moov', b'free', b'mdat', b'wide', b'skip'):
+                container = mp4
+            else:
+                return None
+            media = {}
+            try:
+                container(reader, size, media)
+            except (Exhausted, ValueError, struct.error, IndexError):
+                pass # Truncated, damaged or too large headers: keep what was found
+    except (OSError, Exhausted):
+        return None # Unreadable or empty file
+
+    duration = media.get('duration')
+    bitrate = round(size * 8 / duration) if duration else None
+    return Media(media.get('width'), media.get('height'), media.get('codec'), duration, bitrate)
\ No newline at end of file
@@ -0,0 +1,274 @@
+import math
+import sqlite3
+from functools import lru_cache
+from collections import namedtuple
+from .writer import DATABASE
+
+'''
+query.py is a module that provides indexed full-text and faceted search over the catalog.
+
+The filesearch table is an SQLite FTS5 index of the titles and paths of the filepaths table, with the
+trigram tokenizer, so that any part of a title matches and a misspelled title still shares most of
+its trigrams with the right one. It is an external content index: it stores no copy of the rows and
+is kept up to date by triggers on the filepaths table, so the rows inserted or deleted by the Finder
+class are indexed in the same transaction. The detail columns of the filedetails table get
+secondary indexes for filters like "1080p x265 from 2015 to 2020".
+
+The Catalog class searches the index with filters and pages of results ranked by bm25, titles
+weighing more than paths. A misspelled text must share a minimum part of its trigrams with a title or
+path. A row sharing that many of the n trigrams of the text holds one of the n - minimum + 1 rarest,
+ranked by their document counts in an fts5vocab table, so only those are matched in the index and the
+candidates are then filtered by their overlap: common trigrams like "the" no longer match most of the index.
+'''
+
+# Full-text index of the filepaths table, kept up to date by triggers
+SEARCH_INDEX = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS filesearch USING fts5(filetitle, filepath, content='filepaths', content_rowid='id', tokenize='trigram')",
+    """CREATE TRIGGER IF NOT EXISTS filesearch_insert AFTER INSERT ON filepaths BEGIN
+        INSERT INTO filesearch(rowid, filetitle, filepath) VALUES (new.id, new.filetitle, new.filepath);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS filesearch_delete AFTER DELETE ON filepaths BEGIN
+        INSERT INTO filesearch(filesearch, rowid, filetitle, filepath) VALUES ('delete', old.id, old.filetitle, old.filepath);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS filesearch_update AFTER UPDATE OF filetitle, filepath ON filepaths BEGIN
+        INSERT INTO filesearch(filesearch, rowid, filetitle, filepath) VALUES ('delete', old.id, old.filetitle, old.filepath);
+        INSERT INTO filesearch(rowid, filetitle, filepath) VALUES (new.id, new.filetitle, new.filepath);
+    END""",
+]
+
+# Secondary indexes of the filedetails table, for the filters of the search method
+DETAIL_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS filedetails_year ON filedetails(year)",
+    "CREATE INDEX IF NOT EXISTS filedetails_resolution_codec_year ON filedetails(resolution, codec, year)",
+    "CREATE INDEX IF NOT EXISTS filedetails_codec_year ON filedetails(codec, year)",
+]
+
+# Weights of the filetitle and filepath columns in the bm25 rank
+WEIGHTS = (4.0, 1.0)
+
+# Part of the trigrams of a misspelled text that a title or path must share with it
+MIN_OVERLAP = 0.5
+
+# A search result
+Result = namedtuple('Result', ['file_id', 'filepath', 'filename', 'title', 'year', 'resolution', 'codec', 'rank'])
+
+# A page of search results, with more set when a next page exists
+Page = namedtuple('Page', ['results', 'page', 'per_page', 'more'])
+
+
+# Function to create the full-text index
+def searchindex(writer):
+    '''
+    Create the full-text index of the filepaths table and its triggers, indexing the existing rows once.
+    Without FTS5 support in SQLite, no index is created and the search method falls back to LIKE.
+
+    :param writer: Writer object, after the filepaths table is created
+    :return: Boolean, whether the index exists
+    '''
+    exists = writer.execute("SELECT 1 FROM sqlite_master WHERE name = 'filesearch'").fetchone()
+    if exists:
+        return True
+    try:
+        for statement in SEARCH_INDEX:
+            writer.execute(statement)
+    except sqlite3.OperationalError:
+        return False # SQLite built without FTS5 or the trigram tokenizer
+    writer.execute("INSERT INTO filesearch(filesearch) VALUES ('rebuild')")
+    return True
+
+
+# Function to create the detail indexes
+def detailindexes(writer):
+    '''
+    Create the secondary indexes of the filedetails table.
+
+    :param writer: Writer object, after the filedetails table is created
+    '''
+    for statement in DETAIL_INDEXES:
+        writer.execute(statement)
+
+
+# Function to split a text into trigrams
+@lru_cache(maxsize=256)
+def trigrams(text):
+    '''
+    Split a text into its unique trigrams, lowercased and with whitespace collapsed like the trigram tokenizer sees it.
+
+    :param text: Search text
+    :return: Tuple of trigrams, in order
+    '''
+    text = ' '.join(text.lower().split())
+    return tuple(dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2))) # Unique, in order
+
+
+# Function to count the trigrams of a text found in a title or path
+def overlap(text, *columns):
+    '''
+    Count the trigrams of a search text that appear in any of the columns of a row, registered as an SQL function.
+
+    :param text: Search text
+    :param columns: Column values, such as the title and path of a file
+    :return: Number of shared trigrams
+    '''
+    columns = [column.lower() for column in columns if column]
+    return sum(any(trigram in column for column in columns) for trigram in trigrams(text))
+
+
+# Function to build a typo-tolerant full-text query
+def fuzzy(text, counts=None):
+    '''
+    Build an FTS5 query matching the rows that may share a minimum part of the trigrams of a text,
+    so that misspelled text still matches.
+
+    A row sharing at least minimum of the n trigrams holds one of any n - minimum + 1 of them,
+    so the query matches the rarest ones only, and the rows are filtered by their overlap afterwards.
+
+    :param text: Search text
+    :param counts: Dictionary of trigram to number of indexed rows holding it, or None to keep the order of the text
+    :return: Tuple of the FTS5 query string and the minimum number of shared trigrams, or None for a text shorter than a trigram
+    '''
+    grams = trigrams(text)
+    if not grams:
+        return None
+    minimum = max(1, math.ceil(len(grams) * MIN_OVERLAP))
+    if counts is not None:
+        grams = sorted(grams, key=lambda trigram: counts.get(trigram, 0)) # Rarest first, stable
+    query = ' OR '.join('"' + trigram.replace('"', '""') + '"' for trigram in grams[:len(grams) - minimum + 1])
+    return query, minimum
+
+
+# Function to build an FTS5 query matching a text as a substring
+def exact(text):
+    '''
+    Build an FTS5 query matching a text anywhere in a title or path.
+
+    :param text: Search text
+    :return: FTS5 query string, or None for a text shorter than a trigram
+    '''
+    text = ' '.join(text.split())
+    if len(text) < 3:
+        return None
+    return '"' + text.replace('"', '""') + '"'
+
+
+class Catalog:
+    '''Initialize Catalog class.'''
+    def __init__(self, database=DATABASE):
+        self.database = database # Database path
+        self.conn = None # Read connection, opened on the first search
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def connect(self):
+        '''
+        Open the read connection, once.
+
+        :return: sqlite3 connection
+        '''
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.database)
+            self.conn.create_function('overlap', 3, overlap, deterministic=True)
+        return self.conn
+
+    def frequencies(self, grams):
+        '''
+        Count the indexed rows holding each trigram, from an fts5vocab table of the full-text index.
+
+        :param grams: Iterable of trigrams
+        :return: Dictionary of trigram to number of rows, or None without an fts5vocab table
+        '''
+        conn = self.connect()
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.filesearch_vocab USING fts5vocab(main, filesearch, row)")
+        except sqlite3.OperationalError:
+            return None
+        counts = dict.fromkeys(grams, 0)
+        for trigram in counts:
+            row = conn.execute("SELECT doc FROM temp.filesearch_vocab WHERE term = ?", (trigram,)).fetchone()
+            counts[trigram] = row[0] if row else 0
+        return counts
+
+    def search(self, text=None, year=None, resolution=None, codec=None, typos=True, page=1, per_page=50):
+        '''
+        Search the catalog by title or path, with filters on the details of the files.
+
+        Years are a single year or a (first, last) range, resolutions and codecs are a single value
+        or a list of values. Without text, the matching files are sorted by title.
+
+        :param text: Text to search in titles and paths, or None
+        :param year: Year or (first, last) tuple, or None
+        :param resolution: Resolution or list of resolutions, or None
+        :param codec: Codec or list of codecs, or None
+        :param typos: Boolean to match misspelled text, otherwise text must appear as is
+        :param page: Page number, from 1
+        :param per_page: Number of results per page
+        :return: Page of Result records, best ranked first
+        '''
+        conn = self.connect()
+        where = []
+        values = []
+
+        # Filter by details
+        if year is not None:
+            if isinstance(year, (tuple, list)):
+                where.append("d.year BETWEEN ? AND ?")
+                values.extend(int(y) for y in year)
+            else:
+                where.append("d.year = ?")
+                values.append(int(year))
+        for column, value in (('resolution', resolution), ('codec', codec)):
+            if value is None:
+                continue
+            value = [value] if isinstance(value, str) else list(value)
+            where.append(f"d.{column} IN ({', '.join(['?'] * len(value))})")
+            values.extend(value)
+        join = 'JOIN' if where else 'LEFT JOIN' # Files without details only match without filters
+        ordering = [] # Parameters of the ORDER BY clause
+
+        # Search the full-text index when there is one
+        match = (fuzzy(text) if typos else exact(text)) if text else None
+        indexed = match and conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'filesearch'").fetchone()
+        if indexed:
+            source = "filesearch s JOIN filepaths f ON f.id = s.rowid"
+            rank = f"bm25(filesearch, {WEIGHTS[0]}, {WEIGHTS[1]})"
+            order = "rank, f.id"
+            if typos:
+                # Match the rarest trigrams, then keep the rows sharing enough of them, most shared first
+                match, minimum = fuzzy(text, self.frequencies(trigrams(text)))
+                where.insert(0, "overlap(?, f.filetitle, f.filepath) >= ?")
+                values[0:0] = [text, minimum]
+                order = "overlap(?, f.filetitle, f.filepath) DESC, " + order
+                ordering.append(text)
+            where.insert(0, "filesearch MATCH ?")
+            values.insert(0, match)
+        else:
+            source = "filepaths f"
+            if text:
+                where.insert(0, "(f.filetitle LIKE ? ESCAPE '\\' OR f.filepath LIKE ? ESCAPE '\\')")
+                pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                values[0:0] = [pattern, pattern]
+            rank = "0.0"
+            order = "COALESCE(d.title, f.filetitle), f.id"
+
+        query = f"""
+        SELECT f.id, f.filepath, f.filename, COALESCE(d.title, f.filetitle), d.year, d.resolution, d.codec, {rank} AS rank
+        FROM {source}
+        {join} filedetails d ON d.file_id = f.id
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY {order}
+        LIMIT ? OFFSET ?"""
+
+        # Fetch one more row to know whether there is a next page
+        page = max(int(page), 1)
+        rows = conn.execute(query, values + ordering + [per_page + 1, (page - 1) * per_page]).fetchall()
+        return Page([Result(*row) for row in rows[:per_page]], page, per_page, len(rows) > per_page)
+
+    def close(self):
+        '''Close the read connection.'''
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
\ No newline at end of file
@@ -0,0 +1,114 @@
+import os
+import sys
+import sqlite3
+from .writer import DATABASE
+
+'''
+records.py is a module that provides the compact file records of the finder package.
+
+A Record holds the directory, name and title of a file in three slots. Its directory is an interned
+string shared by all the files of that directory, and its path is joined on demand, so a record
+costs about a third of a (filepath, filename, filetitle) tuple. Records unpack, index and compare
+like those tuples, so code written for the tuples works unchanged.
+
+A Records object is the list of the files of a tree once they are saved: it keeps no rows in memory
+and reads them back from the filepaths table in fixed-size chunks when iterated, so the result of a
+scan costs the same whatever the size of the tree. Given the scan id of a find call, it reads only the
+rows that call saved.
+'''
+
+
+class Record:
+    '''Initialize Record class.'''
+    __slots__ = ('directory', 'filename', 'filetitle')
+
+    def __init__(self, directory, filename, filetitle):
+        self.directory = directory # Interned directory path
+        self.filename = filename # File name
+        self.filetitle = filetitle # File title
+
+    @property
+    def filepath(self):
+        '''File path, joined from the directory and the file name.'''
+        return os.path.join(self.directory, self.filename)
+
+    def __iter__(self):
+        return iter((self.filepath, self.filename, self.filetitle))
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, index):
+        return (self.filepath, self.filename, self.filetitle)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, (Record, tuple)):
+            return tuple(self) < tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return f"Record({self.filepath!r}, {self.filename!r}, {self.filetitle!r})"
+
+
+class Records:
+    '''Initialize Records class.'''
+    def __init__(self, root, database=DATABASE, chunksize=10000, recursive=True, scan_id=None):
+        self.root = os.path.normpath(root) # Root directory of the files
+        self.database = database # Database path
+        self.chunksize = chunksize # Number of rows read at a time
+        self.recursive = recursive # Whether the files of the subdirectories are included
+        self.scan_id = scan_id # Scan id of the rows, or None for all the files under the root
+
+    def where(self):
+        '''
+        Build the condition selecting the files under the root, a range the filepaths index can scan.
+
+        :return: Tuple of (condition, values)
+        '''
+        prefix = os.path.join(self.root, '')
+        values = [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+        condition = "filepath >= ? AND filepath < ?"
+        if not self.recursive:
+            condition += " AND dir_id = (SELECT id FROM directories WHERE dirpath = ?)"
+            values.append(self.root)
+        if self.scan_id is not None:
+            condition += " AND scan_id = ?"
+            values.append(self.scan_id)
+        return condition, values
+
+    def __len__(self):
+        condition, values = self.where()
+        conn = sqlite3.connect(self.database)
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM filepaths WHERE {condition}", values).fetchone()[0]
+        finally:
+            conn.close()
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    def chunks(self):
+        '''
+        Read the records of the files under the root, chunk by chunk, in path order.
+
+        :return: Generator of lists of Record objects
+        '''
+        condition, values = self.where()
+        conn = sqlite3.connect(self.database)
+        try:
+            cursor = conn.execute(f"SELECT filepath, filename, filetitle FROM filepaths WHERE {condition} ORDER BY filepath", values)
+            rows = cursor.fetchmany(self.chunksize)
+            while rows:
+                yield [Record(sys.intern(os.path.dirname(filepath)), filename, filetitle) for filepath, filename, filetitle in rows]
+                rows = cursor.fetchmany(self.chunksize)
+        finally:
+            conn.close()
\ No newline at end of file
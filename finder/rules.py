@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import hashlib
+from collections import deque
+
+'''
+rules.py is a module that provides the Rules class, the title normalization rules of the parser module.
+
+Rules are loaded from a JSON file with four sections:
+
+    {
+        "version": 1,
+        "ignore": ["x264", "yify"],
+        "tags": ["WEB DL", "DD5 1", "Blu Ray"],
+        "rewrites": [["\\bAnd\\b", "and"]],
+        "overrides": {"7 5 0 0": "7500"}
+    }
+
+Ignore tokens are title words dropped wherever they appear, looked up in a set. Tags are sequences
+of words, like "DD5.1" split into "DD5" and "1", dropped only as the trailing run of tags of a title,
+with the "-GROUP" suffix of its last word, and never when they are all that is left of it. They are
+compiled into an Aho-Corasick automaton over words, which finds every tag of a title in a single pass
+over its words, however many tags there are. Both are matched without case, so short words that are
+also title words, like "DTS" or "AMZN", are better left out of the tags. Overrides are titles that
+cannot be rebuilt from their words, replaced as a whole from a dictionary. The cost of these three
+does not grow with their number, so they hold the large vocabularies. Rewrites are regular
+expressions and their replacements, applied in order to the titles that are not overridden: each
+one costs a search of every title, so they are kept for the few fixes words cannot express.
+
+The version of a Rules object is a stamp of the declared version and of the content of the file, so
+that details parsed with other rules can be told apart. The changed method tells whether the file
+was modified since it was loaded, for hot reloading.
+'''
+
+# Rules file shipped with the package
+DEFAULT_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json')
+
+# Word separators of the tags, the same as the title word separators of the parser module
+TAG_SEPARATORS = re.compile(r'[.\s]+')
+
+
+class Automaton:
+    '''Initialize Automaton class.'''
+    def __init__(self, phrases):
+        self.goto = [{}] # Node to {word: next node} map, node 0 is the root
+        self.fail = [0] # Node to longest proper suffix node
+        self.longest = [0] # Node to length of the longest phrase ending there, in words
+
+        # Build the trie of the phrases
+        for phrase in phrases:
+            node = 0
+            for word in phrase:
+                if word not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.longest.append(0)
+                    self.goto[node][word] = len(self.goto) - 1
+                node = self.goto[node][word]
+            self.longest[node] = max(self.longest[node], len(phrase))
+
+        # Link every node to its longest suffix in the trie, breadth first
+        pending = deque(self.goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for word, child in self.goto[node].items():
+                pending.append(child)
+                fail = self.fail[node]
+                while fail and word not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(word, 0)
+                self.longest[child] = max(self.longest[child], self.longest[self.fail[child]])
+
+    def spans(self, words):
+        '''
+        Find the phrases in a list of words, in a single pass.
+
+        :param words: List of lowercase words
+        :return: Set of the positions of the words that are part of a phrase
+        '''
+        matched = set()
+        node = 0
+        for position, word in enumerate(words):
+            while node and word not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(word, 0)
+            length = self.longest[node] # Shorter phrases ending here are inside this one
+            if length:
+                matched.update(range(position - length + 1, position + 1))
+        return matched
+
+
+class Rules:
+    '''Initialize Rules class.'''
+    def __init__(self, ignore=(), tags=(), rewrites=(), overrides=None, version=0, path=None, stamp=None):
+        self.ignore = frozenset(word.casefold() for word in ignore) # Words dropped from titles
+        self.automaton = Automaton([[word.casefold() for word in TAG_SEPARATORS.split(tag.strip())] for tag in tags if tag.strip()])
+        self.rewrites = [(re.compile(pattern), replacement) for pattern, replacement in rewrites] # Patterns and replacements, in order
+        self.overrides = dict(overrides or {}) # Titles replaced as a whole
+        self.version = f'{version}.{stamp}' if stamp else str(version) # Version stamp
+        self.path = path # Rules file, or None
+        self.stamp = stamp # Digest of the rules file
+        self.modified = os.stat(path).st_mtime_ns if path else None # Modification time of the rules file when loaded
+
+    @classmethod
+    def load(cls, path=DEFAULT_RULES):
+        '''
+        Load rules from a JSON file.
+
+        :param path: Rules file path
+        :return: Rules object
+        '''
+        with open(path, 'rb') as file:
+            data = file.read()
+        config = json.loads(data)
+        return cls(
+            ignore=config.get('ignore', ()),
+            tags=config.get('tags', ()),
+            rewrites=config.get('rewrites', ()),
+            overrides=config.get('overrides'),
+            version=config.get('version', 0),
+            path=path,
+            stamp=hashlib.blake2b(data, digest_size=4).hexdigest(),
+        )
+
+    def changed(self):
+        '''
+        Tell whether the rules file was modified since it was loaded.
+
+        :return: Boolean
+        '''
+        if not self.path:
+            return False
+        try:
+            return os.stat(self.path).st_mtime_ns != self.modified
+        except OSError:
+            return False # Keep the rules of a file being replaced
+
+    def words(self, words, keep=True):
+        '''
+        Drop the ignored words, then the tags at the end of a list of title words.
+        Only the trailing run of tags is dropped, with the release group of its last word, like "DVDRip XviD-DoNE",
+        so that a title word that happens to be a tag, like "Dts" in "The Dts Story", is kept.
+        Tags are dropped only if some words are left, so that a title is never made empty by its tags.
+
+        :param words: List of title words
+        :param keep: Boolean to keep the tags when they are all that is left, False to drop them anyway
+        :return: List of the remaining words
+        '''
+        kept = [word for word in words if word.casefold() not in self.ignore]
+        lowered = [word.casefold() for word in kept]
+        if lowered and '-' in lowered[-1][1:] and not self.automaton.spans(lowered[-1:]):
+            lowered[-1] = lowered[-1].rsplit('-', 1)[0] # Match the tag before a trailing -GROUP
+
+        # Find the start of the trailing run of tags
+        tagged = self.automaton.spans(lowered)
+        start = len(kept)
+        while start and start - 1 in tagged:
+            start -= 1
+        if any(kept[:start]) or not keep:
+            return kept[:start]
+        return kept # Tags are kept when nothing else is left, like in "Fgt.mkv"
+
+    def title(self, title):
+        '''
+        Apply the overrides, or else the rewrites, to a title.
+
+        :param title: Title joined from its words
+        :return: Normalized title
+        '''
+        if title in self.overrides:
+            return self.overrides[title]
+        for pattern, replacement in self.rewrites:
+            title = pattern.sub(replacement, title)
+        return title
\ No newline at end of file
@@ -0,0 +1,201 @@
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .walker import scandirectory
+from .parser import parse
+from .metrics import Metrics
+from .pathfinder import PathFinder, FILEPATH_COLUMNS, FILEPATH_KEYS
+from .stepextractor import StepExtractor
+from .dirstats import DirStats, STEP_COLUMNS
+from .detailsextractor import DetailsExtractor, DETAIL_COLUMNS
+from .writer import Writer, DATABASE
+
+'''
+shards.py is a module that provides the Shards class, which scans many directory trees at once across processes.
+
+SQLite lets one connection write to a database at a time, so instead of sharing the database, every
+worker process scans its part of the roots into a private shard database, with its own steps and
+details. The coordinator merges each shard into the main database as soon as it is done: the shard
+is attached, and its directories, files, steps and details are copied with one INSERT ... SELECT each,
+and the totals of the directories are updated with the steps the shard adds or replaces.
+Shard ids are only valid in their shard, so directories are matched to the main database by path and
+files by their path, and every reference is remapped on the way.
+
+Roots nested in another root are dropped. With fewer roots than workers, each root is split into its
+own files and its top-level subdirectories, which are dealt round-robin to the shards.
+'''
+
+# Part of the roots scanned by a worker process: shard database path and list of (path, recursive) tuples
+Shard = namedtuple('Shard', ['database', 'paths'])
+
+# Number of shards per worker process, more than one so that a large subtree does not keep the others waiting
+SHARDS_PER_JOB = 4
+
+
+# Function to scan the paths of a shard into its database, run in worker processes
+def scanshard(database, paths, extensions, threads=1, batch_size=1000):
+    '''
+    Find the files of the paths of a shard and extract their steps and details into the shard database.
+
+    :param database: Shard database path
+    :param paths: List of (path, recursive) tuples
+    :param extensions: File extensions to search for
+    :param threads: Number of threads scanning directories
+    :param batch_size: Number of rows written per transaction
+    :return: Dictionary of the counters of the scan
+    '''
+    metrics = Metrics()
+    with Writer(database, batch_size=batch_size, metrics=metrics) as writer, metrics.cache(parse):
+        pathfinder = PathFinder(filepath=paths[0][0], writer=writer, database=database)
+        for path, recursive in paths:
+            pathfinder.find(path=path, extensions=extensions, jobs=threads, recursive=recursive)
+        StepExtractor(writer=writer, database=database, tree=pathfinder.tree).extract()
+        DetailsExtractor(writer=writer, database=database).extract()
+    return metrics.counters
+
+
+class Shards:
+    '''Initialize Shards class.'''
+    def __init__(self, database=DATABASE, batch_size=1000, metrics=None):
+        self.database = database # Main database path
+        self.batch_size = batch_size # Number of rows written per transaction
+        self.metrics = metrics or Metrics() # Stage timers and counters
+
+    def plan(self, roots, extensions, jobs):
+        '''
+        Split the roots into the lists of paths scanned by each shard.
+
+        :param roots: List of root directories
+        :param extensions: File extensions to search for
+        :param jobs: Number of worker processes
+        :return: List of lists of (path, recursive) tuples
+        '''
+        # Drop duplicate roots and roots inside another root
+        roots = sorted({os.path.normpath(os.path.abspath(root)) for root in roots})
+        roots = [root for i, root in enumerate(roots) if not any(root.startswith(os.path.join(other, '')) for other in roots[:i])]
+        if len(roots) >= jobs:
+            return [[(root, True)] for root in roots]
+
+        # Split the roots into their own files and their top-level subtrees
+        units = []
+        for root in roots:
+            units.append((root, False))
+            units.extend((subdir, True) for subdir in sorted(scandirectory(root, tuple(extensions)).dirs))
+        count = min(len(units), jobs * SHARDS_PER_JOB)
+        return [units[i::count] for i in range(count)]
+
+    def run(self, roots, extensions, jobs=os.cpu_count(), threads=1):
+        '''
+        Scan the roots in worker processes and merge their shards into the main database.
+
+        :param roots: List of root directories
+        :param extensions: File extensions to search for
+        :param jobs: Number of worker processes
+        :param threads: Number of threads scanning directories in each worker
+        :return: Number of shards merged
+        '''
+        jobs = max(jobs or 1, 1)
+        plan = self.plan(roots, extensions, jobs)
+        if not plan:
+            return 0
+
+        # Shards are written next to the main database, on the same disk
+        directory = tempfile.mkdtemp(prefix='shards-', dir=os.path.dirname(os.path.abspath(self.database)))
+        try:
+            with Writer(self.database, batch_size=self.batch_size, metrics=self.metrics) as writer:
+                self.create(writer)
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    futures = {}
+                    for number, paths in enumerate(plan):
+                        shard = Shard(os.path.join(directory, f'shard-{number}.db'), paths)
+                        futures[pool.submit(scanshard, shard.database, shard.paths, tuple(extensions), threads, self.batch_size)] = shard
+
+                    # Merge the shards as they are done, while the others are still scanning
+                    for future in as_completed(futures):
+                        for name, value in future.result().items():
+                            self.metrics.count(name, value)
+                        with self.metrics.stage('merge'):
+                            self.merge(futures[future], writer)
+                        self.metrics.tick()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        return len(plan)
+
+    def create(self, writer):
+        '''
+        Create the tables of the main database.
+
+        :param writer: Writer object
+        '''
+        pathfinder = PathFinder(filepath=self.database, writer=writer, database=self.database)
+        pathfinder.create(writer)
+        StepExtractor(writer=writer, database=self.database, tree=pathfinder.tree).create(writer)
+        DetailsExtractor(writer=writer, database=self.database).create(writer)
+
+    def merge(self, shard, writer):
+        '''
+        Merge a shard database into the main database in one transaction, remapping its ids.
+
+        :param shard: Shard tuple
+        :param writer: Writer object on the main database
+        '''
+        writer.execute("ATTACH DATABASE ? AS shard", (shard.database,))
+        try:
+            with writer.transaction():
+                # Directories, matched by path: scanned modification times win over unscanned ancestors
+                writer.execute("""
+                INSERT INTO main.directories (dirpath, mtime)
+                SELECT dirpath, mtime FROM shard.directories WHERE true
+                ON CONFLICT(dirpath) DO UPDATE SET mtime = COALESCE(excluded.mtime, directories.mtime)""")
+                writer.execute("CREATE TEMP TABLE dirmap (old INTEGER PRIMARY KEY, new INTEGER)")
+                writer.execute("""
+                INSERT INTO temp.dirmap
+                SELECT s.id, d.id FROM shard.directories s JOIN main.directories d ON d.dirpath = s.dirpath""")
+                writer.execute("""
+                UPDATE main.directories SET parent_id = (
+                    SELECT p.new FROM shard.directories s JOIN temp.dirmap p ON p.old = s.parent_id
+                    WHERE s.dirpath = directories.dirpath)
+                WHERE id IN (SELECT new FROM temp.dirmap)""")
+
+                # Files, matched by their unique key, pointing to the remapped directories
+                updates = ', '.join(f"{column} = excluded.{column}" for column in FILEPATH_COLUMNS if column not in FILEPATH_KEYS)
+                writer.execute(f"""
+                INSERT INTO main.filepaths ({', '.join(FILEPATH_COLUMNS)})
+                SELECT {', '.join('m.new' if column == 'dir_id' else f's.{column}' for column in FILEPATH_COLUMNS)}
+                FROM shard.filepaths s LEFT JOIN temp.dirmap m ON m.old = s.dir_id WHERE true
+                ON CONFLICT({', '.join(FILEPATH_KEYS)}) DO UPDATE SET {updates}""")
+                writer.execute("CREATE TEMP TABLE filemap (old INTEGER PRIMARY KEY, new INTEGER)")
+                writer.execute(f"""
+                INSERT INTO temp.filemap
+                SELECT s.id, f.id FROM shard.filepaths s JOIN main.filepaths f
+                ON {' AND '.join(f'f.{key} = s.{key}' for key in FILEPATH_KEYS)}""")
+
+                # Totals of the directories: the counted steps of the files scanned again are replaced by those of the shard
+                stats = DirStats()
+                stats.temporary(writer)
+                writer.execute("""
+                INSERT INTO temp.dirdeltas
+                SELECT s.dir_id, s.resolution, -1, -s.size FROM main.filesteps s
+                JOIN temp.filemap f ON f.new = s.filepath_id WHERE s.size IS NOT NULL""")
+                writer.execute("""
+                INSERT INTO temp.dirdeltas
+                SELECT d.new, s.resolution, 1, s.size FROM shard.filesteps s
+                JOIN temp.filemap f ON f.old = s.filepath_id JOIN temp.dirmap d ON d.old = s.dir_id""")
+                stats.rollup(writer)
+
+                # Steps and details of the files
+                writer.execute(f"""
+                INSERT OR REPLACE INTO main.filesteps ({', '.join(STEP_COLUMNS)})
+                SELECT f.new, d.new, s.size, s.resolution FROM shard.filesteps s
+                JOIN temp.filemap f ON f.old = s.filepath_id JOIN temp.dirmap d ON d.old = s.dir_id""")
+                writer.execute(f"""
+                INSERT OR REPLACE INTO main.filedetails ({', '.join(DETAIL_COLUMNS)})
+                SELECT f.new, {', '.join(f's.{column}' for column in DETAIL_COLUMNS[1:])}
+                FROM shard.filedetails s JOIN temp.filemap f ON f.old = s.file_id""")
+
+                writer.execute("DROP TABLE temp.dirmap")
+                writer.execute("DROP TABLE temp.filemap")
+        finally:
+            writer.execute("DETACH DATABASE shard")
\ No newline at end of file
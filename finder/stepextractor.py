@@ -1,79 +1,165 @@
 import os
 import sqlite3
-from .utils import pathextract, fetch, collect
+from .utils import pathextract, stream
+from .parser import parse
+from .tree import DirectoryTree
+from .dirstats import DirStats, Folder, STEP_COLUMNS
+from .writer import shared, DATABASE
 
 '''
 StepExtractor class is a PathFinder class used to extract directory steps from a filepath.
 It takes file paths from the saved filepaths table in the classified.db database and 
 extracts the directory steps from the file paths by removing the root directory and filename.
+
+Directory steps are stored as a tree: each directory is a node of the directories table, stored once
+with its id and the id of its parent, and each file of the filesteps table points to the id of its
+leaf directory. Ancestor chains and the files under a directory are read back with recursive queries.
+
+Every step also records the size and resolution of its file, which the DirStats class of the dirstats module adds to the
+totals of the directory and of all its ancestors as the steps are saved, so the totals of a folder are read with one lookup.
 '''
 
 class StepExtractor:
     # Initialize StepExtractor class
-    def __init__(self):
+    def __init__(self, writer=None, database=DATABASE, tree=None):
         '''Initialize StepExtractor class.'''
-        self.dbal = {} # Dictionary-based adjacency list for directory steps (dbal)
+        self.writer = writer # Shared Writer object, or None for a private one
+        self.database = database # Database path
+        self.tree = tree or DirectoryTree() # Directory nodes, shared with the PathFinder class
+        self.stats = DirStats() # Totals of the directories, updated with the steps
 
-    def edgify(self, parent, child):
-        '''Create a directed edge in the adjacency list.'''
-        if parent not in self.dbal:
-            self.dbal[parent] = set()
-        self.dbal[parent].add(child)
+    def create(self, writer):
+        '''
+        Create the filesteps and directory totals tables if they do not exist and load the directory nodes.
+        A filesteps table of per-file edges from an older version is dropped, since it is rebuilt by extract.
+        Steps of an older version without a size are not counted in the totals, so they are extracted again.
 
-    def extract(self, check_empty=False):
+        :param writer: Writer object
+        '''
+        columns = {row[1] for row in writer.execute("PRAGMA table_info(filesteps)")}
+        if 'parent' in columns:
+            writer.execute("DROP TABLE filesteps")
+
+        writer.execute("""
+        CREATE TABLE IF NOT EXISTS filesteps (
+            filepath_id INTEGER PRIMARY KEY,
+            dir_id INTEGER NOT NULL,
+            size INTEGER,
+            resolution TEXT,
+            FOREIGN KEY(filepath_id) REFERENCES filepaths(id),
+            FOREIGN KEY(dir_id) REFERENCES directories(id)
+        )""")
+        # Add the columns of the totals to older filesteps tables
+        columns = {row[1] for row in writer.execute("PRAGMA table_info(filesteps)")}
+        for column, kind in (('size', 'INTEGER'), ('resolution', 'TEXT')):
+            if column not in columns:
+                writer.execute(f"ALTER TABLE filesteps ADD COLUMN {column} {kind}")
+        writer.execute("CREATE INDEX IF NOT EXISTS filesteps_dir_id ON filesteps(dir_id)")
+        self.stats.create(writer)
+
+        if not self.tree.loaded:
+            self.tree.create(writer)
+
+    def extract(self, check_empty=False, filepaths=None, chunksize=10000, journal=None):
         '''
         Extract directory steps from files paths stored in the filepath table.
-        Constructs a dictionary-based adjacency list for directory steps (dbal) and saves it.
+        Links every file to the node of its directory, adding the missing directory nodes to the tree.
+
+        :param check_empty: Boolean to check if the table is empty
+        :param filepaths: List of (id, filepath, size) tuples to extract instead of collecting them from the database
+        :param chunksize: Number of file paths per chunk
+        :param journal: Journal object of the run, to start after its checkpoint and record one with every chunk, or None
         '''
-        # Fetch file paths from the database
-        filepaths = collect(table_title='filepaths', columns=['id', 'filepath'], check_empty=check_empty)
-
-        # Build the dbal adjacency list
-        for filepath_tuple in filepaths:
-            filepath_id = filepath_tuple[0]
-            filepath = filepath_tuple[1]
-            steps = pathextract(filepath).split(os.path.sep)
-            
-            # Construct the dbal adjacency list from path segments
-            for i in range(len(steps)-1):
-                parent = steps[i]
-                child = steps[i + 1]
-                self.edgify(parent, child)
-
-            # Save the dbal adjacency list to the database (filesteps table)
-            self.savesteps(filepath_id)
-            self.dbal.clear()  # Clear the dbal for the next file
-
-
-    def savesteps(self, filepath_id):
+        # Fetch file paths from the database, chunk by chunk
+        if filepaths is None:
+            missing = "NOT EXISTS (SELECT 1 FROM filesteps t2 WHERE t2.filepath_id = t1.id AND t2.size = COALESCE(t1.size, 0))" # Files without counted steps
+            after = journal.last.get('steps', 0) if journal else None # Files saved before the run was interrupted are skipped
+            chunks = stream(table_title='filepaths', columns=['id', 'filepath', 'size'], check_empty=check_empty, database=self.database, chunksize=chunksize, missing=missing, after=after)
+        else:
+            chunks = [filepaths]
+
+        with shared(self.writer, self.database) as writer:
+            self.create(writer)
+
+            for chunk in chunks:
+                # Link each file to its leaf directory node
+                steps = [(filepath_id, self.tree.node(pathextract(filepath), writer), size or 0, parse(os.path.basename(filepath)).resolution) for filepath_id, filepath, size in chunk]
+                with writer.transaction():
+                    self.savesteps(steps, writer)
+                    if journal:
+                        journal.checkpoint('steps', chunk[-1][0], writer) # Committed with the steps
+
+    def savesteps(self, steps, writer):
         """
-        Save the dbal adjacency list to the database (filesteps table).
-        
-        :param filepath_id: The ID of the filepath
+        Save the file to directory links to the database (filesteps table), with the totals of their directories, in one transaction.
+
+        :param steps: List of (filepath_id, dir_id, size, resolution) tuples
+        :param writer: Writer object buffering the rows
         """
-        # Connect to database
-        conn = sqlite3.connect('../classified.db')
-        c = conn.cursor()
-        
-        # Create table if not exists
-        c.execute(f"""
-        CREATE TABLE IF NOT EXISTS filesteps (
-            filepath_id INTEGER,
-            parent TEXT,
-            child TEXT,
-            UNIQUE(filepath_id, parent, child),
-            FOREIGN KEY(filepath_id) REFERENCES filepaths(id)
-        )""")
-        
-        # Insert values into table
-        for parent, children in self.dbal.items():
-            for child in children:
-                query = "INSERT OR IGNORE INTO filesteps (filepath_id, parent, child) VALUES (?, ?, ?)"
-                values = (filepath_id, parent, child)
-                c.execute(query, values)
-        
-        # Commit changes
-        conn.commit()
-        
-        # Close connection
-        conn.close()
\ No newline at end of file
+        if not steps:
+            return
+        with writer.transaction():
+            self.stats.update([step[0] for step in steps], steps, writer) # Replaced steps are taken away first
+            writer.insert('filesteps', STEP_COLUMNS, steps, conflict='REPLACE')
+
+    def ancestors(self, filepath_id):
+        '''
+        Get the directory steps of a file, from the root of the filesystem down to its directory.
+
+        :param filepath_id: The ID of the filepath
+        :return: List of directory paths
+        '''
+        conn = sqlite3.connect(self.database)
+        rows = conn.execute("""
+        WITH RECURSIVE steps(id, dirpath, parent_id, depth) AS (
+            SELECT d.id, d.dirpath, d.parent_id, 0
+            FROM filesteps s JOIN directories d ON d.id = s.dir_id
+            WHERE s.filepath_id = ?
+            UNION ALL
+            SELECT d.id, d.dirpath, d.parent_id, steps.depth + 1
+            FROM directories d JOIN steps ON d.id = steps.parent_id
+        )
+        SELECT dirpath FROM steps ORDER BY depth DESC""", (filepath_id,)).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def files(self, dirpath):
+        '''
+        Get all files under a directory, at any depth.
+
+        :param dirpath: Directory path
+        :return: List of (filepath_id, filepath) tuples
+        '''
+        conn = sqlite3.connect(self.database)
+        rows = conn.execute("""
+        WITH RECURSIVE subtree(id) AS (
+            SELECT id FROM directories WHERE dirpath = ?
+            UNION ALL
+            SELECT d.id FROM directories d JOIN subtree ON d.parent_id = subtree.id
+        )
+        SELECT f.id, f.filepath
+        FROM subtree
+        JOIN filesteps s ON s.dir_id = subtree.id
+        JOIN filepaths f ON f.id = s.filepath_id
+        ORDER BY f.id""", (os.path.normpath(dirpath),)).fetchall()
+        conn.close()
+        return rows
+
+    def totals(self, dirpath):
+        '''
+        Get the totals of the files under a directory, at any depth, with one lookup.
+
+        :param dirpath: Directory path
+        :return: Folder tuple, or None for a directory without files
+        '''
+        conn = sqlite3.connect(self.database)
+        try:
+            row = conn.execute("""
+            SELECT d.id, s.files, s.size FROM directories d JOIN dir_stats s ON s.dir_id = d.id
+            WHERE d.dirpath = ?""", (os.path.normpath(dirpath),)).fetchone()
+            if row is None:
+                return None
+            resolutions = {resolution or None: (files, size) for resolution, files, size in conn.execute("SELECT resolution, files, size FROM dir_resolutions WHERE dir_id = ?", (row[0],))}
+        finally:
+            conn.close()
+        return Folder(os.path.normpath(dirpath), row[1], row[2], resolutions)
\ No newline at end of file
@@ -0,0 +1,115 @@
+import os
+import sys
+
+'''
+tree.py is a module that provides the DirectoryTree class, the directory nodes shared by the PathFinder and StepExtractor classes.
+
+Each directory is stored once in the directories table, with an integer id, the id of its parent
+directory and its modification time when it was last scanned. The DirectoryTree class keeps an
+interned path to id map of the nodes in memory, assigns the ids of new nodes and creates the
+missing ancestors of a node, so that every node can be followed up to the root of the filesystem.
+'''
+
+
+class DirectoryTree:
+    '''Initialize DirectoryTree class.'''
+    def __init__(self):
+        self.nodes = {} # Directory path to (id, modification time, parent id) map
+        self.children = {} # Directory id to set of known subdirectory paths map
+        self.last = 0 # Last directory id assigned
+        self.loaded = False # Whether the nodes are loaded from the database
+
+    def create(self, writer):
+        '''
+        Create the directories table if it does not exist and load its nodes.
+
+        :param writer: Writer object
+        '''
+        writer.execute("""
+        CREATE TABLE IF NOT EXISTS directories (
+            id INTEGER PRIMARY KEY,
+            dirpath TEXT UNIQUE,
+            parent_id INTEGER,
+            mtime REAL
+        )""")
+        writer.execute("CREATE INDEX IF NOT EXISTS directories_parent_id ON directories(parent_id)")
+
+        self.nodes = {}
+        self.children = {}
+        for dir_id, dirpath, parent_id, mtime in writer.execute("SELECT id, dirpath, parent_id, mtime FROM directories"):
+            dirpath = sys.intern(dirpath)
+            self.nodes[dirpath] = (dir_id, mtime, parent_id)
+            self.children.setdefault(parent_id, set()).add(dirpath)
+        self.last = max((node[0] for node in self.nodes.values()), default=0)
+        self.loaded = True
+
+    def get(self, path):
+        '''
+        Get a known directory.
+
+        :param path: Directory path
+        :return: Tuple of (id, modification time, parent id), or None for an unknown directory
+        '''
+        return self.nodes.get(path)
+
+    def subdirs(self, dir_id):
+        '''
+        Get the known subdirectories of a directory.
+
+        :param dir_id: Directory id
+        :return: Set of subdirectory paths
+        '''
+        return self.children.get(dir_id, set())
+
+    def node(self, path, writer):
+        '''
+        Get the id of a directory, recording it and its missing ancestors if it is unknown.
+
+        :param path: Normalized directory path
+        :param writer: Writer object
+        :return: Directory id
+        '''
+        known = self.nodes.get(path)
+        if known:
+            return known[0]
+        return self.record(path, None, writer)
+
+    def record(self, path, mtime, writer):
+        '''
+        Record a directory with its modification time.
+
+        :param path: Normalized directory path
+        :param mtime: Modification time, or None for an ancestor that was never scanned
+        :param writer: Writer object
+        :return: Directory id
+        '''
+        parent = os.path.dirname(path)
+        parent_id = self.node(parent, writer) if parent and parent != path else None
+
+        known = self.nodes.get(path)
+        if known:
+            dir_id = known[0]
+        else:
+            self.last += 1
+            dir_id = self.last
+
+        path = sys.intern(path)
+        self.nodes[path] = (dir_id, mtime, parent_id)
+        self.children.setdefault(parent_id, set()).add(path)
+        writer.upsert('directories', ['id', 'dirpath', 'parent_id', 'mtime'], [(dir_id, path, parent_id, mtime)], keys=['id'])
+        return dir_id
+
+    def remove(self, path, writer):
+        '''
+        Remove a single directory node.
+
+        :param path: Directory path
+        :param writer: Writer object
+        :return: Tuple of (id, set of subdirectory paths), or None for an unknown directory
+        '''
+        known = self.nodes.pop(path, None)
+        if not known:
+            return None
+        self.children.get(known[2], set()).discard(path)
+        writer.delete('directories', 'id', [known[0]])
+        return known[0], self.children.pop(known[0], set())
\ No newline at end of file
@@ -1,6 +1,10 @@
 import os
-import re
+import zlib
 import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from .parser import parse
+from .writer import Writer, DATABASE
 
 # Define utility functions
 
@@ -44,45 +48,7 @@ def titlextract(filename):
     The title is extracted by changing filenames with this format "Duck.Duck.Goose.2018.720p.BluRay.x264-[YTS.AM].mp4" to
     "Duck Duck Goose".
     '''
-
-    # Remove file extension
-    filename = filenaming(filename)
-    filename = filename.rsplit('.', 1)[0]  # Remove file extension
-
-    # Remove parentheses and their contents but preserve the surrounding dots
-    filename = re.sub(r'\.\(.*?\)\.', '.', filename)
-    filename = re.sub(r'\(.*?\)', '', filename)  # Remove any leftover parentheses content without surrounding dots
-
-    # Split filename into parts using both '.' and spaces as delimiters
-    filename_parts = re.split(r'[.\s]', filename)
-
-    # Words to ignore
-    ignore_words = {'webrip', 'x264', 'bluray', '720p', '1080p', 'yify', 'brrip'}
-
-    # Extract title up to year
-    title = []  # Initialize title list
-    for word in filename_parts:
-        if word.isnumeric() and len(word) == 4:  # If it's a year, stop adding to title
-            break
-        if word.lower() not in ignore_words:  # Ignore specific words
-            title.append(word)
-
-    # Join title words with spaces
-    title = ' '.join(title)
-
-    # Conditional statement to handle specific titles
-    if title == "7 5 0 0":
-        title = "7500"
-    elif title == "2 0 1 2":
-        title = "2012"
-    elif title == "Wonder Woman 1_9_8_4":
-        title = "Wonder Woman 1984"
-    elif title == "G I  Joe Retaliation":
-        title = "G.I. Joe: Retaliation"
-    elif title == "G I  Joe Rise of Cobra":
-        title = "G.I. Joe: The Rise of Cobra"
-
-    return title
+    return parse(filename).title
 
 
 # Function to extract the year from a filename
@@ -94,17 +60,7 @@ def yearextract(filename):
     The year is extracted by changing filenames with this format "Duck.Duck.Goose.2018.720p.BluRay.x264-[YTS.AM].mp4" to
     "2018".
     '''
-    # Remove file extension
-    filename = filenaming(filename)
-    filename = filename.split('.')[0:-1] # Remove file extension
-
-    # Extract year using regex
-    year = None
-    match = re.search(r'(19\d{2}|20\d{2})', '.'.join(filename))
-    if match:
-        year = match.group(0)
-
-    return year
+    return parse(filename).year
 
 
 # Function to extract the resolution from a filename
@@ -116,17 +72,7 @@ def resextract(filename):
     The resolution is extracted by changing filenames with this format "Duck.Duck.Goose.2018.720p.BluRay
     .x264-[YTS.AM].mp4" to "720p".
     '''
-    # Remove file extension
-    filename = filenaming(filename)
-    filename = filename.split('.')[0:-1] # Remove file extension
-
-    # Extract resolution using regex
-    resolution = None
-    match = re.search(r'(\d{3,4}p)', '.'.join(filename))
-    if match:
-        resolution = match.group(0)
-
-    return resolution
+    return parse(filename).resolution
 
 
 # Function to extract the codec from a filename
@@ -138,58 +84,44 @@ def codecextract(filename):
     The codec is extracted by changing filenames with this format "Duck.Duck.Goose.2018.720p.BluRay.x264-[YTS.AM].mp4" to
     "x264".
     '''
-    # Remove file extension
-    filename = filenaming(filename)
-    filename = filename.split('.')[0:-1] # Remove file extension
+    return parse(filename).codec
 
-    # Extract codec using regex
-    codec = None
-    match = re.search(r'x264|x265|XviD|DivX', '.'.join(filename))
-    if match:
-        codec = match.group(0)
 
-    return codec
+# Function to fingerprint a filename
+def fingerprint(filename):
+    """
+    Return the CRC-32 of a filename, stored with the filepaths and filedetails rows.
+
+    It is registered as a deterministic SQL function of the same name on the connections that fill older tables.
+
+    :param filename: Filename
+    :return: Unsigned 32-bit integer
+    """
+    return zlib.crc32(filename.encode('utf-8', 'surrogateescape'))
 
 
 # Function to save data to a sqlite3 database
-def save(columns, values, table_title):
+def save(columns, values, table_title, database=DATABASE):
     """
     Save data to a sqlite3 database.
     
     The save function takes a list of columns, a list of values, and a table title as arguments, 
     and saves the data to a sqlite3 database called classified.db.
+    For many calls in a row, share a Writer object from the writer module instead.
     
     :param columns: List of column names
     :param values: List of tuples, where each tuple contains values for the columns
     :param table_title: Table title
+    :param database: Database path
     """
     
-    # Add 'id' column for autoincrement primary key
-    columns = ['id'] + columns
-    
-    # Connect to database
-    conn = sqlite3.connect('../classified.db')
-    c = conn.cursor()
-    
-    # Create table if not exists
-    c.execute(f"CREATE TABLE IF NOT EXISTS {table_title} (id INTEGER PRIMARY KEY AUTOINCREMENT, {', '.join(columns[1:])}, UNIQUE({', '.join(columns[1:])}))")
-    
-    # Insert values into table
-    for value in values:
-        if len(value) != len(columns) - 1:
-            raise ValueError(f"Incorrect number of values supplied for columns {columns[1:]}. Expected {len(columns) - 1}, got {len(value)}.")
-        query = f"INSERT OR IGNORE INTO {table_title} ({', '.join(columns[1:])}) VALUES ({', '.join(['?']*len(columns[1:]))})"
-        c.execute(query, value)
-    
-    # Commit changes
-    conn.commit()
-    
-    # Close connection
-    conn.close()
+    # Save values in a single transaction
+    with Writer(database) as writer:
+        writer.save(columns=columns, values=values, table_title=table_title)
 
 
 # Function to fetch data from a sqlite3 database
-def fetch(columns, table_title):
+def fetch(columns, table_title, database=DATABASE):
     """
     Fetch data from a sqlite3 database.
     
@@ -198,11 +130,12 @@ def fetch(columns, table_title):
     
     :param columns: List of column names
     :param table_title: Table title
+    :param database: Database path
     :return: List of data
     """
     
     # Connect to database
-    conn = sqlite3.connect('../classified.db')
+    conn = sqlite3.connect(database)
     c = conn.cursor()
     
     # Fetch data from table
@@ -215,38 +148,94 @@ def fetch(columns, table_title):
     return data
 
 
-def collect(table_title, columns, check_empty=False):
+def collect(table_title, columns, check_empty=False, database=DATABASE, missing=None, values=()):
     """
     Fetch data from a sqlite3 database based on whether the table is empty or not.
     
     :param table_title: Table title
     :param columns: List of column names
     :param check_empty: Boolean to check if the table is empty
+    :param database: Database path
+    :param missing: SQL condition on the rows t1 of the table selecting the rows still to process, or None for all rows
+    :param values: Parameters of the condition
     :return: List of data
     """
-    conn = sqlite3.connect('../classified.db')
+    return [row for rows in stream(table_title, columns, check_empty=check_empty, database=database, missing=missing, values=values) for row in rows]
+
+
+def stream(table_title, columns, check_empty=False, database=DATABASE, chunksize=10000, missing=None, values=(), after=None):
+    """
+    Fetch data from a sqlite3 database in chunks, like the collect function.
+    
+    Only one chunk is held in memory at a time, however large the table is.
+    With check_empty, only the rows matching the missing condition are fetched, such as
+    "NOT EXISTS (SELECT 1 FROM filesteps t2 WHERE t2.filepath_id = t1.id)" for the files without steps.
+    
+    :param table_title: Table title
+    :param columns: List of column names
+    :param check_empty: Boolean to check if the table is empty
+    :param database: Database path
+    :param chunksize: Number of rows per chunk
+    :param missing: SQL condition on the rows t1 of the table selecting the rows still to process, or None for all rows
+    :param values: Parameters of the condition
+    :param after: Id after which the rows are fetched, in id order, or None for all rows in table order
+    :return: Generator of lists of data
+    """
+    conn = sqlite3.connect(database)
     c = conn.cursor()
     
-    if check_empty:
-        # Check if the table is empty
-        c.execute(f"SELECT COUNT(*) FROM {table_title}")
-        count = c.fetchone()[0]
-        if count == 0:
-            # Fetch all data if the table is empty
-            c.execute(f"SELECT {', '.join(columns)} FROM {table_title}")
-        else:
-            # Fetch data where file_id is not in another table
-            c.execute(f"""
-            SELECT {', '.join(columns)}
-            FROM {table_title} t1
-            LEFT JOIN filemetadata t2 ON t1.file_id = t2.file_id
-            WHERE t2.file_id IS NULL
-            """)
-    else:
-        # Fetch all data
-        c.execute(f"SELECT {', '.join(columns)} FROM {table_title}")
+    try:
+        conditions = []
+        parameters = []
+        if after is not None:
+            # Fetch the rows after a checkpoint
+            conditions.append("t1.id > ?")
+            parameters.append(after)
+        if check_empty and missing is not None:
+            # Check if the table is empty, otherwise fetch the rows still to process, such as those without a row in another table
+            c.execute(f"SELECT COUNT(*) FROM {table_title}")
+            if c.fetchone()[0]:
+                conditions.append(missing)
+                parameters.extend(values)
+        
+        c.execute(f"""
+        SELECT {', '.join(f't1.{column}' for column in columns)}
+        FROM {table_title} t1
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        {'ORDER BY t1.id' if after is not None else ''}
+        """, parameters)
+        
+        data = c.fetchmany(chunksize)
+        while data:
+            yield data
+            data = c.fetchmany(chunksize)
+    finally:
+        conn.close()
+
+
+# Function to map a function over an iterable with bounded parallelism
+def boundedmap(function, iterable, jobs=1, executor=ProcessPoolExecutor):
+    """
+    Map a function over an iterable in a pool of workers, yielding results in order.
     
-    data = c.fetchall()
-    conn.close()
+    At most two items per worker are in flight, so a large iterable is never held in memory.
+    With jobs of 1, the function runs serially in the current process.
     
-    return data
\ No newline at end of file
+    :param function: Function to apply, picklable for a process pool
+    :param iterable: Iterable of items
+    :param jobs: Number of workers
+    :param executor: Executor class, such as ProcessPoolExecutor or ThreadPoolExecutor
+    :return: Generator of results, in the order of the items
+    """
+    if jobs <= 1:
+        yield from map(function, iterable)
+        return
+    
+    with executor(max_workers=jobs) as pool:
+        pending = deque()
+        for item in iterable:
+            pending.append(pool.submit(function, item))
+            if len(pending) >= jobs * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
\ No newline at end of file
@@ -0,0 +1,123 @@
+import os
+import sys
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .utils import titlextract
+from .records import Record
+
+'''
+walker.py is a module that provides the traversal engine used by the PathFinder class.
+
+The walk function visits every directory of a tree exactly once with os.scandir, using the
+DirEntry type information instead of extra stat or listdir calls, and can fan directories out
+across a thread pool. The records function turns the walk into (filepath, filename, filetitle) records.
+'''
+
+# Result of scanning a single directory
+Scan = namedtuple('Scan', ['path', 'mtime', 'files', 'dirs'])
+
+
+# Function to scan a single directory
+def scandirectory(path, extensions):
+    """
+    Scan a single directory once.
+
+    The scandirectory function lists a directory with os.scandir and splits its entries into
+    files that match the extensions and subdirectories to visit next.
+    The directory modification time is read before listing, so changes made during
+    the listing show up as a newer modification time on the next scan.
+
+    :param path: Directory path
+    :param extensions: File extensions to match
+    :return: Scan tuple of (directory path, modification time, list of matching DirEntry files, list of subdirectory paths)
+    """
+    files = [] # Matching file entries
+    dirs = [] # Subdirectory paths
+    mtime = None # Directory modification time
+
+    try:
+        mtime = os.stat(path).st_mtime
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        # Do not descend into directory symlinks to avoid cycles
+                        if not entry.is_symlink():
+                            dirs.append(entry.path)
+                    elif entry.name.endswith(extensions):
+                        files.append(entry)
+                except OSError:
+                    continue # Entry vanished or is unreadable
+    except OSError:
+        mtime = None # Unreadable directory, skipped like os.walk does and never treated as unchanged
+
+    return Scan(path, mtime, files, dirs)
+
+
+# Function to walk a directory tree
+def walk(path, extensions, jobs=1, prune=None):
+    """
+    Walk a directory tree, visiting each directory exactly once.
+
+    The walk function yields one Scan tuple per directory, parents before their subdirectories.
+    With jobs greater than 1, directories are scanned concurrently on a thread pool,
+    so the order of the yielded tuples is not deterministic.
+
+    :param path: Root directory path
+    :param extensions: File extensions to match
+    :param jobs: Number of threads scanning directories
+    :param prune: Function telling whether to skip a directory subtree, or None. Skipped subdirectories are left out of the dirs of their parent
+    :return: Generator of Scan tuples
+    """
+    extensions = tuple(extensions) # str.endswith needs a tuple
+    if prune and prune(path):
+        return
+
+    def scan(dirpath):
+        scanned = scandirectory(dirpath, extensions)
+        if prune and scanned.dirs:
+            scanned = scanned._replace(dirs=[subdir for subdir in scanned.dirs if not prune(subdir)])
+        return scanned
+
+    if jobs <= 1:
+        # Serial walk with an explicit stack
+        stack = [path]
+        while stack:
+            scanned = scan(stack.pop())
+            stack.extend(reversed(scanned.dirs))
+            yield scanned
+        return
+
+    # Parallel walk: every finished directory submits its subdirectories
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = {executor.submit(scan, path)}
+        queued = deque() # Directories waiting for a free worker
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                scanned = future.result()
+                queued.extend(scanned.dirs)
+                yield scanned
+
+            # Keep at most two directories per worker in flight
+            while queued and len(pending) < jobs * 2:
+                pending.add(executor.submit(scan, queued.popleft()))
+
+
+# Function to build file records from a directory tree
+def records(path, extensions, jobs=1):
+    """
+    Yield (filepath, filename, filetitle) records for files in a directory tree.
+
+    The records of a directory share its interned path instead of holding a full path each.
+
+    :param path: Root directory path
+    :param extensions: File extensions to match
+    :param jobs: Number of threads scanning directories
+    :return: Generator of Record objects, which unpack like (filepath, filename, filetitle) tuples
+    """
+    for scan in walk(path, extensions, jobs=jobs):
+        directory = sys.intern(scan.path)
+        for entry in scan.files:
+            yield Record(directory, entry.name, titlextract(entry.name))
\ No newline at end of file
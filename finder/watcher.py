@@ -0,0 +1,229 @@
+import os
+import sys
+import errno
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from .pathfinder import PathFinder
+from .parser import refresh
+from .writer import Writer
+
+'''
+watcher.py is a module that provides the Watcher class, which keeps the database in sync with a directory tree.
+
+The Watcher class uses inotify where it is available, through the Inotify class, and falls back to
+polling the directory modification times otherwise. Changes are debounced: the directories touched by
+a burst of events are collected and brought up to date together, so a bulk copy of thousands of files
+is written in a few batched transactions instead of one per event.
+'''
+
+# inotify event masks, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# Events that change the files of a watched directory
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+
+# Layout of the fixed part of an inotify event: wd, mask, cookie, len
+EVENT = struct.Struct('iIII')
+
+
+class Inotify:
+    '''Initialize Inotify class.'''
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.add_watch = libc.inotify_add_watch # Raises AttributeError without inotify
+        self.rm_watch = libc.inotify_rm_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.paths = {} # Watch descriptor to directory path map
+
+    def watch(self, path):
+        '''
+        Watch a directory tree.
+
+        :param path: Root directory path
+        '''
+        stack = [path]
+        while stack:
+            dirpath = stack.pop()
+            wd = self.add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                code = ctypes.get_errno()
+                if code in (errno.ENOENT, errno.EACCES, errno.ENOTDIR): # Directory vanished or is unreadable
+                    continue
+                raise OSError(code, f'inotify_add_watch failed for {dirpath}')
+            self.paths[wd] = dirpath
+            try:
+                with os.scandir(dirpath) as entries:
+                    stack.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+
+    def unwatch(self, path):
+        '''
+        Stop watching a directory tree that was moved away.
+
+        :param path: Root directory path
+        '''
+        prefix = os.path.join(path, '')
+        for wd, dirpath in list(self.paths.items()):
+            if dirpath == path or dirpath.startswith(prefix):
+                self.rm_watch(self.fd, wd)
+                del self.paths[wd]
+
+    def read(self, timeout):
+        '''
+        Read the pending events.
+
+        :param timeout: Seconds to wait for an event
+        :return: List of (directory path, mask, name) tuples
+        '''
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            buffer = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, cookie, length = EVENT.unpack_from(buffer, offset)
+            name = os.fsdecode(buffer[offset + EVENT.size:offset + EVENT.size + length].rstrip(b'\0'))
+            offset += EVENT.size + length
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None) # Watch removed by the kernel
+            elif wd in self.paths or mask & IN_Q_OVERFLOW:
+                events.append((self.paths.get(wd), mask, name))
+        return events
+
+    def close(self):
+        '''Close the inotify file descriptor.'''
+        os.close(self.fd)
+
+
+class Watcher:
+    '''Initialize Watcher class.'''
+    def __init__(self, finder, directory, extensions, debounce=1.0, interval=30.0):
+        self.finder = finder # Finder object providing the database settings
+        self.directory = directory # Watched directory
+        self.extensions = tuple(extensions) # File extensions to match
+        self.debounce = debounce # Seconds without events before a batch is applied
+        self.interval = interval # Seconds between two polls without inotify
+
+    def run(self, stop=None, polling=False):
+        '''
+        Keep the database in sync with the directory tree until stopped.
+
+        :param stop: threading.Event stopping the watcher, or None to run until interrupted
+        :param polling: Boolean to poll even if inotify is available
+        '''
+        stop = stop or threading.Event()
+
+        with Writer(self.finder.database, batch_size=self.finder.batch_size, metrics=self.finder.metrics) as writer:
+            self.writer = writer
+            self.pathfinder = PathFinder(filepath=self.directory, writer=writer, database=self.finder.database)
+            self.pathfinder.create(writer)
+
+            inotify = None
+            if not polling and sys.platform.startswith('linux'):
+                try:
+                    inotify = Inotify()
+                    inotify.watch(self.directory)
+                except (AttributeError, OSError) as error:
+                    print(f"inotify unavailable ({error}), polling every {self.interval} seconds") # Debug print
+                    if inotify:
+                        inotify.close()
+                    inotify = None
+
+            # Catch up with the changes made while not watching
+            self.apply([self.directory], recursive=True)
+
+            try:
+                if inotify:
+                    self.notify(inotify, stop)
+                else:
+                    self.poll(stop)
+            finally:
+                if inotify:
+                    inotify.close()
+
+    def poll(self, stop):
+        '''
+        Rescan the directory tree periodically, listing only the directories whose modification time changed.
+
+        :param stop: threading.Event stopping the watcher
+        '''
+        while not stop.wait(self.interval):
+            self.apply([self.directory], recursive=True)
+
+    def notify(self, inotify, stop):
+        '''
+        Apply inotify events in debounced batches.
+
+        :param inotify: Inotify object watching the directory tree
+        :param stop: threading.Event stopping the watcher
+        '''
+        dirty = set() # Directories touched by the pending events
+        rescan = False # Events were lost and the whole tree must be rescanned
+        first = last = None # Times of the first and last pending events
+
+        while not stop.is_set():
+            events = inotify.read(self.debounce if dirty or rescan else 1.0)
+            now = time.monotonic()
+
+            for dirpath, mask, name in events:
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                elif mask & IN_ISDIR:
+                    path = os.path.join(dirpath, name)
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        inotify.watch(path) # Watch before listing so that no file is missed
+                    elif mask & IN_MOVED_FROM:
+                        inotify.unwatch(path)
+                    dirty.add(dirpath)
+                elif name.endswith(self.extensions):
+                    dirty.add(dirpath)
+                else:
+                    continue
+                first = first or now
+                last = now
+
+            # Apply when the events settle, or after ten debounce periods of continuous events
+            if (dirty or rescan) and first and (now - last >= self.debounce or now - first >= self.debounce * 10):
+                if rescan:
+                    self.apply([self.directory], recursive=True)
+                else:
+                    self.apply(dirty, recursive=False)
+                dirty.clear()
+                rescan = False
+                first = last = None
+
+    def apply(self, dirpaths, recursive):
+        '''
+        Bring a batch of directories up to date, with the steps and details of the added files.
+
+        :param dirpaths: Iterable of directory paths
+        :param recursive: Boolean to rescan the subdirectories as well
+        :return: Dictionary of added, modified and removed file counts
+        '''
+        refresh() # Pick up edited title rules without restarting the watch
+        last = self.writer.execute("SELECT COALESCE(MAX(id), 0) FROM filepaths").fetchone()[0]
+        with self.finder.metrics.stage('rescan'):
+            counts = self.pathfinder.update(dirpaths, self.extensions, recursive=recursive)
+        self.finder.extractnew(self.writer, last, self.pathfinder)
+        if any(counts.values()):
+            print(f"Watch: {counts['added']} added, {counts['modified']} modified, {counts['removed']} removed") # Debug print
+        return counts
\ No newline at end of file
@@ -0,0 +1,206 @@
+import sqlite3
+from contextlib import contextmanager
+from .metrics import Metrics
+
+'''
+writer.py is a module that provides the Writer class, the shared database writer of the finder package.
+
+The Writer class holds a single sqlite3 connection in WAL mode with tuned pragmas, buffers rows
+per table and flushes them with executemany in configurable batch sizes inside explicit transactions.
+It is shared by the PathFinder, StepExtractor, and DetailsExtractor classes so that a scan does not
+open a connection and commit once per file.
+
+Every flush is timed as the write stage of the Writer's Metrics object, which also counts the rows
+written and the statements executed.
+'''
+
+DATABASE = '../classified.db' # Default database path
+
+# Pragmas applied to every writer connection
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL', # Readers do not block the writer
+    'PRAGMA synchronous=NORMAL', # Fsync on checkpoints only, safe with WAL
+    'PRAGMA temp_store=MEMORY', # Keep temporary tables and indexes in memory
+    'PRAGMA cache_size=-65536', # 64 MiB page cache
+)
+
+
+class Writer:
+    '''Initialize Writer class.'''
+    def __init__(self, database=DATABASE, batch_size=1000, metrics=None):
+        self.database = database # Database path
+        self.batch_size = batch_size # Number of buffered rows that triggers a flush
+        self.metrics = metrics or Metrics() # Write timer and row and statement counters
+        self.conn = sqlite3.connect(database, isolation_level=None) # Transactions are managed explicitly
+        for pragma in PRAGMAS:
+            self.conn.execute(pragma)
+        self.buffers = {} # Buffered rows keyed by insert query
+        self.buffered = 0 # Number of buffered rows
+        self.tables = set() # Tables created by the save method
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def execute(self, query, values=()):
+        '''
+        Flush buffered rows and execute a single statement, such as a CREATE TABLE.
+
+        :param query: SQL statement
+        :param values: Statement parameters
+        :return: sqlite3 cursor
+        '''
+        self.flush()
+        self.metrics.count('statements')
+        return self.conn.execute(query, values)
+
+    def queue(self, query, values):
+        '''
+        Buffer rows for a parameterized statement.
+
+        :param query: SQL statement
+        :param values: Iterable of tuples, where each tuple contains the statement parameters
+        '''
+        buffer = self.buffers.setdefault(query, [])
+        for value in values:
+            buffer.append(value)
+            self.buffered += 1
+        if self.buffered >= self.batch_size:
+            self.flush()
+
+    def insert(self, table_title, columns, values, conflict='IGNORE'):
+        '''
+        Buffer rows for insertion into a table.
+
+        :param table_title: Table title
+        :param columns: List of column names
+        :param values: Iterable of tuples, where each tuple contains values for the columns
+        :param conflict: Conflict resolution of the insert, such as IGNORE or REPLACE
+        '''
+        query = f"INSERT OR {conflict} INTO {table_title} ({', '.join(columns)}) VALUES ({', '.join(['?']*len(columns))})"
+        self.queue(query, values)
+
+    def upsert(self, table_title, columns, values, keys):
+        '''
+        Buffer rows for insertion into a table, updating the rows that already exist.
+
+        Unlike INSERT OR REPLACE, an update keeps the id of an existing row.
+
+        :param table_title: Table title
+        :param columns: List of column names
+        :param values: Iterable of tuples, where each tuple contains values for the columns
+        :param keys: List of columns of the unique constraint identifying a row
+        '''
+        updates = ', '.join(f"{column} = excluded.{column}" for column in columns if column not in keys)
+        query = f"INSERT INTO {table_title} ({', '.join(columns)}) VALUES ({', '.join(['?']*len(columns))}) ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates}"
+        self.queue(query, values)
+
+    def delete(self, table_title, column, values):
+        '''
+        Buffer deletion of the rows of a table matching a column value.
+
+        :param table_title: Table title
+        :param column: Column name
+        :param values: Iterable of column values
+        '''
+        self.queue(f"DELETE FROM {table_title} WHERE {column} = ?", ((value,) for value in values))
+
+    def save(self, columns, values, table_title):
+        """
+        Buffer data for a table created from its columns, like the save function of the utils module.
+
+        :param columns: List of column names
+        :param values: List of tuples, where each tuple contains values for the columns
+        :param table_title: Table title
+        """
+        # Create table if not exists, once per writer
+        if table_title not in self.tables:
+            self.execute(f"CREATE TABLE IF NOT EXISTS {table_title} (id INTEGER PRIMARY KEY AUTOINCREMENT, {', '.join(columns)}, UNIQUE({', '.join(columns)}))")
+            self.tables.add(table_title)
+
+        for value in values:
+            if len(value) != len(columns):
+                raise ValueError(f"Incorrect number of values supplied for columns {columns}. Expected {len(columns)}, got {len(value)}.")
+        self.insert(table_title, columns, values)
+
+    def flush(self):
+        '''
+        Write all buffered rows in a single transaction.
+        Inside the transaction method, rows are written without committing.
+        '''
+        if not self.buffered:
+            return
+        commit = not self.conn.in_transaction # Commit unless inside the transaction method
+        with self.metrics.stage('write'):
+            if commit:
+                self.conn.execute('BEGIN')
+            try:
+                for query, rows in self.buffers.items():
+                    self.conn.executemany(query, rows)
+                if commit:
+                    self.conn.execute('COMMIT')
+            except BaseException:
+                if commit:
+                    self.conn.execute('ROLLBACK')
+                raise
+            finally:
+                self.metrics.count('rows', self.buffered)
+                self.metrics.count('statements', self.buffered + 2 * commit)
+                self.buffers.clear()
+                self.buffered = 0
+        self.metrics.tick()
+
+    @contextmanager
+    def transaction(self):
+        '''
+        Group buffered rows and statements into a single transaction, committed on exit.
+        Flushes inside the transaction write rows that later statements can read, without committing them.
+        A transaction opened inside another one joins it.
+
+        :return: Writer object
+        '''
+        if self.conn.in_transaction:
+            yield self # Committed by the outer transaction
+            return
+        self.flush()
+        self.conn.execute('BEGIN')
+        self.metrics.count('statements')
+        try:
+            yield self
+            self.flush()
+            self.conn.execute('COMMIT')
+            self.metrics.count('statements')
+        except BaseException:
+            self.buffers.clear()
+            self.buffered = 0
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def close(self):
+        '''Flush buffered rows and close the connection.'''
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+
+
+@contextmanager
+def shared(writer=None, database=DATABASE):
+    """
+    Use a shared writer, or a private one when none is given.
+
+    A shared writer is flushed on exit so that its rows are visible to readers,
+    while a private writer is closed.
+
+    :param writer: Shared Writer object or None
+    :param database: Database path for a private writer
+    :return: Writer object
+    """
+    if writer is not None:
+        yield writer
+        writer.flush()
+    else:
+        with Writer(database) as writer:
+            yield writer
\ No newline at end of file
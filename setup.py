@@ -6,8 +6,17 @@ setup(
     author='Bonnie Gachiengu',
     author_email='bonniegachiengu@gmail.com',
     packages=find_packages(),
+    package_data={'finder': ['rules.json']},
     install_requires=[
         'pandas',
         'argparse'
     ],
+    extras_require={
+        'export': ['pyarrow'],
+    },
+    entry_points={
+        'console_scripts': [
+            'finder=finder.finder:main',
+        ],
+    },
 )
\ No newline at end of file
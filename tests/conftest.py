@@ -0,0 +1,43 @@
+import os
+import pytest
+
+'''
+conftest.py provides the fixtures shared by the tests of the finder package.
+
+The library fixture builds media libraries of empty or small files in a temporary directory, and the
+database fixture is the path of a fresh database next to it.
+'''
+
+
+# Function to create files in a directory tree
+def touch(root, paths, content=b''):
+    '''
+    Create files and their directories under a root.
+
+    :param root: Root directory
+    :param paths: Iterable of file paths relative to the root
+    :param content: Bytes written to each file
+    :return: List of absolute file paths
+    '''
+    created = []
+    for path in paths:
+        filepath = os.path.join(root, path)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as file:
+            file.write(content)
+        created.append(filepath)
+    return created
+
+
+@pytest.fixture
+def library(tmp_path):
+    '''Root directory of an empty library.'''
+    root = tmp_path / 'lib'
+    root.mkdir()
+    return str(root)
+
+
+@pytest.fixture
+def database(tmp_path):
+    '''Path of a fresh database.'''
+    return str(tmp_path / 'classified.db')
\ No newline at end of file
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+from finder.finder import Finder
+from conftest import touch
+
+'''
+test_dirstats.py checks the totals of the dir_stats and dir_resolutions tables against a GROUP BY of the files under every directory.
+'''
+
+# Totals of the files under every directory, recomputed from the filepaths and filedetails tables
+RECOMPUTE = """
+WITH RECURSIVE up(dir_id, ancestor) AS (
+    SELECT id, id FROM directories
+    UNION ALL
+    SELECT up.dir_id, d.parent_id FROM up JOIN directories d ON d.id = up.ancestor WHERE d.parent_id IS NOT NULL
+)
+SELECT up.ancestor, COALESCE(d.resolution, ''), COUNT(*), SUM(COALESCE(f.size, 0))
+FROM filepaths f
+JOIN directories p ON p.id = (SELECT dir_id FROM filesteps WHERE filepath_id = f.id)
+JOIN filedetails d ON d.file_id = f.id
+JOIN up ON up.dir_id = p.id
+GROUP BY 1, 2"""
+
+
+# Function to compare the totals with their recomputation
+def check(database, root):
+    '''
+    Assert that the totals of a database are those of the files under every directory.
+
+    :param database: Database path
+    :param root: Root directory
+    :return: Number of files under the root directory
+    '''
+    conn = sqlite3.connect(database)
+    try:
+        # Every file is counted in the directory that holds it
+        for filepath, dirpath in conn.execute("SELECT f.filepath, d.dirpath FROM filepaths f JOIN filesteps s ON s.filepath_id = f.id JOIN directories d ON d.id = s.dir_id"):
+            assert os.path.normpath(os.path.dirname(filepath)) == dirpath
+        assert conn.execute("SELECT COUNT(*) FROM filesteps").fetchone() == conn.execute("SELECT COUNT(*) FROM filepaths").fetchone()
+
+        resolutions = conn.execute(RECOMPUTE).fetchall()
+        stats = {}
+        for dir_id, resolution, files, size in resolutions:
+            stats[dir_id] = (stats.get(dir_id, (0, 0))[0] + files, stats.get(dir_id, (0, 0))[1] + size)
+        assert sorted(resolutions) == sorted(conn.execute("SELECT dir_id, resolution, files, size FROM dir_resolutions"))
+        assert sorted(stats.items()) == sorted((dir_id, (files, size)) for dir_id, files, size in conn.execute("SELECT dir_id, files, size FROM dir_stats"))
+        return conn.execute("SELECT s.files FROM dir_stats s JOIN directories d ON d.id = s.dir_id WHERE d.dirpath = ?", (root,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_totals(tmp_path, library, database):
+    '''The totals match the files after a run, a rescan with added, modified and deleted files, and shard merges.'''
+    a, b, c = (os.path.join(library, name) for name in 'abc')
+    touch(a, [f'x{i}/Film.{i}.2001.1080p.mkv' for i in range(4)] + ['x0/deep/Old.1999.720p.mkv', 'Root.mkv'], b'1' * 10)
+    touch(b, ['y/Other.2002.2160p.mkv', 'y/Other.2003.mkv'], b'2' * 5)
+    finder = Finder(database=database, batch_size=3)
+    finder.run(library, ['.mkv'])
+    assert check(database, library) == 8
+
+    # Added, modified and deleted files
+    touch(a, ['x1/New.2020.720p.mkv', 'x9/Newer.2021.mkv'], b'3' * 7)
+    touch(a, ['x0/Film.0.2001.1080p.mkv'], b'4' * 30)
+    os.utime(os.path.join(a, 'x0'))
+    os.remove(os.path.join(a, 'x0', 'deep', 'Old.1999.720p.mkv'))
+    os.remove(os.path.join(b, 'y', 'Other.2003.mkv'))
+    assert finder.rescan(library, ['.mkv']) == {'added': 2, 'modified': 1, 'removed': 2}
+    assert check(database, library) == 8
+
+    # Merged shards, one of them scanned again: like a run, a merge keeps the deleted files, removed by rescans only
+    touch(c, ['z/Third.2004.480p.mkv', 'z/w/Fourth.2005.mkv'], b'5' * 3)
+    os.remove(os.path.join(a, 'x2', 'Film.2.2001.1080p.mkv'))
+    finder.run_many([a, c], ['.mkv'], jobs=2)
+    assert check(database, library) == 10
+    finder.run_many([a, c], ['.mkv'], jobs=2)
+    assert check(database, library) == 10
\ No newline at end of file
@@ -0,0 +1,45 @@
+import os
+import pytest
+from finder import hasher
+from finder.finder import Finder
+from finder.hasher import FileHasher
+from conftest import touch
+
+'''
+test_hasher.py checks the hashes of the FileHasher class and their cache.
+'''
+
+
+# Function to hash the catalog
+def hashes(database):
+    '''
+    Hash the files of a database and report the files with the same content.
+
+    :param database: Database path
+    :return: Tuple of the counts of the hash and the sorted lists of file names of the Identical groups
+    '''
+    filehasher = FileHasher(database=database, jobs=2)
+    counts = filehasher.hash()
+    return counts, [sorted(os.path.basename(filepath) for file_id, filepath in group.files) for group in filehasher.identical()]
+
+
+@pytest.mark.parametrize('block', [None, 64])
+def test_cache(library, database, monkeypatch, block):
+    '''Cached hashes are reused for unchanged files only, even when a file changed after the last scan.'''
+    if block:
+        monkeypatch.setattr(hasher, 'BLOCK', block) # Partial hashes of files larger than three blocks
+    touch(library, ['A.2001.mkv', 'B.2001.mkv'], b'1' * 1000)
+    touch(library, ['C.2001.mkv'], b'2' * 1000)
+    touch(library, ['D.2002.mkv'], b'3' * 10)
+    Finder(database=database).run(library, ['.mkv'])
+    assert hashes(database) == ({'partial': 3, 'full': 2 if block else 0, 'cached': 0}, [['A.2001.mkv', 'B.2001.mkv']])
+    assert hashes(database) == ({'partial': 0, 'full': 0, 'cached': 3}, [['A.2001.mkv', 'B.2001.mkv']])
+
+    # Rewritten in place with the same size, without a rescan
+    path = os.path.join(library, 'B.2001.mkv')
+    stat = os.stat(path)
+    touch(library, ['B.2001.mkv'], b'1' * 999 + b'2')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+    counts, identical = hashes(database)
+    assert counts == {'partial': 1, 'full': 0, 'cached': 2}
+    assert identical == []
\ No newline at end of file
@@ -0,0 +1,82 @@
+import sqlite3
+import pytest
+from finder.finder import Finder
+from finder.metrics import Metrics
+from conftest import touch
+
+'''
+test_journal.py checks that a run interrupted after some batches and resumed saves the same tables as a complete run.
+'''
+
+
+class Interrupt(Exception):
+    '''Initialize Interrupt class.'''
+
+
+# Function to build a progress hook interrupting a run
+def interrupter(batches):
+    '''
+    Build a progress hook raising Interrupt after a number of calls.
+
+    :param batches: Number of calls before the interruption
+    :return: Function called with the Metrics object
+    '''
+    calls = []
+
+    def progress(metrics):
+        calls.append(metrics)
+        if len(calls) == batches:
+            raise Interrupt()
+    return progress
+
+
+# Function to read the saved tables of a database
+def tables(database):
+    '''
+    Read the filepaths and filedetails rows of a database, without their ids.
+
+    :param database: Database path
+    :return: Tuple of filepaths rows and filedetails rows
+    '''
+    conn = sqlite3.connect(database)
+    try:
+        filepaths = conn.execute("SELECT filepath, filename, filetitle, size FROM filepaths ORDER BY filepath").fetchall()
+        filedetails = conn.execute("SELECT f.filepath, d.title, d.year, d.resolution, d.codec, d.parser_version FROM filedetails d JOIN filepaths f ON f.id = d.file_id ORDER BY f.filepath").fetchall()
+        return filepaths, filedetails
+    finally:
+        conn.close()
+
+
+# Function to read the journal of a database
+def journal(database):
+    '''
+    Count the unfinished runs and the saved directories of the journal of a database.
+
+    :param database: Database path
+    :return: Tuple of runs and run_directories counts
+    '''
+    conn = sqlite3.connect(database)
+    try:
+        return conn.execute("SELECT (SELECT COUNT(*) FROM runs WHERE finished IS NULL), (SELECT COUNT(*) FROM run_directories)").fetchone()
+    finally:
+        conn.close()
+
+
+# Interruptions during the find, steps and details stages, and during a stream run
+@pytest.mark.parametrize('stream, batches', [(False, 2), (False, 9), (False, 20), (False, 33), (False, 36), (True, 2), (True, 20), (True, 40)])
+def test_resume(tmp_path, library, stream, batches):
+    '''A run interrupted after some batches and resumed saves the tables of a complete run, and clears its journal.'''
+    touch(library, [f'dir{i}/sub{j}/Film.{i}.{j}.{2000 + j}.1080p.x265.mkv' for i in range(6) for j in range(4)] + ['dir0/notes.txt'])
+    complete = str(tmp_path / 'complete.db')
+    Finder(database=complete, batch_size=4).run(library, ['.mkv'], stream=stream)
+
+    resumed = str(tmp_path / 'resumed.db')
+    with pytest.raises(Interrupt):
+        Finder(database=resumed, batch_size=4, metrics=Metrics(progress=interrupter(batches))).run(library, ['.mkv'], stream=stream)
+    assert journal(resumed)[0] == 1
+    Finder(database=resumed, batch_size=4).run(library, ['.mkv'], stream=stream, resume=True)
+
+    filepaths, filedetails = tables(resumed)
+    assert (filepaths, filedetails) == tables(complete)
+    assert len(filepaths) == len(filedetails) == 24
+    assert journal(resumed) == (0, 0)
\ No newline at end of file
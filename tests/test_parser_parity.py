@@ -0,0 +1,182 @@
+import os
+import re
+import json
+import pytest
+from finder import parser
+from finder.utils import titlextract, yearextract, resextract, codecextract
+
+'''
+test_parser_parity.py checks the parser module against the extraction functions it replaced.
+
+The baseline functions below are the titlextract, yearextract, resextract and codecextract functions
+of the utils module before the parser module, kept verbatim apart from their docstrings. Every release
+name of release_names.txt, real names of films with and without years, tags, parentheses or extensions,
+is parsed by both:
+
+    - with the baseline rules, the 7 ignored words and 5 title overrides that were hard-coded in the
+      baseline titlextract function and no tags, the parser gives exactly the baseline results;
+    - with the default rules of rules.json, years, resolutions and codecs are unchanged, and the only
+      titles that change are the ones listed in TAGGED_TITLES, whose trailing release tags are dropped.
+
+A title changed by a new default tag fails the second test until it is listed, so changes of the
+default rules are reviewed name by name.
+'''
+
+# Release names file, next to this module
+RELEASE_NAMES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'release_names.txt')
+
+# Rules reproducing the baseline titlextract function
+BASELINE_RULES = {
+    'version': 0,
+    'ignore': ['webrip', 'x264', 'bluray', '720p', '1080p', 'yify', 'brrip'],
+    'tags': [],
+    'rewrites': [],
+    'overrides': {
+        '7 5 0 0': '7500',
+        '2 0 1 2': '2012',
+        'Wonder Woman 1_9_8_4': 'Wonder Woman 1984',
+        'G I  Joe Retaliation': 'G.I. Joe: Retaliation',
+        'G I  Joe Rise of Cobra': 'G.I. Joe: The Rise of Cobra',
+    },
+}
+
+# Titles changed by the tags of the default rules: release name to (default title, baseline title)
+TAGGED_TITLES = {
+    'Duck.Duck.Goose.(2018).1080p.x265.mkv': ('Duck Duck Goose', 'Duck Duck Goose x265'),
+    'Chinatown.DVDRip.XviD.avi': ('Chinatown', 'Chinatown DVDRip XviD'),
+    'Annie.Hall.DVDRip.XviD-SAPHiRE.avi': ('Annie Hall', 'Annie Hall DVDRip XviD-SAPHiRE'),
+    'Apocalypse.Now.Redux.DVDRip.DivX.avi': ('Apocalypse Now Redux', 'Apocalypse Now Redux DVDRip DivX'),
+    'Trainspotting.DVDRip.XviD-DoNE.avi': ('Trainspotting', 'Trainspotting DVDRip XviD-DoNE'),
+    'Brazil.Directors.Cut.DVDRip.XviD.avi': ('Brazil Directors Cut', 'Brazil Directors Cut DVDRip XviD'),
+    'The.Big.Lebowski.DVDRip.XviD-FLS.avi': ('The Big Lebowski', 'The Big Lebowski DVDRip XviD-FLS'),
+    'Fargo.DVDRip.XviD.AC3.avi': ('Fargo', 'Fargo DVDRip XviD AC3'),
+    'Memento.x265.mkv': ('Memento', 'Memento x265'),
+    'Collateral.HEVC.1080p.mkv': ('Collateral', 'Collateral HEVC'),
+    'Movie.x265.mkv': ('Movie', 'Movie x265'),
+    'Some.Film.HEVC.1080p.mkv': ('Some Film', 'Some Film HEVC'),
+}
+
+
+# Function to extract the title of a file, as before the parser module
+def baseline_titlextract(filename):
+    '''Baseline titlextract function.'''
+
+    # Remove file extension
+    filename = os.path.basename(filename)
+    filename = filename.rsplit('.', 1)[0]  # Remove file extension
+
+    # Remove parentheses and their contents but preserve the surrounding dots
+    filename = re.sub(r'\.\(.*?\)\.', '.', filename)
+    filename = re.sub(r'\(.*?\)', '', filename)  # Remove any leftover parentheses content without surrounding dots
+
+    # Split filename into parts using both '.' and spaces as delimiters
+    filename_parts = re.split(r'[.\s]', filename)
+
+    # Words to ignore
+    ignore_words = {'webrip', 'x264', 'bluray', '720p', '1080p', 'yify', 'brrip'}
+
+    # Extract title up to year
+    title = []  # Initialize title list
+    for word in filename_parts:
+        if word.isnumeric() and len(word) == 4:  # If it's a year, stop adding to title
+            break
+        if word.lower() not in ignore_words:  # Ignore specific words
+            title.append(word)
+
+    # Join title words with spaces
+    title = ' '.join(title)
+
+    # Conditional statement to handle specific titles
+    if title == "7 5 0 0":
+        title = "7500"
+    elif title == "2 0 1 2":
+        title = "2012"
+    elif title == "Wonder Woman 1_9_8_4":
+        title = "Wonder Woman 1984"
+    elif title == "G I  Joe Retaliation":
+        title = "G.I. Joe: Retaliation"
+    elif title == "G I  Joe Rise of Cobra":
+        title = "G.I. Joe: The Rise of Cobra"
+
+    return title
+
+
+# Function to search a pattern in the name of a file without its extension, as before the parser module
+def baseline_search(pattern, filename):
+    '''Baseline body of the yearextract, resextract and codecextract functions.'''
+    filename = os.path.basename(filename)
+    filename = filename.split('.')[0:-1] # Remove file extension
+    match = re.search(pattern, '.'.join(filename))
+    return match.group(0) if match else None
+
+
+# Function to extract the year, resolution and codec of a file, as before the parser module
+def baseline_tags(filename):
+    '''Baseline yearextract, resextract and codecextract functions.'''
+    return (
+        baseline_search(r'(19\d{2}|20\d{2})', filename),
+        baseline_search(r'(\d{3,4}p)', filename),
+        baseline_search(r'x264|x265|XviD|DivX', filename),
+    )
+
+
+# Function to load the release names
+def release_names():
+    '''
+    Load the release names of the corpus.
+
+    :return: List of release names
+    '''
+    with open(RELEASE_NAMES, encoding='utf-8') as file:
+        return [line.rstrip('\n') for line in file if line.strip() and not line.startswith('#')]
+
+
+@pytest.fixture
+def rules():
+    '''Restore the rules in use after a test that reloads other rules.'''
+    path = parser.RULES.path
+    yield
+    parser.reload(path)
+
+
+def test_corpus():
+    '''The corpus holds names with and without years, and every tagged title is in it.'''
+    names = release_names()
+    assert len(names) == len(set(names))
+    assert sum(baseline_tags(name)[0] is None for name in names) >= 30
+    assert set(TAGGED_TITLES) <= set(names)
+
+
+def test_baseline_rules(rules, tmp_path):
+    '''With the baseline rules, the parser gives the results of the baseline functions for every name.'''
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps(BASELINE_RULES))
+    parser.reload(str(path))
+    for name in release_names():
+        assert (titlextract(name), yearextract(name), resextract(name), codecextract(name)) == (baseline_titlextract(name),) + baseline_tags(name), name
+
+
+def test_default_rules(rules):
+    '''With the default rules, only the titles of TAGGED_TITLES change, and the other details do not.'''
+    parser.reload(parser.DEFAULT_RULES)
+    changed = {}
+    for name in release_names():
+        assert (yearextract(name), resextract(name), codecextract(name)) == baseline_tags(name), name
+        title, baseline = titlextract(name), baseline_titlextract(name)
+        if title != baseline:
+            changed[name] = (title, baseline)
+    assert changed == TAGGED_TITLES
+
+
+def test_tags_never_empty_a_title(rules):
+    '''Names made only of tags keep them as their title, like the baseline function did.'''
+    parser.reload(parser.DEFAULT_RULES)
+    for name in ['Fgt.mkv', 'FGT.mkv', 'x265.mkv', 'x265.2019.mkv']:
+        assert titlextract(name) == baseline_titlextract(name) != '', name
+
+
+def test_tags_inside_titles(rules):
+    '''Title words that are tags, or look like one, are kept unless they end the title.'''
+    parser.reload(parser.DEFAULT_RULES)
+    for name in ['The.Dts.Story.mkv', 'Amzn Special.mp4', 'Hdr Man.mkv', 'Spider-Man.mkv', 'The.Remux.Job.x265.mkv']:
+        assert titlextract(name) == baseline_titlextract(name).replace(' x265', ''), name
\ No newline at end of file
@@ -0,0 +1,31 @@
+import sqlite3
+from finder.journal import Journal
+from finder.pipeline import Pipeline
+from finder.writer import Writer
+from conftest import touch
+
+'''
+test_pipeline.py checks the batches of the Pipeline class.
+'''
+
+
+def test_empty_directories(library, database):
+    '''Directories without matching files are saved in batches, with their journal marks committed on the way.'''
+    touch(library, [f'empty{i}/notes.txt' for i in range(20)] + ['films/A.2001.mkv'])
+    events = []
+    marks = []
+
+    def progress(event):
+        events.append(event)
+        conn = sqlite3.connect(database)
+        marks.append(conn.execute("SELECT COUNT(*) FROM run_directories").fetchone()[0])
+        conn.close()
+
+    with Writer(database, batch_size=5) as writer:
+        journal = Journal(writer).start(library, ['.mkv'])
+        assert Pipeline(writer, library, journal=journal).run(str(library), ['.mkv'], progress=progress) == 1
+    batches = [event for event in events if not event.done]
+    assert len(batches) >= 4
+    assert all(event.directories <= 5 * (i + 1) for i, event in enumerate(batches))
+    assert marks[0] > 0
+    assert events[-1].done and events[-1].directories == 22
\ No newline at end of file
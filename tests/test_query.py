@@ -0,0 +1,27 @@
+from finder.finder import Finder
+from finder.query import Catalog, fuzzy
+from conftest import touch
+
+'''
+test_query.py checks the typo-tolerant search of the Catalog class.
+'''
+
+
+def test_fuzzy():
+    '''Only the rarest trigrams that any row sharing the minimum overlap must hold are matched.'''
+    assert fuzzy('ab') is None
+    assert fuzzy('Abcdef') == ('"abc" OR "bcd" OR "cde"', 2)
+    assert fuzzy('abcdef', {'abc': 90, 'bcd': 5, 'cde': 40, 'def': 0}) == ('"def" OR "bcd" OR "cde"', 2)
+
+
+def test_typo(library, database):
+    '''A misspelled title finds its file first, and titles sharing only a few common trigrams with it are left out.'''
+    touch(library, ['Ghost.Hunters.2016.1080p.mkv', 'The.Ghost.Writer.2010.mkv', 'The.Hunt.2012.mkv', 'Ghost.2019.mkv'] + [f'The.Other.{i}.2000.mkv' for i in range(20)])
+    Finder(database=database).run(library, ['.mkv'])
+    with Catalog(database) as catalog:
+        titles = [result.title for result in catalog.search('Gost Huntr').results]
+        assert titles == ['Ghost Hunters']
+        titles = [result.title for result in catalog.search('the ghost writr').results]
+        assert titles[0] == 'The Ghost Writer' and 'The Other 1' not in titles
+        assert len(catalog.search('The Othr').results) == 20
+        assert sorted(result.title for result in catalog.search('Ghost', typos=False).results) == ['Ghost', 'Ghost Hunters', 'The Ghost Writer']
\ No newline at end of file
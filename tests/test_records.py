@@ -0,0 +1,32 @@
+import os
+from finder.pathfinder import PathFinder
+from conftest import touch
+
+'''
+test_records.py checks that the records returned by PathFinder.find are the files matched by that call.
+'''
+
+
+def test_other_extensions(library, database):
+    '''Files saved by a scan of other extensions are not returned.'''
+    touch(library, ['A.2010.mkv', 'B.2011.mp4', 'sub/C.2012.mkv'])
+    pathfinder = PathFinder(library, database=database)
+    assert [record.filename for record in pathfinder.find(library, ('.mkv',))] == ['A.2010.mkv', 'C.2012.mkv']
+    assert [record.filepath for record in pathfinder.find(library, ('.mp4',))] == [os.path.join(library, 'B.2011.mp4')]
+
+
+def test_deleted_files(library, database):
+    '''Files deleted since an earlier scan are not returned.'''
+    first, second = touch(library, ['A.2010.mkv', 'B.2011.mp4'])
+    PathFinder(library, database=database).find(library, ('.mkv', '.mp4'))
+    os.remove(first)
+    records = PathFinder(library, database=database).find(library, ('.mkv', '.mp4'))
+    assert [record.filepath for record in records] == [second]
+    assert len(records) == 1
+
+
+def test_not_recursive(library, database):
+    '''Without recursion, only the files of the directory itself are returned.'''
+    touch(library, ['A.2010.mkv', 'sub/B.2011.mkv'])
+    records = PathFinder(library, database=database).find(library, ('.mkv',), recursive=False)
+    assert [record.filename for record in records] == ['A.2010.mkv']
\ No newline at end of file
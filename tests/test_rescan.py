@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import shutil
+from finder import pathfinder
+from finder.pathfinder import PathFinder
+from finder.writer import Writer
+from conftest import touch
+
+'''
+test_rescan.py checks the rescan method of the PathFinder class.
+'''
+
+
+# Function to read the stored files
+def stored(database):
+    '''
+    Read the stored files of a database.
+
+    :param database: Database path
+    :return: Dictionary of filepath to size
+    '''
+    conn = sqlite3.connect(database)
+    try:
+        return dict(conn.execute("SELECT filepath, size FROM filepaths"))
+    finally:
+        conn.close()
+
+
+# Function to rescan a directory tree, recording the listed directories
+def rescan(library, database, monkeypatch):
+    '''
+    Rescan a directory tree with a new PathFinder, like a new process would.
+
+    :param library: Root directory
+    :param database: Database path
+    :param monkeypatch: pytest monkeypatch fixture
+    :return: Tuple of the counts of the rescan and the set of listed directories
+    '''
+    listed = set()
+
+    def scandirectory(dirpath, extensions):
+        listed.add(dirpath)
+        return scan(dirpath, extensions)
+    scan = pathfinder.scandirectory
+    monkeypatch.setattr(pathfinder, 'scandirectory', scandirectory)
+    with Writer(database) as writer:
+        counts = PathFinder(library, writer=writer, database=database).rescan(library, ['.mkv'])
+    monkeypatch.setattr(pathfinder, 'scandirectory', scan)
+    return counts, listed
+
+
+def test_rescan(library, database, monkeypatch):
+    '''Added, modified and removed files are found in the changed directories, and unchanged directories are not listed.'''
+    touch(library, ['a/A.2001.mkv', 'a/B.2002.mkv', 'b/C.2003.mkv', 'b/sub/D.2004.mkv', 'c/E.2005.mkv', 'c/F.2006.mkv'], b'1' * 10)
+    with Writer(database) as writer:
+        PathFinder(library, writer=writer, database=database).find(library, ['.mkv'])
+    assert len(stored(database)) == 6
+    assert rescan(library, database, monkeypatch) == ({'added': 0, 'modified': 0, 'removed': 0}, set())
+
+    # Added and removed files, a modified file in a changed directory, and a removed subtree
+    touch(library, ['a/G.2007.mkv', 'a/notes.txt'])
+    touch(library, ['a/A.2001.mkv'], b'2' * 20)
+    os.remove(os.path.join(library, 'a', 'B.2002.mkv'))
+    shutil.rmtree(os.path.join(library, 'b', 'sub'))
+
+    # A file rewritten in place in a directory whose modification time is unchanged
+    c = os.path.join(library, 'c')
+    before = os.stat(c)
+    touch(library, ['c/E.2005.mkv'], b'3' * 30)
+    os.utime(c, ns=(before.st_atime_ns, before.st_mtime_ns))
+
+    counts, listed = rescan(library, database, monkeypatch)
+    assert counts == {'added': 1, 'modified': 1, 'removed': 2}
+    assert listed == {os.path.join(library, 'a'), os.path.join(library, 'b')}
+    files = stored(database)
+    assert sorted(os.path.relpath(filepath, library) for filepath in files) == ['a/A.2001.mkv', 'a/G.2007.mkv', 'b/C.2003.mkv', 'c/E.2005.mkv', 'c/F.2006.mkv']
+    assert files[os.path.join(library, 'a', 'A.2001.mkv')] == 20
+    assert files[os.path.join(library, 'c', 'E.2005.mkv')] == 10
+
+    # Nothing changed since
+    assert rescan(library, database, monkeypatch) == ({'added': 0, 'modified': 0, 'removed': 0}, set())
\ No newline at end of file
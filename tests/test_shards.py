@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import pytest
+from finder.finder import Finder
+from conftest import touch
+
+'''
+test_shards.py checks that the shards merged by the run_many method of the Finder class give the catalog of a run.
+'''
+
+
+# Function to read a catalog without its ids
+def catalog(database):
+    '''
+    Read the files, steps, details, directories and totals of a database, with the ids replaced by paths.
+
+    :param database: Database path
+    :return: Dictionary of table name to sorted rows
+    '''
+    conn = sqlite3.connect(database)
+    try:
+        return {
+            'filepaths': sorted(conn.execute("SELECT f.filepath, f.filename, f.filetitle, f.size, d.dirpath FROM filepaths f LEFT JOIN directories d ON d.id = f.dir_id")),
+            'filesteps': sorted(conn.execute("SELECT f.filepath, d.dirpath, s.size, s.resolution FROM filesteps s JOIN filepaths f ON f.id = s.filepath_id JOIN directories d ON d.id = s.dir_id")),
+            'filedetails': sorted(conn.execute("SELECT f.filepath, d.title, d.year, d.resolution, d.codec, d.parser_version FROM filedetails d JOIN filepaths f ON f.id = d.file_id")),
+            'directories': sorted(conn.execute("SELECT d.dirpath, p.dirpath FROM directories d LEFT JOIN directories p ON p.id = d.parent_id WHERE d.id IN (SELECT dir_id FROM filesteps)")),
+            'dir_stats': sorted(conn.execute("SELECT d.dirpath, s.files, s.size FROM dir_stats s JOIN directories d ON d.id = s.dir_id")),
+            'dir_resolutions': sorted(conn.execute("SELECT d.dirpath, r.resolution, r.files, r.size FROM dir_resolutions r JOIN directories d ON d.id = r.dir_id")),
+        }
+    finally:
+        conn.close()
+
+
+# Function to count the references to missing rows
+def orphans(database):
+    '''
+    Count the rows of a database pointing to a directory or a file that does not exist.
+
+    :param database: Database path
+    :return: Dictionary of reference to number of orphan rows
+    '''
+    conn = sqlite3.connect(database)
+    try:
+        return {
+            'parent_id': conn.execute("SELECT COUNT(*) FROM directories WHERE parent_id IS NOT NULL AND parent_id NOT IN (SELECT id FROM directories)").fetchone()[0],
+            'dir_id': conn.execute("SELECT COUNT(*) FROM filepaths WHERE dir_id IS NULL OR dir_id NOT IN (SELECT id FROM directories)").fetchone()[0],
+            'filesteps': conn.execute("SELECT COUNT(*) FROM filesteps WHERE filepath_id NOT IN (SELECT id FROM filepaths) OR dir_id NOT IN (SELECT id FROM directories)").fetchone()[0],
+            'filedetails': conn.execute("SELECT COUNT(*) FROM filedetails WHERE file_id NOT IN (SELECT id FROM filepaths)").fetchone()[0],
+            'dir_stats': conn.execute("SELECT COUNT(*) FROM dir_stats WHERE dir_id NOT IN (SELECT id FROM directories)").fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def roots(library):
+    '''Two directory trees with files at several depths.'''
+    a, b = os.path.join(library, 'a'), os.path.join(library, 'b')
+    touch(a, [f'x{i}/Film.{i}.2001.1080p.mkv' for i in range(5)] + ['x0/deep/er/Old.1999.720p.mkv', 'Root.2000.mkv', 'x1/notes.txt'], b'1' * 10)
+    touch(b, [f'y{i}/Other.{i}.2002.2160p.mkv' for i in range(3)] + ['Top.x265.mkv'], b'2' * 5)
+    return [a, b]
+
+
+@pytest.mark.parametrize('jobs', [1, 2, 4])
+def test_run_many(tmp_path, roots, jobs):
+    '''Merged shards give the catalog of runs of the same roots, without orphan rows, and merging them again changes nothing.'''
+    database = str(tmp_path / 'run.db')
+    finder = Finder(database=database, batch_size=3)
+    for root in roots:
+        finder.run(root, ['.mkv'])
+    expected = catalog(database)
+    assert len(expected['filepaths']) == 11
+
+    sharded = str(tmp_path / 'sharded.db')
+    finder = Finder(database=sharded, batch_size=3)
+    assert finder.run_many(roots, ['.mkv'], jobs=jobs) >= jobs
+    assert catalog(sharded) == expected
+    assert not any(orphans(sharded).values())
+
+    # Merging the same shards again replaces their rows and totals
+    finder.run_many(roots, ['.mkv'], jobs=jobs)
+    assert catalog(sharded) == expected
+    assert not any(orphans(sharded).values())
+
+
+def test_merge_into_run(tmp_path, roots):
+    '''Shards merged into a database indexed by a run replace its rows instead of adding to them.'''
+    database = str(tmp_path / 'run.db')
+    finder = Finder(database=database, batch_size=3)
+    for root in roots:
+        finder.run(root, ['.mkv'])
+    expected = catalog(database)
+    finder.run_many(roots[:1], ['.mkv'], jobs=2)
+    assert catalog(database) == expected
+    assert not any(orphans(database).values())
\ No newline at end of file
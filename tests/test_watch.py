@@ -0,0 +1,95 @@
+import os
+import json
+import sqlite3
+import pytest
+from finder import parser
+from finder.finder import Finder
+from finder.watcher import Watcher
+from finder.pathfinder import PathFinder
+from finder.writer import Writer
+from conftest import touch
+
+'''
+test_watch.py checks the batches applied by the Watcher class and the rescan method of the Finder class.
+'''
+
+
+@pytest.fixture
+def rules(tmp_path):
+    '''Path of a rules file with one more tag than the default rules, restoring the rules in use after the test.'''
+    path = parser.RULES.path
+    with open(parser.DEFAULT_RULES) as file:
+        config = json.load(file)
+    config['tags'].append('Special')
+    tagged = tmp_path / 'rules.json'
+    tagged.write_text(json.dumps(config))
+    yield str(tagged)
+    parser.reload(path)
+
+
+# Function to read the titles of the two tables
+def titles(database):
+    '''
+    Read the titles of the files from the filepaths and filedetails tables.
+
+    :param database: Database path
+    :return: List of (filename, filetitle, title, parser_version) tuples
+    '''
+    conn = sqlite3.connect(database)
+    try:
+        return conn.execute("SELECT f.filename, f.filetitle, d.title, d.parser_version FROM filepaths f LEFT JOIN filedetails d ON d.file_id = f.id ORDER BY f.filename").fetchall()
+    finally:
+        conn.close()
+
+
+# Function to start a watcher without its event loop
+def watcher(finder, directory, writer):
+    '''
+    Build a Watcher whose batches are applied by the test.
+
+    :param finder: Finder object
+    :param directory: Watched directory
+    :param writer: Writer object
+    :return: Watcher object
+    '''
+    watching = Watcher(finder, directory, ['.mkv'])
+    watching.writer = writer
+    watching.pathfinder = PathFinder(filepath=directory, writer=writer, database=finder.database)
+    watching.pathfinder.create(writer)
+    return watching
+
+
+def test_directory_visited_once(library, database):
+    '''A new directory given with its dirty parent is synced once, so its files are added once.'''
+    touch(library, ['old/A.2001.mkv'])
+    Finder(database=database).run(library, ['.mkv'])
+    touch(library, [f'new/F{i}.2000.mkv' for i in range(5)])
+    with Writer(database) as writer:
+        counts = PathFinder(library, writer=writer, database=database).update([os.path.join(library, 'new'), library], ['.mkv'], recursive=False)
+    assert counts == {'added': 5, 'modified': 0, 'removed': 0}
+
+
+def test_watch_reloaded_rules(library, database, rules):
+    '''Details of the stored files follow their titles when the rules are reloaded during a watch.'''
+    touch(library, ['Amzn Special.mp4.mkv', 'Film Special.mkv', 'Other.2019.mkv'])
+    finder = Finder(database=database)
+    finder.run(library, ['.mkv'])
+    with Writer(database) as writer:
+        watching = watcher(finder, library, writer)
+        parser.reload(rules)
+        touch(library, ['New.2020.mkv'])
+        watching.apply([library], recursive=False)
+    rows = titles(database)
+    assert ('Film Special.mkv', 'Film', 'Film', parser.version()) in rows
+    assert all(filetitle == title and stamp == parser.version() for filename, filetitle, title, stamp in rows)
+    assert len(rows) == 4
+
+
+def test_rescan_reloaded_rules(library, database, rules):
+    '''A rescan with other rules extracts the outdated details of the unchanged files.'''
+    touch(library, ['Film Special.mkv', 'Other.2019.mkv'])
+    finder = Finder(database=database)
+    finder.run(library, ['.mkv'])
+    parser.reload(rules)
+    assert finder.rescan(library, ['.mkv']) == {'added': 0, 'modified': 0, 'removed': 0}
+    assert titles(database) == [('Film Special.mkv', 'Film', 'Film', parser.version()), ('Other.2019.mkv', 'Other', 'Other', parser.version())]
\ No newline at end of file